@@ -0,0 +1,50 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from DB.db import get_db
+from Models.analyticsModel import FlakyStepResponse, StoryStatsResponse
+from Service.code import analyticsService
+
+router = APIRouter()
+
+# Executions to compute over; at most the ones the aggregates keep
+WINDOW = Query(None, ge=1, le=analyticsService.ANALYTICS_WINDOW)
+
+@router.get("/stories", response_model=List[StoryStatsResponse])
+def list_stories(order_by: str = "pass_rate", limit: int = 50, window: Optional[int] = WINDOW,
+                 db: Session = Depends(get_db)):
+    """
+    
+    Pass rate, flakiness and p50/p95 duration per story over its last runs, worst first
+    
+    """
+    try:
+        return analyticsService.list_story_stats(db, order_by, limit, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stories/{story_hash}", response_model=StoryStatsResponse)
+def get_story(story_hash: str, window: Optional[int] = WINDOW, db: Session = Depends(get_db)):
+    stats = analyticsService.get_story_stats(db, story_hash, window)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"No history for story {story_hash}")
+    return stats
+
+@router.get("/flaky-steps", response_model=List[FlakyStepResponse])
+def list_flaky_steps(limit: int = 50, min_runs: int = 2, story_hash: Optional[str] = None,
+                     window: Optional[int] = WINDOW, db: Session = Depends(get_db)):
+    """
+    
+    Steps that both passed and failed over their last runs, the most unstable first
+    
+    """
+    return analyticsService.flaky_steps(db, limit, min_runs, story_hash, window)
+
+@router.post("/rebuild", status_code=204)
+def rebuild(window: Optional[int] = WINDOW, db: Session = Depends(get_db)):
+    """
+    
+    Recompute the aggregates from the stored test cases and steps, keeping the last `window` runs
+    
+    """
+    analyticsService.rebuild_aggregates(db, window)
@@ -1,11 +1,36 @@
-from fastapi import APIRouter
-from Service.code.aiTestAutomation import AITestAutomation
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from DB.db import get_db
+from Models.testRunModel import TestRunRequest, TestRunResponse
+from Service.code import testRunService
 
 router = APIRouter()
 
-@router.get("/")
-async def run_tests():
-    excel_path="user_stories.xlsx"
-    automation = AITestAutomation(excel_path)
-    await automation.run()
+@router.post("/runs", response_model=TestRunResponse, status_code=202)
+def start_run(request: TestRunRequest, db: Session = Depends(get_db)):
+    """
+    
+    Queue a test suite run and return its id immediately
+    
+    """
+    try:
+        return testRunService.create_run(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/runs", response_model=List[TestRunResponse])
+def list_runs(limit: int = 50, db: Session = Depends(get_db)):
+    return testRunService.list_runs(db, limit)
+
+@router.get("/runs/{run_id}", response_model=TestRunResponse)
+def get_run(run_id: str, db: Session = Depends(get_db)):
+    """
+    
+    Status and progress of a single run
+    
+    """
+    run = testRunService.get_run(db, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Test run {run_id} not found")
+    return run
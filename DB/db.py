@@ -1,4 +1,6 @@
-from sqlalchemy import JSON, Column, Integer, create_engine, String, Boolean
+import threading
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Index, Integer, Text, create_engine, String, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 
 from sqlalchemy.orm import sessionmaker
@@ -15,8 +17,22 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 database = Database(DATABASE_URL)
 Base = declarative_base()
 
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def ensure_schema():
+    """Create missing tables once per process, on first use instead of at import."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            Base.metadata.create_all(bind=engine)
+            _schema_ready = True
+
 # * Database dependency function
 def get_db():
+    ensure_schema()
     db = SessionLocal()
     try:
         yield db
@@ -38,3 +54,99 @@ class UserStoryRequest(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_story = Column(String, nullable=False)
+
+class TestRun(Base):
+    __tablename__ = "runs"
+
+    id = Column(String, primary_key=True)
+    excel_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    max_workers = Column(Integer, default=1)
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    message = Column(String)
+    summary = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Server process executing the run, and when it last reported that the run is still alive
+    owner = Column(String)
+    heartbeat_at = Column(DateTime)
+
+class TestCaseRecord(Base):
+    __tablename__ = "test_cases"
+
+    # Ids are generated client side so cases and their steps can be bulk inserted together
+    id = Column(String, primary_key=True)
+    run_id = Column(String, ForeignKey("runs.id"), nullable=False, index=True)
+    case_id = Column(String, nullable=False)
+    story_hash = Column(String(64), nullable=False, index=True)
+    user_story = Column(Text, nullable=False)
+    status = Column(String, nullable=False, index=True)
+    summary = Column(Text)
+    started_at = Column(DateTime, index=True)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    generation_seconds = Column(Float)
+    html_report_path = Column(String)
+
+    __table_args__ = (
+        # History of a single story, newest first
+        Index("ix_test_cases_story_hash_started_at", "story_hash", "started_at"),
+    )
+
+class TestStepRecord(Base):
+    __tablename__ = "test_steps"
+
+    id = Column(String, primary_key=True)
+    test_case_id = Column(String, ForeignKey("test_cases.id"), nullable=False, index=True)
+    run_id = Column(String, ForeignKey("runs.id"), nullable=False, index=True)
+    story_hash = Column(String(64), nullable=False, index=True)
+    step_number = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    element_selector = Column(String)
+    input_value = Column(String)
+    expected_result = Column(String)
+    status = Column(String, nullable=False, index=True)
+    notes = Column(Text)
+    artifact_id = Column(String)
+    duration_seconds = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class StoryStats(Base):
+    __tablename__ = "story_stats"
+
+    # Maintained incrementally by the run recorder so analytics never scan test_cases
+    story_hash = Column(String(64), primary_key=True)
+    user_story = Column(Text, nullable=False)
+    total_runs = Column(Integer, nullable=False, default=0)
+    # [status, duration_seconds] of the last N executions, oldest first
+    recent = Column(JSON, nullable=False, default=list)
+    window_runs = Column(Integer, nullable=False, default=0)
+    pass_rate = Column(Float, index=True)
+    flakiness = Column(Float, index=True)
+    p50_seconds = Column(Float)
+    p95_seconds = Column(Float)
+    last_status = Column(String)
+    last_run_at = Column(DateTime, index=True)
+
+class StepStats(Base):
+    __tablename__ = "step_stats"
+
+    # Hash of the story hash, step number, action and selector
+    step_key = Column(String(32), primary_key=True)
+    story_hash = Column(String(64), nullable=False, index=True)
+    step_number = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    element_selector = Column(String)
+    # Statuses of the last N executions, oldest first
+    recent = Column(JSON, nullable=False, default=list)
+    window_runs = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    # Pass/fail transitions in the window, relative to the most there could be
+    flakiness = Column(Float, nullable=False, default=0.0, index=True)
+    last_status = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class StoryStatsResponse(BaseModel):
+    story_hash: str
+    user_story: str
+    total_runs: int = 0
+    window_runs: int = 0
+    pass_rate: Optional[float] = None
+    flakiness: Optional[float] = None
+    p50_seconds: Optional[float] = None
+    p95_seconds: Optional[float] = None
+    last_status: Optional[str] = None
+    last_run_at: Optional[datetime] = None
+
+class FlakyStepResponse(BaseModel):
+    story_hash: str
+    step_number: int
+    action: str
+    element_selector: Optional[str] = None
+    window_runs: int = 0
+    failures: int = 0
+    flakiness: float = 0.0
+    last_status: Optional[str] = None
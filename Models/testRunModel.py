@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field
+
+# Browser contexts a single run may open in the server's Chromium
+MAX_RUN_WORKERS = 8
+
+class TestRunRequest(BaseModel):
+    # Relative to the server's WORKBOOK_DIR
+    excel_path: str = "user_stories.xlsx"
+    max_workers: int = Field(1, ge=1, le=MAX_RUN_WORKERS)
+
+class TestRunResponse(BaseModel):
+    run_id: str
+    status: str
+    # As requested, relative to WORKBOOK_DIR; the server's own paths are never returned
+    excel_path: str
+    total: int = 0
+    completed: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    message: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
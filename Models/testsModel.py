@@ -9,8 +9,14 @@ class TestStep(BaseModel):
     input_value: Optional[str] = None
     expected_result: Optional[str] = None
     screenshot_path: Optional[str] = None
+    artifact_id: Optional[str] = None
+    dom_artifact_id: Optional[str] = None
+    # Screenshot the page analysis after this step was made from, if it was stored
+    analysis_artifact_id: Optional[str] = None
     status: str = "Not Run"
     notes: Optional[str] = None
+    # Execution time of the step; None if it was not measured
+    duration_seconds: Optional[float] = None
 
 
 class TestCase(BaseModel):
@@ -18,8 +24,11 @@ class TestCase(BaseModel):
     user_story: str
     steps: List[TestStep] = []
     summary: str = ""
+    # Screenshot the summary was made from, if it was stored
+    summary_artifact_id: Optional[str] = None
     status: str = "Not Run"
     start_time: Optional[str] = None
     end_time: Optional[str] = None
     duration_seconds: Optional[float] = None
+    generation_seconds: Optional[float] = None
     html_report_path: Optional[str] = None
\ No newline at end of file
@@ -1,124 +1,443 @@
+import asyncio
+import time
 from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from core.llmGateway import gateway
 from Models.testsModel import TestCase, TestStep
+from Service.code.artifactStore import ArtifactStore
 from Service.code.browserAgent import BrowserAgent
-from Service.code.testReporter import TestReporter
+from Service.code.executionProfiles import DEFAULT_PROFILE, get_profile
+from Service.code.pageSnapshot import PageSnapshotter
+from Service.code.pipelineMetrics import PipelineMetrics
+from Service.code.resultExporters import JUnitXmlExporter, NdjsonExporter, ResultExporter
+from Service.code.stepStreamParser import StepStream
+from Service.code.testReporter import SuiteReport, TestReporter
 from Service.code.testStepsGenerator import PlaywrightCodeGenerator
 from Service.code.userStoryExtractor import UserStoryExtractor
 
+# When to run the LLM page analysis after a step; the final state is always analyzed
+ANALYSIS_POLICIES = ("every_step", "on_failure", "sampled", "final_only")
+
+
+def should_analyze(policy: str, sample_rate: int, step_index: int, status: Optional[str]) -> bool:
+    """Whether the step at step_index is followed by a page analysis under the given policy."""
+    if policy == "every_step":
+        return status == "Pass"
+    if policy == "on_failure":
+        return status != "Pass"
+    if policy == "sampled":
+        return status == "Pass" and (step_index + 1) % sample_rate == 0
+    return False
+
 
 class AITestAutomation:
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, max_workers: int = 1, prefetch: int = 2,
+                 progress_callback: Optional[Callable[[int, int, Optional[TestCase]], None]] = None,
+                 bypass_step_cache: bool = False, batch_size: int = 1, stream_steps: bool = False,
+                 analysis_policy: Optional[str] = None, analysis_sample_rate: Optional[int] = None,
+                 artifact_format: str = "webp", artifact_quality: int = 80,
+                 persist_analysis_screenshots: Optional[bool] = None, profile: str = DEFAULT_PROFILE,
+                 ndjson_path: Optional[str] = None, junit_path: Optional[str] = None,
+                 record_results: bool = False, run_id: Optional[str] = None, schedule: bool = False,
+                 page_snapshots: bool = True):
         self.excel_path = excel_path
+        # Called as (completed, total, test_case) once before the first story and after every story
+        self.progress_callback = progress_callback
+        self.max_workers = max(1, max_workers)
+        # How many generated stories may wait for a free browser worker
+        self.prefetch = max(1, prefetch)
+        # Stories packed into one LLM request; 1 disables batching
+        self.batch_size = max(1, batch_size)
+        # Start executing a story as soon as its first step has been generated (only without batching)
+        self.stream_steps = stream_steps and self.batch_size == 1
+        # Explicit analysis settings override the ones of the execution profile
+        self.profile = get_profile(profile)
+        analysis_policy = analysis_policy or self.profile.analysis_policy
+        analysis_sample_rate = analysis_sample_rate or self.profile.analysis_sample_rate
+        if analysis_policy not in ANALYSIS_POLICIES:
+            raise ValueError(f"Unknown analysis policy '{analysis_policy}', expected one of {ANALYSIS_POLICIES}")
+        self.analysis_policy = analysis_policy
+        # With the sampled policy every Nth step is analyzed
+        self.analysis_sample_rate = max(1, analysis_sample_rate)
         self.extractor = UserStoryExtractor(excel_path)
-        self.code_generator = PlaywrightCodeGenerator()
-        self.browser_agent = BrowserAgent()
-        self.reporter = TestReporter()
+        self.code_generator = PlaywrightCodeGenerator(bypass_cache=bypass_step_cache)
+        self.artifact_store = ArtifactStore(image_format=artifact_format, quality=artifact_quality)
+        self.browser_agent = BrowserAgent(
+            artifact_store=self.artifact_store,
+            persist_analysis_screenshots=persist_analysis_screenshots,
+            profile=self.profile
+        )
+        self.reporter = TestReporter(artifact_store=self.artifact_store, run_id=run_id)
+        # Open while run() executes; every finished test case is appended right away
+        self.suite_report: Optional[SuiteReport] = None
+        # Streaming result files, opened by run() and fed every step and test case as it finishes
+        self.ndjson_path = ndjson_path
+        self.junit_path = junit_path
+        self.exporters: List[ResultExporter] = []
+        # Persist cases and steps to the database, under run_id when the run already has a row
+        self.record_results = record_results or run_id is not None
+        self.run_id = run_id
+        # Order stories by their recorded duration and failure rate instead of workbook order
+        self.schedule = schedule
+        self.schedule_report: Optional[Dict[str, Any]] = None
+        # Ground step generation on a snapshot of each story's start page
+        self.page_snapshots = page_snapshots
         self.test_cases = []
+        self.metrics = PipelineMetrics()
         
     async def run(self):
         """Run the entire automation process."""
-        print("Starting AI Test Automation")
+        print(f"Starting AI Test Automation ({self.profile.name} profile)")
         
         # 1. Extract user stories
         print("Extracting user stories from Excel...")
         user_stories = self.extractor.extract_user_stories()
         print(f"Found {len(user_stories)} user stories")
+        self._report_progress(0, len(user_stories), None)
+        
+        indexed_stories = list(enumerate(user_stories))
+        plan = None
+        if self.schedule:
+            from Service.code.suiteScheduler import SuiteScheduler
+            plan = SuiteScheduler(contexts=self.max_workers).plan(indexed_stories)
+            indexed_stories = plan.order
+            print(plan.describe())
         
-        # Start the browser
-        await self.browser_agent.start()
+        # Opened before the suite report so a failing exporter (e.g. no database) leaves nothing open
+        self.exporters = self._open_exporters()
+        try:
+            self.suite_report = self.reporter.start_suite_report()
+            executed = await self.execute(indexed_stories)
+        finally:
+            suite_report_path = self.suite_report.close() if self.suite_report is not None else None
+            self.suite_report = None
+            for exporter in self.exporters:
+                exporter.close()
+            self.exporters = []
+        print(f"Suite report written to: {suite_report_path}")
+        # Summaries stay in workbook order whatever order the stories ran in
+        self.test_cases = [test_case for _, test_case in sorted(executed, key=lambda pair: pair[0])]
+        if plan is not None:
+            self.schedule_report = plan.report(self.metrics.summary()["wall_seconds"])
+            print(f"Schedule: {self.schedule_report}")
         
-        # 2. Process each user story
-        for i, story in enumerate(user_stories):
-            print(f"\nProcessing user story {i+1}/{len(user_stories)}")
-            print(f"User Story: {story}")
+        # Print final summary
+        self.print_summary(self.test_cases)
+        print(f"Pipeline: {self.metrics.summary()}")
+        if self.code_generator.cache:
+            print(f"Step cache: {self.code_generator.cache.stats()}")
+        print(f"Page analysis: {self.browser_agent.analysis_cache.stats()}")
+        print(f"Artifacts: {self.artifact_store.stats()}")
+        if self.code_generator.snapshotter:
+            print(f"Page snapshots: {self.code_generator.snapshotter.stats()}")
+        print(f"LLM calls: {gateway.stats()}")
+        
+        return self.test_cases
+        
+    async def execute(self, indexed_stories: List[Tuple[int, str]],
+                      total: Optional[int] = None) -> List[Tuple[int, TestCase]]:
+        """Execute (index, story) pairs and return (index, test case) pairs in input order."""
+        total = total or len(indexed_stories)
+        
+        # Launch a single Chromium; every worker gets its own context inside it
+        browser = await self.browser_agent.launch()
+        if self.page_snapshots:
+            self.code_generator.snapshotter = PageSnapshotter(browser)
+        workers = [self.browser_agent.spawn(n + 1) for n in range(min(self.max_workers, len(indexed_stories)))]
+        print(f"Running with {len(workers)} worker(s), generating up to {self.prefetch} stories ahead")
+        
+        # 2. Generate steps ahead of execution through a bounded queue
+        pending = asyncio.Queue()
+        for position, (i, story) in enumerate(indexed_stories):
+            pending.put_nowait((position, i, story))
+        ready = asyncio.Queue(maxsize=self.prefetch)
+        results: List[Optional[TestCase]] = [None] * len(indexed_stories)
+        completed = 0
+        self.metrics = PipelineMetrics()
+        self.metrics.start()
+        
+        async def producer():
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(pending.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                if not batch:
+                    return
+                if self.stream_steps:
+                    await stream_story(*batch[0])
+                    continue
+                started = time.perf_counter()
+                print(f"[{', '.join(f'TC_{i+1}' for _, i, _ in batch)}] Generating test steps...")
+                generated = await self._generate_batch([story for _, _, story in batch])
+                finished = time.perf_counter()
+                self.metrics.record_generation(started, finished)
+                for (position, i, story), (steps, error) in zip(batch, generated):
+                    await ready.put((position, i, story, steps, error, (finished - started) / len(batch)))
+                    self.metrics.record_queue_depth(ready.qsize())
+                self.metrics.producer_blocked_seconds += time.perf_counter() - finished
+                
+        async def stream_story(position: int, i: int, story: str):
+            stream = StepStream()
+            # Hand the story over before generating so the executor can start on the first step
+            await ready.put((position, i, story, stream, None, None))
+            self.metrics.record_queue_depth(ready.qsize())
+            print(f"[TC_{i+1}] Streaming test steps...")
+            started = time.perf_counter()
+            error = None
+            try:
+                async for step_data in self.code_generator.stream_test_steps(story):
+                    if stream.first_step_seconds is None:
+                        self.metrics.record_first_step(time.perf_counter() - started)
+                    stream.put(self._to_test_steps([step_data])[0])
+            except Exception as e:
+                error = e
+            finally:
+                stream.close(error)
+                self.metrics.record_generation(started, time.perf_counter())
+                
+        async def consumer(agent: BrowserAgent):
+            nonlocal completed
+            await agent.start()
+            try:
+                while True:
+                    waiting = time.perf_counter()
+                    item = await ready.get()
+                    started = time.perf_counter()
+                    self.metrics.executor_starved_seconds += started - waiting
+                    if item is None:
+                        return
+                    position, i, story, steps, error, generation_seconds = item
+                    print(f"\nProcessing user story {i+1}/{total}")
+                    print(f"User Story: {story}")
+                    results[position] = await self._execute_story(i, story, steps, error, agent)
+                    if isinstance(steps, StepStream):
+                        generation_seconds = steps.generation_seconds
+                    results[position].generation_seconds = generation_seconds
+                    if self.suite_report is not None:
+                        self.suite_report.add(results[position])
+                    self._export("case_finished", results[position])
+                    completed += 1
+                    self._report_progress(completed, total, results[position])
+                    self.metrics.record_execution(started, time.perf_counter())
+            finally:
+                await agent.stop()
+                
+        async def close_when_generated():
+            await asyncio.gather(*producers)
+            for _ in workers:
+                await ready.put(None)
+                
+        producers = [asyncio.create_task(producer()) for _ in workers]
+        consumers = [asyncio.create_task(consumer(agent)) for agent in workers]
+        try:
+            await asyncio.gather(close_when_generated(), *consumers)
+        finally:
+            for task in producers + consumers:
+                task.cancel()
+            await asyncio.gather(*producers, *consumers, return_exceptions=True)
+            # Clean up
+            await self.browser_agent.stop()
+            # Reports link to the screenshots, so make sure they are all written and stop the writer
+            await self.artifact_store.close()
+            self.metrics.finish()
             
-            # Create a test case
-            test_case = TestCase(
-                id=f"TC_{i+1}",
-                user_story=story,
-                start_time=datetime.now().isoformat()
-            )
+        # Keep the input order regardless of completion order
+        return [(i, tc) for (i, _), tc in zip(indexed_stories, results) if tc is not None]
+        
+    def _open_exporters(self) -> List[ResultExporter]:
+        exporters = self.open_exporters(self.ndjson_path, self.junit_path, self.record_results,
+                                        run_id=self.run_id, excel_path=self.excel_path)
+        if self.record_results:
+            # The recorder is opened last and creates the run id of CLI runs
+            self.run_id = exporters[-1].run_id
+        return exporters
+        
+    @staticmethod
+    def open_exporters(ndjson_path: Optional[str], junit_path: Optional[str], record_results: bool,
+                       run_id: Optional[str] = None, excel_path: str = "") -> List[ResultExporter]:
+        """Open the configured result exporters; if one fails, the ones already open are closed."""
+        exporters = []
+        try:
+            if ndjson_path:
+                exporters.append(NdjsonExporter(ndjson_path))
+            if junit_path:
+                exporters.append(JUnitXmlExporter(junit_path))
+            if record_results:
+                # Imported here so runs that do not record never need a database connection
+                from Service.code.runRecorder import RunRecorder
+                exporters.append(RunRecorder(run_id=run_id, excel_path=excel_path))
+        except Exception:
+            for exporter in exporters:
+                exporter.close()
+            raise
+        return exporters
+        
+    def _export(self, event: str, *args):
+        for exporter in self.exporters:
+            try:
+                getattr(exporter, event)(*args)
+            except Exception as e:
+                print(f"Error exporting results: {e}")
+                
+    def _report_progress(self, completed: int, total: int, test_case: Optional[TestCase]):
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(completed, total, test_case)
+        except Exception as e:
+            print(f"Error reporting progress: {e}")
             
+    @staticmethod
+    def summarize(test_cases: List[TestCase]) -> Dict[str, int]:
+        """Count test cases per status."""
+        return {
+            "total": len(test_cases),
+            "passed": sum(1 for tc in test_cases if tc.status == "Pass"),
+            "failed": sum(1 for tc in test_cases if tc.status == "Fail"),
+            "errors": sum(1 for tc in test_cases if tc.status == "Error"),
+        }
+        
+    @classmethod
+    def print_summary(cls, test_cases: List[TestCase]):
+        summary = cls.summarize(test_cases)
+        print("\n=== Test Automation Summary ===")
+        print(f"Total test cases: {summary['total']}")
+        print(f"Passed: {summary['passed']}, Failed: {summary['failed']}, Errors: {summary['errors']}")
+        
+    async def _generate_batch(self, stories: List[str]) -> List[Tuple[List[TestStep], Optional[Exception]]]:
+        """Generate steps for one or more stories; failures are returned, not raised."""
+        if len(stories) == 1:
+            try:
+                return [(await self._generate_steps(stories[0]), None)]
+            except Exception as e:
+                return [([], e)]
+        try:
+            steps_by_id = await self.code_generator.generate_test_steps_batch(
+                {f"S{n+1}": story for n, story in enumerate(stories)}
+            )
+        except Exception as e:
+            return [([], e) for _ in stories]
+        generated = []
+        for n in range(len(stories)):
             try:
-                # Generate test steps
-                print("Generating test steps...")
-                steps_data = await self.code_generator.generate_test_steps(story)
+                generated.append((self._to_test_steps(steps_by_id[f"S{n+1}"]), None))
+            except Exception as e:
+                generated.append(([], e))
+        return generated
+            
+    async def _generate_steps(self, story: str) -> List[TestStep]:
+        """Ask the LLM for the steps of a story and convert them to TestStep objects."""
+        return self._to_test_steps(await self.code_generator.generate_test_steps(story))
+        
+    def _should_analyze(self, step_index: int, step: TestStep) -> bool:
+        return should_analyze(self.analysis_policy, self.analysis_sample_rate, step_index, step.status)
+        
+    @staticmethod
+    async def _iter_steps(steps: Union[List[TestStep], StepStream]) -> AsyncIterator[TestStep]:
+        if isinstance(steps, StepStream):
+            async for step in steps:
+                yield step
+        else:
+            for step in steps:
+                yield step
                 
-                # Convert to TestStep objects
-                test_steps = []
-                for step_data in steps_data:
-                    test_step = TestStep(
-                        step_number=step_data.get("step_number", 0),
-                        action=step_data.get("action", ""),
-                        element_selector=step_data.get("element_selector"),
-                        input_value=step_data.get("input_value"),
-                        expected_result=step_data.get("expected_result")
-                    )
-                    test_steps.append(test_step)
+    @staticmethod
+    def _to_test_steps(steps_data: List[Dict[str, Any]]) -> List[TestStep]:
+        # Convert to TestStep objects
+        test_steps = []
+        for step_data in steps_data:
+            test_step = TestStep(
+                step_number=step_data.get("step_number", 0),
+                action=step_data.get("action", ""),
+                element_selector=step_data.get("element_selector"),
+                input_value=step_data.get("input_value"),
+                expected_result=step_data.get("expected_result")
+            )
+            test_steps.append(test_step)
+        return test_steps
+        
+    async def _execute_story(self, index: int, story: str, steps: Union[List[TestStep], StepStream],
+                             generation_error: Optional[Exception], agent: BrowserAgent) -> TestCase:
+        """Execute and report a single user story on the given agent; steps may still be streaming in."""
+        # Create a test case
+        test_case = TestCase(
+            id=f"TC_{index+1}",
+            user_story=story,
+            start_time=datetime.now().isoformat()
+        )
+        # Buffered frames only get their artifact ids when the case finishes, so their steps are exported then
+        deferred_steps = [] if agent.profile.screenshot_policy == "buffered" else None
+        
+        try:
+            if generation_error is not None:
+                raise generation_error
+            test_case.steps = []
+            
+            # Execute the steps
+            print(f"[{test_case.id}] Executing test steps...")
+            all_passed = True
+            i = 0
+            async for step in self._iter_steps(steps):
+                print(f"[{test_case.id}] Step {i+1}: {step.action}")
                 
-                test_case.steps = test_steps
+                # Execute the step
+                step_started = time.perf_counter()
+                updated_step = await agent.execute_step(step)
+                test_case.steps.append(updated_step)
+                step_seconds = time.perf_counter() - step_started
+                updated_step.duration_seconds = round(step_seconds, 3)
+                if deferred_steps is None:
+                    self._export("step_finished", test_case, updated_step, step_seconds)
+                else:
+                    deferred_steps.append((updated_step, step_seconds))
                 
-                # Execute the steps
-                print("Executing test steps...")
-                all_passed = True
-                for i, step in enumerate(test_case.steps):
-                    print(f"Step {i+1}: {step.action}")
-                    
-                    # Execute the step
-                    updated_step = await self.browser_agent.execute_step(step)
-                    test_case.steps[i] = updated_step
+                # Update status
+                if updated_step.status != "Pass":
+                    all_passed = False
+                    print(f"  Status: {updated_step.status} - {updated_step.notes}")
+                else:
+                    print(f"  Status: {updated_step.status}")
                     
-                    # Update status
-                    if updated_step.status != "Pass":
-                        all_passed = False
-                        print(f"  Status: {updated_step.status} - {updated_step.notes}")
-                    else:
-                        print(f"  Status: {updated_step.status}")
+                # After each step, analyze the page
+                if self._should_analyze(i, updated_step):
+                    analysis = await agent.analyze_page_content()
+                    updated_step.analysis_artifact_id = analysis["artifact_id"]
+                    print(f"Page Analysis: {analysis['summary'][:100]}...")
+                i += 1
                     
-                    # After each step, analyze the page
-                    if updated_step.status == "Pass":
-                        analysis = await self.browser_agent.analyze_page_content()
-                        print(f"Page Analysis: {analysis['summary'][:100]}...")
-                
-                # Analyze the final state
-                final_analysis = await self.browser_agent.analyze_page_content()
-                test_case.summary = final_analysis["summary"]
-                
-                # Set the test case status
-                test_case.status = "Pass" if all_passed else "Fail"
-                
-            except Exception as e:
-                print(f"Error processing user story: {e}")
-                test_case.status = "Error"
-                test_case.summary = f"An error occurred: {str(e)}"
-            
-            # Record end time
-            test_case.end_time = datetime.now().isoformat()
-            test_case.duration_seconds = (
-                datetime.fromisoformat(test_case.end_time) - 
-                datetime.fromisoformat(test_case.start_time)
-            ).total_seconds()
+            # Analyze the final state; the report shows the page a failed case ended on next to its summary
+            final_analysis = await agent.analyze_page_content(persist=not all_passed)
+            test_case.summary = final_analysis["summary"]
+            test_case.summary_artifact_id = final_analysis["artifact_id"]
             
-            # Generate report
-            print("Generating test report...")
-            report_path = self.reporter.generate_report(test_case)
-            test_case.html_report_path = report_path
+            # Set the test case status
+            test_case.status = "Pass" if all_passed else "Fail"
             
-            # Save the test case
-            self.test_cases.append(test_case)
+        except Exception as e:
+            print(f"Error processing user story: {e}")
+            test_case.status = "Error"
+            test_case.summary = f"An error occurred: {str(e)}"
             
-            print(f"Test case {test_case.id} completed with status: {test_case.status}")
-            print(f"Report generated at: {report_path}")
+        await agent.finish_test_case(test_case.status)
+        for step, step_seconds in deferred_steps or []:
+            self._export("step_finished", test_case, step, step_seconds)
         
-        # Clean up
-        await self.browser_agent.stop()
+        # Record end time
+        test_case.end_time = datetime.now().isoformat()
+        test_case.duration_seconds = (
+            datetime.fromisoformat(test_case.end_time) -
+            datetime.fromisoformat(test_case.start_time)
+        ).total_seconds()
         
-        # Print final summary
-        print("\n=== Test Automation Summary ===")
-        print(f"Total test cases: {len(self.test_cases)}")
-        passed = sum(1 for tc in self.test_cases if tc.status == "Pass")
-        failed = sum(1 for tc in self.test_cases if tc.status == "Fail")
-        errors = sum(1 for tc in self.test_cases if tc.status == "Error")
-        print(f"Passed: {passed}, Failed: {failed}, Errors: {errors}")
+        # Generate report
+        print(f"[{test_case.id}] Generating test report...")
+        report_path = self.reporter.generate_report(test_case)
+        test_case.html_report_path = report_path
         
-        return self.test_cases
+        print(f"Test case {test_case.id} completed with status: {test_case.status}")
+        print(f"Report generated at: {report_path}")
+        
+        return test_case
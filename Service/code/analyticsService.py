@@ -0,0 +1,244 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from DB.db import StepStats, StoryStats, TestCaseRecord, TestStepRecord
+from Models.analyticsModel import FlakyStepResponse, StoryStatsResponse
+from webConfig import config
+
+# Executions of a story or step the aggregates keep; the pass rate, percentiles and flakiness are computed over them
+ANALYTICS_WINDOW = config.ANALYTICS_WINDOW
+
+# Columns the story list can be sorted by, worst first
+STORY_ORDERINGS = {
+    "pass_rate": StoryStats.pass_rate.asc(),
+    "flakiness": StoryStats.flakiness.desc(),
+    "p95": StoryStats.p95_seconds.desc(),
+    "recent": StoryStats.last_run_at.desc(),
+}
+
+
+def step_key(story_hash: str, step_number: int, action: str, element_selector: Optional[str]) -> str:
+    raw = "\x1f".join([story_hash, str(step_number), action, element_selector or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _flakiness(statuses: List[str]) -> float:
+    """Share of consecutive executions whose outcome flipped between pass and not pass."""
+    if len(statuses) < 2:
+        return 0.0
+    flips = sum((a == "Pass") != (b == "Pass") for a, b in zip(statuses, statuses[1:]))
+    return round(flips / (len(statuses) - 1), 4)
+
+
+def _story_metrics(recent: List[List[Any]]) -> Dict[str, Any]:
+    """Window metrics of a story from its [status, duration_seconds] pairs, oldest first."""
+    # Executions without a measured duration, e.g. cases of a crashed shard, count towards the rates only
+    durations = [duration for _, duration in recent if duration is not None]
+    return {
+        "window_runs": len(recent),
+        "pass_rate": round(sum(status == "Pass" for status, _ in recent) / len(recent), 4) if recent else None,
+        "flakiness": _flakiness([status for status, _ in recent]),
+        "p50_seconds": _percentile(durations, 0.5),
+        "p95_seconds": _percentile(durations, 0.95),
+    }
+
+
+def _step_metrics(recent: List[str]) -> Dict[str, Any]:
+    """Window metrics of a step from its statuses, oldest first."""
+    return {
+        "window_runs": len(recent),
+        "failures": sum(status != "Pass" for status in recent),
+        "flakiness": _flakiness(recent),
+    }
+
+
+def _group(rows: List[Dict[str, Any]], key) -> "OrderedDict[str, List[Dict[str, Any]]]":
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+def update_aggregates(session: Session, case_rows: List[Dict[str, Any]], step_rows: List[Dict[str, Any]],
+                      window: int = ANALYTICS_WINDOW):
+    """
+
+    Fold a batch of new test case and step rows into the story and step aggregates.
+
+    Runs in the transaction that inserts the rows, with one SELECT per table for the
+    touched aggregates, so the cost depends on the batch and not on the stored history.
+    The SELECTs lock the aggregate rows on PostgreSQL. SQLite ignores FOR UPDATE; there the
+    callers insert (or delete) before calling this, so the transaction already holds SQLite's
+    single write lock and concurrent batches are serialized by the database instead.
+
+    """
+    stories = _group(case_rows, lambda row: row["story_hash"])
+    existing = {
+        stats.story_hash: stats for stats in session.scalars(
+            select(StoryStats).where(StoryStats.story_hash.in_(list(stories))).with_for_update()
+        )
+    }
+    for key, rows in stories.items():
+        stats = existing.get(key) or StoryStats(story_hash=key, user_story=rows[0]["user_story"], total_runs=0)
+        recent = (list(stats.recent or []) + [[row["status"], row["duration_seconds"]] for row in rows])[-window:]
+        stats.recent = recent
+        stats.total_runs = (stats.total_runs or 0) + len(rows)
+        for name, value in _story_metrics(recent).items():
+            setattr(stats, name, value)
+        stats.last_status = rows[-1]["status"]
+        stats.last_run_at = rows[-1]["finished_at"]
+        session.add(stats)
+
+    steps = _group(step_rows, lambda row: step_key(row["story_hash"], row["step_number"], row["action"],
+                                                    row["element_selector"]))
+    existing = {
+        stats.step_key: stats for stats in session.scalars(
+            select(StepStats).where(StepStats.step_key.in_(list(steps))).with_for_update()
+        )
+    }
+    for key, rows in steps.items():
+        first = rows[0]
+        stats = existing.get(key) or StepStats(
+            step_key=key,
+            story_hash=first["story_hash"],
+            step_number=first["step_number"],
+            action=first["action"],
+            element_selector=first["element_selector"]
+        )
+        recent = (list(stats.recent or []) + [row["status"] for row in rows])[-window:]
+        stats.recent = recent
+        for name, value in _step_metrics(recent).items():
+            setattr(stats, name, value)
+        stats.last_status = rows[-1]["status"]
+        stats.updated_at = datetime.utcnow()
+        session.add(stats)
+
+
+def check_window(window: Optional[int]) -> int:
+    """The window to compute over: the kept one by default; raises ValueError outside 1..ANALYTICS_WINDOW."""
+    if window is None:
+        return ANALYTICS_WINDOW
+    if not 1 <= window <= ANALYTICS_WINDOW:
+        raise ValueError(f"Window must be between 1 and {ANALYTICS_WINDOW} executions, the most the aggregates keep")
+    return window
+
+
+def rebuild_aggregates(session: Session, window: Optional[int] = None, batch_size: int = 500):
+    """
+
+    Recompute the aggregates from the raw history, e.g. after changing ANALYTICS_WINDOW.
+    A smaller window drops older executions from the aggregates, such as those from before
+    a fix; new runs fill them up to ANALYTICS_WINDOW again.
+
+    """
+    window = check_window(window)
+    session.query(StepStats).delete()
+    session.query(StoryStats).delete()
+    session.flush()
+    case_query = select(TestCaseRecord).order_by(TestCaseRecord.finished_at, TestCaseRecord.id)
+    for partition in session.execute(case_query.execution_options(yield_per=batch_size)).scalars().partitions():
+        case_rows = [{column.name: getattr(case, column.name) for column in TestCaseRecord.__table__.columns}
+                     for case in partition]
+        case_ids = [row["id"] for row in case_rows]
+        step_rows = [
+            {column.name: getattr(step, column.name) for column in TestStepRecord.__table__.columns}
+            for step in session.scalars(
+                # Same order as the live path: case by case, then by step number
+                select(TestStepRecord).join(TestCaseRecord, TestStepRecord.test_case_id == TestCaseRecord.id)
+                .where(TestStepRecord.test_case_id.in_(case_ids))
+                .order_by(TestCaseRecord.finished_at, TestCaseRecord.id, TestStepRecord.step_number)
+            )
+        ]
+        update_aggregates(session, case_rows, step_rows, window)
+        session.flush()
+    session.commit()
+
+
+def _story_response(stats: StoryStats, window: int = ANALYTICS_WINDOW) -> StoryStatsResponse:
+    if window < ANALYTICS_WINDOW:
+        metrics = _story_metrics(list(stats.recent or [])[-window:])
+    else:
+        metrics = {name: getattr(stats, name) for name in ("window_runs", "pass_rate", "flakiness",
+                                                           "p50_seconds", "p95_seconds")}
+    return StoryStatsResponse(
+        story_hash=stats.story_hash,
+        user_story=stats.user_story,
+        total_runs=stats.total_runs,
+        last_status=stats.last_status,
+        last_run_at=stats.last_run_at,
+        **metrics
+    )
+
+
+def _step_response(stats: StepStats, window: int = ANALYTICS_WINDOW) -> FlakyStepResponse:
+    if window < ANALYTICS_WINDOW:
+        metrics = _step_metrics(list(stats.recent or [])[-window:])
+    else:
+        metrics = {name: getattr(stats, name) for name in ("window_runs", "failures", "flakiness")}
+    return FlakyStepResponse(
+        story_hash=stats.story_hash,
+        step_number=stats.step_number,
+        action=stats.action,
+        element_selector=stats.element_selector,
+        last_status=stats.last_status,
+        **metrics
+    )
+
+
+# Same orderings as STORY_ORDERINGS, for windows computed on read
+_STORY_SORT_KEYS = {
+    "pass_rate": lambda story: (story.pass_rate is None, story.pass_rate or 0.0),
+    "flakiness": lambda story: -(story.flakiness or 0.0),
+    "p95": lambda story: (story.p95_seconds is None, -(story.p95_seconds or 0.0)),
+    "recent": lambda story: -(story.last_run_at.timestamp() if story.last_run_at else float("-inf")),
+}
+
+
+def list_story_stats(db: Session, order_by: str = "pass_rate", limit: int = 50,
+                     window: Optional[int] = None) -> List[StoryStatsResponse]:
+    """
+
+    Stories worst first by the stored aggregates, or over their last `window` executions.
+    A smaller window is computed from the kept executions, so it reads every story.
+
+    """
+    if order_by not in STORY_ORDERINGS:
+        raise ValueError(f"Unknown ordering '{order_by}', expected one of {list(STORY_ORDERINGS)}")
+    window = check_window(window)
+    if window == ANALYTICS_WINDOW:
+        query = select(StoryStats).order_by(STORY_ORDERINGS[order_by]).limit(limit)
+        return [_story_response(stats) for stats in db.scalars(query)]
+    stories = [_story_response(stats, window) for stats in db.scalars(select(StoryStats))]
+    return sorted(stories, key=_STORY_SORT_KEYS[order_by])[:limit]
+
+
+def get_story_stats(db: Session, story_hash: str, window: Optional[int] = None) -> Optional[StoryStatsResponse]:
+    window = check_window(window)
+    stats = db.get(StoryStats, story_hash)
+    return _story_response(stats, window) if stats else None
+
+
+def flaky_steps(db: Session, limit: int = 50, min_runs: int = 2, story_hash: Optional[str] = None,
+                window: Optional[int] = None) -> List[FlakyStepResponse]:
+    """Steps that both passed and failed within the window, the most unstable first."""
+    window = check_window(window)
+    # A step that flipped within a smaller window also flipped within the kept one
+    query = select(StepStats).where(StepStats.flakiness > 0, StepStats.window_runs >= min_runs)
+    if story_hash:
+        query = query.where(StepStats.story_hash == story_hash)
+    if window == ANALYTICS_WINDOW:
+        query = query.order_by(StepStats.flakiness.desc()).limit(limit)
+        return [_step_response(stats) for stats in db.scalars(query)]
+    steps = [_step_response(stats, window) for stats in db.scalars(query)]
+    steps = [step for step in steps if step.flakiness > 0 and step.window_runs >= min_runs]
+    return sorted(steps, key=lambda step: -step.flakiness)[:limit]
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import io
+import os
+import queue
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from PIL import Image
+
+IMAGE_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "png": "PNG"}
+
+
+def encode_for_model(screenshot: bytes, max_side: int = 768, max_aspect: float = 2.0, quality: int = 70) -> bytes:
+    """Crop and downscale a PNG screenshot to a token-efficient JPEG for a vision model.
+
+    768px fits a single Gemini image tile; very tall captures keep only their top part.
+    """
+    with Image.open(io.BytesIO(screenshot)) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+        if height > width * max_aspect:
+            image = image.crop((0, 0, width, int(width * max_aspect)))
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class ArtifactStore:
+    """Content-addressed screenshot and DOM snapshot store; encoding and disk writes happen on a background thread."""
+
+    def __init__(self, root: str = "./utils/test_results/artifacts", image_format: str = "webp",
+                 quality: int = 80, max_pending: int = 64, thumbnail_width: int = 320):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format '{image_format}', expected one of {list(IMAGE_FORMATS)}")
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.image_format = image_format
+        self.quality = quality
+        # Every screenshot also gets a small copy for report listings; 0 disables them
+        self.thumbnail_width = thumbnail_width
+        # Ids queued or written by this store; files from earlier runs are found by the writer thread
+        self._known = set()
+        # Bounded so a slow disk cannot buffer every frame in memory; see _put for what happens when it is full
+        self._queue = queue.Queue(maxsize=max_pending)
+        # The counters are updated by the callers and by the writer thread
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._start_writer()
+        self.stored = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.written_inline = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @staticmethod
+    def make_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def _start_writer(self):
+        self._writer = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+        self._writer.start()
+
+    async def put(self, screenshot: bytes, keep: bool = False) -> Optional[str]:
+        """Queue a PNG screenshot for storage and return its artifact id right away.
+
+        Returns None if the writer is too far behind and the screenshot was dropped; with
+        keep (failure evidence) it is written on a worker thread and awaited instead of dropped.
+        """
+        return await self._put(screenshot, self.image_format, keep)
+
+    async def put_snapshot(self, html: str, keep: bool = False) -> Optional[str]:
+        """Queue a DOM snapshot for storage and return its artifact id right away, see put."""
+        return await self._put(html.encode("utf-8"), "html", keep)
+
+    async def _put(self, data: bytes, extension: str, keep: bool) -> Optional[str]:
+        # Called from the step loop, so no disk access on the event loop and no waiting unless evidence would be lost
+        if not self._writer.is_alive():
+            # Closed at the end of an earlier run
+            self._start_writer()
+        artifact_id = self.make_id(data)
+        if artifact_id in self._known:
+            with self._lock:
+                self.deduplicated += 1
+            return artifact_id
+        with self._lock:
+            self.bytes_in += len(data)
+            # Known before the writer sees it, so a failed write can take it back out
+            self._known.add(artifact_id)
+        try:
+            self._queue.put_nowait((artifact_id, data, extension))
+        except queue.Full:
+            if not keep:
+                # The disk is max_pending artifacts behind; drop this one rather than stall the event loop
+                with self._lock:
+                    self.dropped += 1
+                    self.bytes_in -= len(data)
+                    self._known.discard(artifact_id)
+                print(f"Artifact writer is {self._queue.maxsize} artifacts behind, dropped artifact {artifact_id}")
+                return None
+            # Failure evidence is never dropped; waiting for its write also slows the producer down
+            with self._lock:
+                self.written_inline += 1
+            if not await asyncio.to_thread(self._store, artifact_id, data, extension):
+                return None
+        return artifact_id
+
+    @property
+    def thumbnail_extension(self) -> str:
+        return f"thumb.{self.image_format}"
+
+    def path(self, artifact_id: str, extension: Optional[str] = None) -> Path:
+        return self.root / f"{artifact_id}.{extension or self.image_format}"
+
+    def relative_path(self, artifact_id: str, start: Path, extension: Optional[str] = None) -> str:
+        """Path of an artifact as seen from another directory, e.g. the one holding a report."""
+        return Path(os.path.relpath(self.path(artifact_id, extension), start)).as_posix()
+
+    def _encode(self, screenshot: bytes, max_width: Optional[int] = None) -> bytes:
+        if self.image_format == "png" and max_width is None:
+            return screenshot
+        with Image.open(io.BytesIO(screenshot)) as image:
+            if max_width is not None:
+                image.thumbnail((max_width, max_width * 4))
+            if self.image_format != "png":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, IMAGE_FORMATS[self.image_format], quality=self.quality)
+        return buffer.getvalue()
+
+    def _write(self, path: Path, data: bytes):
+        # Write to a unique temporary file then rename, so readers never see a half-written file
+        # and shard processes storing the same artifact never write to the same temporary file
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.bytes_out += len(data)
+
+    def _store(self, artifact_id: str, data: bytes, extension: str) -> bool:
+        """Encode and write one artifact; False if it could not be stored."""
+        try:
+            if self.path(artifact_id, extension).exists():
+                # Written by an earlier run or another shard process
+                with self._lock:
+                    self.deduplicated += 1
+                return True
+            if extension == self.image_format:
+                if self.thumbnail_width:
+                    self._write(
+                        self.path(artifact_id, self.thumbnail_extension),
+                        self._encode(data, self.thumbnail_width)
+                    )
+                self._write(self.path(artifact_id, extension), self._encode(data))
+            else:
+                self._write(self.path(artifact_id, extension), data)
+            with self._lock:
+                self.stored += 1
+            return True
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                # A later put of the same content must try again instead of counting as stored
+                self._known.discard(artifact_id)
+            print(f"Error storing artifact: {e}")
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._store(*item)
+            finally:
+                self._queue.task_done()
+
+    async def flush(self):
+        """Wait until every queued artifact is on disk."""
+        await asyncio.to_thread(self._queue.join)
+
+    async def close(self):
+        """Write every queued artifact and stop the writer thread; a later put starts a new one."""
+        if self._writer.is_alive():
+            await self.flush()
+            self._queue.put_nowait(None)
+            await asyncio.to_thread(self._writer.join)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "written_inline": self.written_inline,
+            "failed": self.failed,
+            "pending": self._queue.qsize(),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
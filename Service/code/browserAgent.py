@@ -1,46 +1,107 @@
 import base64
-from typing import Any, Dict
-from langchain_google_genai import GoogleGenerativeAI
+from typing import Any, Dict, Optional
 from datetime import datetime
 from Models.testsModel import TestStep
 from pathlib import Path
 from playwright.async_api import async_playwright
 from langchain.schema import HumanMessage
+from core.llmGateway import gateway
+from core.models import get_chat_model
+from Service.code.artifactStore import ArtifactStore, encode_for_model
+from Service.code.frameBuffer import FrameBuffer
+from Service.code.executionProfiles import DEFAULT_PROFILE, ExecutionProfile, get_profile
+from Service.code.pageFingerprint import PageAnalysisCache, dom_digest, perceptual_hash
+from Service.code.pageSettle import AdaptiveSettlePolicy, SettlePolicy
 
 class BrowserAgent:
-    def __init__(self):
-        self.browser = None
+    def __init__(self, browser=None, settle_policy: Optional[SettlePolicy] = None, analysis_cache: Optional[PageAnalysisCache] = None,
+                 artifact_store: Optional[ArtifactStore] = None, persist_analysis_screenshots: Optional[bool] = None,
+                 profile: Optional[ExecutionProfile] = None, llm: Optional[Any] = None):
+        self.playwright = None
+        self.browser = browser
         self.context = None
         self.page = None
-        self.llm = GoogleGenerativeAI(model="models/gemini-2.0-flash")
+        # Page analysis sends a screenshot, so it needs a multimodal chat model rather than a text completion one
+        self._llm = llm
         self.test_results_dir = Path("./utils/test_results")
-        self.test_results_dir.mkdir(exist_ok=True)
-        self.screenshots_dir = self.test_results_dir / "screenshots"
-        self.screenshots_dir.mkdir(exist_ok=True)
+        self.test_results_dir.mkdir(exist_ok=True, parents=True)
+        # Headless mode, video, tracing and screenshot frequency
+        self.profile = profile or get_profile(DEFAULT_PROFILE)
+        # Replaces fixed sleeps and networkidle waits after each action
+        self.settle_policy = settle_policy or AdaptiveSettlePolicy()
+        # Shared by all workers so a page state analyzed once is never sent to the LLM again
+        self.analysis_cache = analysis_cache or PageAnalysisCache()
+        # Step screenshots are stored off the critical path and referenced by artifact id
+        self.artifact_store = artifact_store or ArtifactStore()
+        # Frames of the latest steps, written only if the test case fails (buffered screenshot policy)
+        self.frame_buffer = FrameBuffer(self.artifact_store, self.profile.frame_buffer_size)
+        # Analysis screenshots only go to the model unless a report needs them
+        self.persist_analysis_screenshots = (
+            self.profile.persist_analysis_screenshots if persist_analysis_screenshots is None
+            else persist_analysis_screenshots
+        )
+        
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = get_chat_model("gemini-2.0-flash")
+        return self._llm
+        
+    async def launch(self):
+        """Launch Chromium without opening a context."""
+        if self.browser is None:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=self.profile.headless)
+        return self.browser
         
     async def start(self):
         """Start the Playwright browser."""
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=False)
-        self.context = await self.browser.new_context(
-            viewport={"width": 1280, "height": 720},
-            record_video_dir=str(self.test_results_dir / "videos")
-        )
+        await self.launch()
+        options = {"viewport": {"width": 1280, "height": 720}}
+        if self.profile.record_video:
+            options["record_video_dir"] = str(self.test_results_dir / "videos")
+        self.context = await self.browser.new_context(**options)
+        if self.profile.tracing:
+            await self.context.tracing.start(screenshots=True, snapshots=True)
         self.page = await self.context.new_page()
+        self.settle_policy.attach(self.page)
+        
+    def spawn(self, worker_id: int) -> "BrowserAgent":
+        """Create an agent that shares this browser but owns its own context and page."""
+        return BrowserAgent(
+            browser=self.browser,
+            settle_policy=self.settle_policy,
+            analysis_cache=self.analysis_cache,
+            artifact_store=self.artifact_store,
+            persist_analysis_screenshots=self.persist_analysis_screenshots,
+            profile=self.profile,
+            llm=self._llm
+        )
         
     async def stop(self):
         """Stop the Playwright browser."""
         if self.context:
+            if self.profile.tracing:
+                traces_dir = self.test_results_dir / "traces"
+                traces_dir.mkdir(exist_ok=True)
+                await self.context.tracing.stop(
+                    path=str(traces_dir / f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.zip")
+                )
             await self.context.close()
-        if self.browser:
-            await self.browser.close()
+            self.context = None
+        # Only the agent that launched the browser may close it
+        if self.playwright:
+            if self.browser:
+                await self.browser.close()
+            await self.playwright.stop()
+            self.playwright = None
     
     async def execute_step(self, step: TestStep) -> TestStep:
         """Execute a single test step in the browser."""
         action = step.action.lower()
         try:
             if action == "navigate":
-                await self.page.goto(step.input_value, wait_until="networkidle")
+                await self.page.goto(step.input_value, wait_until="domcontentloaded")
                 step.status = "Pass"
                 step.notes = f"Navigated to {step.input_value}"
                 
@@ -97,65 +158,77 @@ class BrowserAgent:
                 step.notes = f"Uploaded file {step.input_value} to {step.element_selector}"
                 
             elif action == "screenshot":
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"step_{step.step_number}_{timestamp}.png"
-                path = self.screenshots_dir / filename
-                await self.page.screenshot(path=str(path))
-                step.screenshot_path = str(path)
+                # The story asked for this screenshot, so it is never dropped
+                step.artifact_id = await self.artifact_store.put(await self.page.screenshot(), keep=True)
                 step.status = "Pass"
-                step.notes = f"Screenshot saved to {path}"
+                step.notes = f"Screenshot saved as artifact {step.artifact_id}"
                 
             else:
                 step.status = "Fail"
                 step.notes = f"Unknown action: {action}"
                 
+            if step.status == "Pass":
+                await self.settle_policy.settle(self.page, action)
+                
         except Exception as e:
             step.status = "Fail"
             step.notes = f"Error: {str(e)}"
-            # Take a screenshot of the failure
+                
+        # Take a screenshot after executing the step when the profile asks for one
+        if self.profile.screenshot_policy == "buffered":
+            await self._buffer_frame(step)
+        elif not step.artifact_id and self.profile.should_screenshot(step.status):
             try:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"error_step_{step.step_number}_{timestamp}.png"
-                path = self.screenshots_dir / filename
-                await self.page.screenshot(path=str(path))
-                step.screenshot_path = str(path)
+                step.artifact_id = await self.artifact_store.put(await self.page.screenshot(), keep=step.status != "Pass")
             except:
                 pass
                 
-        # Always take a screenshot after executing the step (if we don't already have one)
-        if not step.screenshot_path:
+        return step
+        
+    async def _buffer_frame(self, step: TestStep):
+        """Keep the frame of a step in memory; a failing step writes out the whole buffer."""
+        if not step.artifact_id:
             try:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"step_{step.step_number}_{timestamp}.png"
-                path = self.screenshots_dir / filename
-                await self.page.screenshot(path=str(path))
-                step.screenshot_path = str(path)
+                self.frame_buffer.record(step, await self.page.screenshot(), await self.page.content())
             except:
                 pass
-                
-        return step
+        if step.status != "Pass":
+            await self.frame_buffer.flush()
+            
+    async def finish_test_case(self, status: str):
+        """Write the buffered frames of a failed test case and drop those of a passing one."""
+        if status in ("Fail", "Error"):
+            await self.frame_buffer.flush()
+        else:
+            self.frame_buffer.clear()
     
-    async def analyze_page_content(self) -> Dict[str, Any]:
-        """Use AI to analyze the current page content."""
-        # Capture a screenshot
-        screenshot_path = self.screenshots_dir / f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        await self.page.screenshot(path=str(screenshot_path))
-        
-        # Convert screenshot to base64
-        with open(screenshot_path, "rb") as img_file:
-            base64_image = base64.b64encode(img_file.read()).decode('utf-8')
+    async def analyze_page_content(self, persist: bool = False) -> Dict[str, Any]:
+        """Use AI to analyze the current page content.
+
+        The screenshot is stored, and its artifact id returned, when persist_analysis_screenshots
+        is on or the caller's report needs it (persist); otherwise it only goes to the model.
+        """
+        # Capture a screenshot in memory
+        screenshot = await self.page.screenshot()
+        artifact_id = (
+            await self.artifact_store.put(screenshot, keep=persist)
+            if persist or self.persist_analysis_screenshots else None
+        )
         
-        # Get page content
-        page_content = await self.page.content()
+        # Reuse the previous analysis if neither the DOM nor the rendered frame changed
+        digest = await dom_digest(self.page)
+        image_hash = perceptual_hash(screenshot)
+        cached = self.analysis_cache.get(digest, image_hash)
+        if cached is not None:
+            return {
+                **cached,
+                "artifact_id": artifact_id,
+                "timestamp": datetime.now().isoformat(),
+                "cached": True
+            }
         
-        # Get visible text
-        text_content = await self.page.evaluate("""() => {
-            return Array.from(document.querySelectorAll('body *'))
-                .filter(el => el.offsetParent !== null && !['script', 'style'].includes(el.tagName.toLowerCase()))
-                .map(el => el.textContent)
-                .join(' ')
-                .trim();
-        }""")
+        # Downscale and convert to base64 without touching the disk
+        base64_image = base64.b64encode(encode_for_model(screenshot)).decode('utf-8')
         
         # Prompt for the LLM
         prompt = f"""
@@ -170,23 +243,23 @@ class BrowserAgent:
         
         try:
             # Create message with text and image
-            response = await self.llm.ainvoke([
-                HumanMessage(content=[
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_image}"}}
-                ])
+            message = HumanMessage(content=[
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
             ])
+            response = await gateway.call("page_analysis", lambda: self.llm.ainvoke([message]), prompt=prompt)
             
             analysis = response.content
+            self.analysis_cache.put(digest, image_hash, {"summary": analysis})
             
             return {
                 "summary": analysis,
-                "screenshot_path": str(screenshot_path),
+                "artifact_id": artifact_id,
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
             return {
                 "summary": f"Error analyzing page: {str(e)}",
-                "screenshot_path": str(screenshot_path),
+                "artifact_id": artifact_id,
                 "timestamp": datetime.now().isoformat()
             }
\ No newline at end of file
@@ -0,0 +1,69 @@
+from typing import Dict
+
+# When BrowserAgent captures a screenshot after a step; explicit screenshot steps always capture.
+# "buffered" keeps the last frames in memory and only writes them when a step or test case fails.
+SCREENSHOT_POLICIES = ("every_step", "on_failure", "buffered", "never")
+
+
+class ExecutionProfile:
+    """Named bundle of the browser and reporting settings that trade speed for evidence."""
+
+    def __init__(self, name: str, headless: bool, record_video: bool, tracing: bool,
+                 screenshot_policy: str, analysis_policy: str, analysis_sample_rate: int = 3,
+                 persist_analysis_screenshots: bool = False, frame_buffer_size: int = 10):
+        if screenshot_policy not in SCREENSHOT_POLICIES:
+            raise ValueError(f"Unknown screenshot policy '{screenshot_policy}', expected one of {SCREENSHOT_POLICIES}")
+        self.name = name
+        self.headless = headless
+        self.record_video = record_video
+        # Playwright trace (DOM snapshots, screenshots, network) per browser context
+        self.tracing = tracing
+        self.screenshot_policy = screenshot_policy
+        self.analysis_policy = analysis_policy
+        self.analysis_sample_rate = analysis_sample_rate
+        self.persist_analysis_screenshots = persist_analysis_screenshots
+        # Steps of context kept in memory with the buffered screenshot policy
+        self.frame_buffer_size = frame_buffer_size
+
+    def should_screenshot(self, status: str) -> bool:
+        if self.screenshot_policy == "every_step":
+            return True
+        if self.screenshot_policy == "on_failure":
+            return status != "Pass"
+        return False
+
+    def to_dict(self) -> Dict[str, object]:
+        return dict(vars(self))
+
+
+PROFILES: Dict[str, ExecutionProfile] = {
+    # CI-scale runs: no window, no recordings, evidence only when something breaks
+    "fast": ExecutionProfile(
+        "fast", headless=True, record_video=False, tracing=False,
+        screenshot_policy="on_failure", analysis_policy="final_only"
+    ),
+    # Green suites write nothing, failures still get the frames and DOM of the steps leading up to them
+    "ci": ExecutionProfile(
+        "ci", headless=True, record_video=False, tracing=False,
+        screenshot_policy="buffered", analysis_policy="final_only"
+    ),
+    # The historical behaviour: a visible browser, video and a screenshot and analysis per step
+    "debug": ExecutionProfile(
+        "debug", headless=False, record_video=True, tracing=False,
+        screenshot_policy="every_step", analysis_policy="every_step"
+    ),
+    # Everything needed to investigate a failure after the fact
+    "forensic": ExecutionProfile(
+        "forensic", headless=True, record_video=True, tracing=True,
+        screenshot_policy="every_step", analysis_policy="every_step", persist_analysis_screenshots=True
+    ),
+}
+
+DEFAULT_PROFILE = "debug"
+
+
+def get_profile(name: str) -> ExecutionProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown execution profile '{name}', expected one of {list(PROFILES)}")
@@ -0,0 +1,46 @@
+from collections import deque
+from typing import Any, Dict, Optional
+from Models.testsModel import TestStep
+from Service.code.artifactStore import ArtifactStore
+
+
+class FrameBuffer:
+    """Keeps the screenshots and DOM snapshots of the last N steps in memory until a failure needs them."""
+
+    def __init__(self, artifact_store: ArtifactStore, capacity: int = 10):
+        self.artifact_store = artifact_store
+        self.capacity = max(1, capacity)
+        self._frames = deque(maxlen=self.capacity)
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def record(self, step: TestStep, screenshot: bytes, snapshot: Optional[str] = None):
+        if len(self._frames) == self.capacity:
+            self.dropped += 1
+        self._frames.append((step, screenshot, snapshot))
+        self.recorded += 1
+
+    async def flush(self) -> int:
+        """Hand the buffered frames to the artifact store and link them to their steps."""
+        count = len(self._frames)
+        while self._frames:
+            step, screenshot, snapshot = self._frames.popleft()
+            # Only called for failures, so the store must keep these frames even when it is behind
+            step.artifact_id = await self.artifact_store.put(screenshot, keep=True)
+            if snapshot is not None:
+                step.dom_artifact_id = await self.artifact_store.put_snapshot(snapshot, keep=True)
+        self.flushed += count
+        return count
+
+    def clear(self):
+        """Forget the frames of a story that passed."""
+        self._frames.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "buffered": len(self._frames),
+        }
@@ -0,0 +1,96 @@
+import io
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from PIL import Image
+
+# FNV-1a over the URL, title and the tag, class, value and text of every rendered node
+_DOM_DIGEST_SCRIPT = """() => {
+    let hash = 2166136261;
+    const mix = value => {
+        for (let i = 0; i < value.length; i++) {
+            hash ^= value.charCodeAt(i);
+            hash = Math.imul(hash, 16777619);
+        }
+    };
+    mix(location.href);
+    mix(document.title);
+    const root = document.body || document.documentElement;
+    if (!root) return '0:0';
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+        acceptNode: node => ['SCRIPT', 'STYLE', 'NOSCRIPT'].includes(node.nodeName)
+            ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT
+    });
+    let count = 0;
+    for (let node = walker.currentNode; node; node = walker.nextNode()) {
+        count++;
+        if (node.nodeType === Node.TEXT_NODE) {
+            mix(node.nodeValue.trim());
+            continue;
+        }
+        mix(node.nodeName);
+        if (typeof node.className === 'string') mix(node.className);
+        if (typeof node.value === 'string') mix(node.value);
+        if (node.checked) mix('checked');
+        if (node.hidden || node.disabled) mix('off');
+    }
+    return count + ':' + (hash >>> 0).toString(16);
+}"""
+
+
+async def dom_digest(page) -> str:
+    """A cheap digest of the rendered DOM, computed in the page in one round trip."""
+    return await page.evaluate(_DOM_DIGEST_SCRIPT)
+
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """Difference hash of a screenshot; nearby values mean visually similar frames."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PageAnalysisCache:
+    """Remembers page analyses by page-state fingerprint so unchanged pages are not re-analyzed."""
+
+    def __init__(self, max_entries: int = 256, max_distance: int = 4):
+        # Screenshots within max_distance bits of each other count as the same frame
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.analyses = 0
+        self.reused = 0
+
+    def get(self, digest: str, image_hash: int) -> Optional[Dict[str, Any]]:
+        """Return the cached analysis when both the DOM and the screenshot match."""
+        entry = self._entries.get(digest)
+        if entry is None or hamming(entry[0], image_hash) > self.max_distance:
+            return None
+        self._entries.move_to_end(digest)
+        self.reused += 1
+        return entry[1]
+
+    def put(self, digest: str, image_hash: int, analysis: Dict[str, Any]):
+        self.analyses += 1
+        self._entries[digest] = (image_hash, analysis)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.analyses + self.reused
+        return {
+            "analyses": self.analyses,
+            "reused": self.reused,
+            "reuse_rate": round(self.reused / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,164 @@
+import asyncio
+import time
+import weakref
+from typing import Dict, Optional
+from playwright.async_api import Error as PlaywrightError
+
+# Longest we are willing to wait for the page to settle after each kind of action
+DEFAULT_ACTION_CAPS_MS = {
+    "navigate": 8000,
+    "click": 3000,
+    "select": 2000,
+    "file_upload": 2000,
+    "type": 600,
+    "hover": 600,
+    "assert": 0,
+    "wait": 0,
+    "screenshot": 0,
+}
+
+# Resolves once the DOM has had no mutations for quietMs and no finite animation is running,
+# or once capMs has passed, whichever comes first.
+_QUIESCENCE_SCRIPT = """([quietMs, capMs, waitForAnimations]) => new Promise(resolve => {
+    const start = performance.now();
+    let lastMutation = start;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    const animating = () => waitForAnimations && document.getAnimations && document.getAnimations().some(
+        a => a.playState === 'running' && a.effect && a.effect.getComputedTiming().endTime !== Infinity
+    );
+    const check = () => {
+        const now = performance.now();
+        if ((now - lastMutation >= quietMs && !animating()) || now - start >= capMs) {
+            observer.disconnect();
+            resolve(now - start);
+        } else {
+            setTimeout(check, 16);
+        }
+    };
+    check();
+})"""
+
+
+class NetworkTracker:
+    """Tracks the in-flight requests of a page."""
+
+    # Streams stay open for the lifetime of the page and never drain
+    IGNORED_RESOURCE_TYPES = {"websocket", "eventsource", "manifest"}
+
+    def __init__(self, page):
+        self.inflight: Dict[int, float] = {}
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_done)
+        page.on("requestfailed", self._on_done)
+
+    def _on_request(self, request):
+        if request.resource_type not in self.IGNORED_RESOURCE_TYPES:
+            self.inflight[id(request)] = time.monotonic()
+
+    def _on_done(self, request):
+        self.inflight.pop(id(request), None)
+
+    def pending(self, stale_ms: float) -> int:
+        """Requests still running, not counting ones older than stale_ms (long polls)."""
+        now = time.monotonic()
+        # Forget requests abandoned by a navigation; they never report finished or failed
+        for key in [key for key, started in self.inflight.items() if now - started > 60]:
+            del self.inflight[key]
+        cutoff = now - stale_ms / 1000
+        return sum(1 for started in self.inflight.values() if started >= cutoff)
+
+
+class SettlePolicy:
+    """Decides how long to wait after an action before the next step runs."""
+
+    def attach(self, page):
+        pass
+
+    async def settle(self, page, action: str) -> float:
+        return 0.0
+
+
+class FixedDelaySettlePolicy(SettlePolicy):
+    """The old behaviour: always sleep for a fixed delay."""
+
+    def __init__(self, delay_ms: int = 1000):
+        self.delay_ms = delay_ms
+
+    async def settle(self, page, action: str) -> float:
+        await asyncio.sleep(self.delay_ms / 1000)
+        return float(self.delay_ms)
+
+
+class AdaptiveSettlePolicy(SettlePolicy):
+    """Waits for network drain, DOM quiescence and animation end, capped per action."""
+
+    def __init__(self, quiet_ms: int = 150, network_quiet_ms: int = 100, stale_request_ms: int = 2000,
+                 action_caps_ms: Optional[Dict[str, int]] = None, default_cap_ms: int = 2000,
+                 wait_for_animations: bool = True):
+        self.quiet_ms = quiet_ms
+        self.network_quiet_ms = network_quiet_ms
+        self.stale_request_ms = stale_request_ms
+        self.action_caps_ms = {**DEFAULT_ACTION_CAPS_MS, **(action_caps_ms or {})}
+        self.default_cap_ms = default_cap_ms
+        self.wait_for_animations = wait_for_animations
+        self._trackers = weakref.WeakKeyDictionary()
+        self.settles = 0
+        self.capped = 0
+        self.total_ms = 0.0
+
+    def attach(self, page):
+        """Start tracking requests; call before the first action so nothing is missed."""
+        if page not in self._trackers:
+            self._trackers[page] = NetworkTracker(page)
+        return self._trackers[page]
+
+    async def _network_idle(self, tracker: NetworkTracker, deadline: float):
+        quiet_since = None
+        while time.monotonic() < deadline:
+            if tracker.pending(self.stale_request_ms) == 0:
+                quiet_since = quiet_since or time.monotonic()
+                if (time.monotonic() - quiet_since) * 1000 >= self.network_quiet_ms:
+                    return
+            else:
+                quiet_since = None
+            await asyncio.sleep(0.025)
+
+    async def _dom_quiet(self, page, deadline: float):
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                return
+            try:
+                await page.evaluate(_QUIESCENCE_SCRIPT, [self.quiet_ms, remaining_ms, self.wait_for_animations])
+                return
+            except PlaywrightError:
+                # The action started a navigation and destroyed the context; wait for the new document
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=max(remaining_ms, 1))
+                except PlaywrightError:
+                    return
+
+    async def settle(self, page, action: str) -> float:
+        """Wait until the page is quiet or the action's cap runs out; returns the ms spent."""
+        cap_ms = self.action_caps_ms.get(action, self.default_cap_ms)
+        if cap_ms <= 0:
+            return 0.0
+        started = time.monotonic()
+        deadline = started + cap_ms / 1000
+        await self._network_idle(self.attach(page), deadline)
+        await self._dom_quiet(page, deadline)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.settles += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= cap_ms:
+            self.capped += 1
+        return elapsed_ms
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "settles": self.settles,
+            "capped": self.capped,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.settles, 1) if self.settles else 0.0,
+        }
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Visible interactive elements in document order, with an accessible role, name and the most stable selector
+_SNAPSHOT_SCRIPT = """(limit) => {
+    const implicitRoles = {A: 'link', BUTTON: 'button', SELECT: 'combobox', TEXTAREA: 'textbox', SUMMARY: 'button'};
+    const inputRoles = {checkbox: 'checkbox', radio: 'radio', submit: 'button', button: 'button', reset: 'button',
+                        image: 'button', range: 'slider', search: 'searchbox', file: 'button'};
+    const clean = text => (text || '').replace(/\\s+/g, ' ').trim().slice(0, 80);
+    const quote = value => '"' + value.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"') + '"';
+    // Ids with long digit runs or hashes are usually generated per render
+    const stableId = id => id && !/\\d{3,}|[0-9a-f]{8,}|^[0-9]|[:.]/i.test(id);
+    const unique = selector => { try { return document.querySelectorAll(selector).length === 1; } catch (e) { return false; } };
+
+    const roleOf = el => {
+        if (el.getAttribute('role')) return el.getAttribute('role');
+        if (el.tagName === 'INPUT') return inputRoles[(el.type || 'text').toLowerCase()] || 'textbox';
+        if (el.tagName === 'A' && !el.hasAttribute('href')) return 'generic';
+        return implicitRoles[el.tagName] || (el.isContentEditable ? 'textbox' : 'generic');
+    };
+    const nameOf = el => {
+        const labelledBy = el.getAttribute('aria-labelledby');
+        const label = el.labels && el.labels.length ? el.labels[0].innerText : '';
+        return clean(el.getAttribute('aria-label')
+            || (labelledBy && labelledBy.split(' ').map(id => (document.getElementById(id) || {}).innerText || '').join(' '))
+            || label || el.getAttribute('placeholder') || el.getAttribute('alt') || el.getAttribute('title')
+            || (['submit', 'button', 'reset'].includes(el.type) ? el.value : '') || el.innerText);
+    };
+    const selectorOf = (el, name) => {
+        const tag = el.tagName.toLowerCase();
+        if (stableId(el.id) && unique('#' + CSS.escape(el.id))) return '#' + CSS.escape(el.id);
+        for (const attr of ['data-testid', 'data-test', 'data-qa', 'data-cy', 'name', 'aria-label', 'placeholder']) {
+            const value = el.getAttribute(attr);
+            if (value) {
+                const selector = tag + '[' + attr + '=' + quote(value) + ']';
+                if (unique(selector)) return selector;
+            }
+        }
+        if (tag === 'a' && el.getAttribute('href') && unique('a[href=' + quote(el.getAttribute('href')) + ']'))
+            return 'a[href=' + quote(el.getAttribute('href')) + ']';
+        if (name) return tag + ':has-text(' + quote(name) + ')';
+        return null;
+    };
+    const visible = el => {
+        if (el.type === 'hidden' || el.closest('[hidden], [aria-hidden="true"]')) return false;
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+
+    const query = 'a, button, input, select, textarea, summary, [role], [onclick], [contenteditable="true"], [tabindex]:not([tabindex="-1"])';
+    const elements = [];
+    let omitted = 0;
+    for (const el of document.querySelectorAll(query)) {
+        if (!visible(el)) continue;
+        const role = roleOf(el);
+        const name = nameOf(el);
+        if (role === 'generic' && !name) continue;
+        const selector = selectorOf(el, name);
+        if (!selector) continue;
+        if (elements.length >= limit) { omitted++; continue; }
+        const entry = {role, name, selector};
+        if (el.tagName === 'INPUT' && el.type && !['submit', 'button'].includes(el.type)) entry.type = el.type;
+        if (el.disabled) entry.disabled = true;
+        if (el.required) entry.required = true;
+        if (el.tagName === 'SELECT') entry.options = Array.from(el.options).slice(0, 10).map(o => clean(o.text));
+        elements.push(entry);
+    }
+    return {url: location.href, title: document.title, elements, omitted};
+}"""
+
+_URL = re.compile(r"https?://[^\s'\"<>)]+")
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token
+    return (len(text) + 3) // 4
+
+
+def find_url(user_story: str) -> Optional[str]:
+    """The first URL mentioned in a story, which is where its steps will start."""
+    match = _URL.search(user_story)
+    return match.group(0).rstrip(".,;") if match else None
+
+
+class PageSnapshot:
+    """Pruned list of the interactive elements of a page, rendered for an LLM prompt."""
+
+    def __init__(self, url: str, title: str, elements: List[Dict[str, Any]], omitted: int = 0):
+        self.url = url
+        self.title = title
+        self.elements = elements
+        self.omitted = omitted
+        self.created_at = time.monotonic()
+
+    @staticmethod
+    def _line(element: Dict[str, Any]) -> str:
+        flags = [key for key in ("disabled", "required") if element.get(key)]
+        if element.get("type"):
+            flags.append(f"type={element['type']}")
+        if element.get("options"):
+            flags.append("options: " + ", ".join(element["options"]))
+        extra = f" ({'; '.join(flags)})" if flags else ""
+        return f'{element["role"]} "{element["name"]}" -> {element["selector"]}{extra}'
+
+    def _header(self) -> str:
+        return f"Page: {self.title} ({self.url})"
+
+    def _shown(self, token_budget: int) -> List[Dict[str, Any]]:
+        """The elements whose lines fit the budget after the header, in document order."""
+        shown = []
+        used = estimate_tokens(self._header())
+        for element in self.elements:
+            cost = estimate_tokens(self._line(element)) + 1
+            if used + cost > token_budget:
+                break
+            shown.append(element)
+            used += cost
+        return shown
+
+    def render(self, token_budget: int = 1500) -> str:
+        """Element lines in document order until the budget is spent."""
+        lines = [self._line(element) for element in self._shown(token_budget)]
+        hidden = len(self.elements) - len(lines) + self.omitted
+        if hidden:
+            lines.append(f"(+{hidden} more elements not listed)")
+        return "\n".join([self._header(), *lines])
+
+    def digest(self, token_budget: int = 1500) -> str:
+        """Structure of the elements the prompt shows: roles, selectors and input types.
+
+        Names, the title and option labels are left out, so counters, dates and other
+        dynamic text do not change the digest and with it the step cache key.
+        """
+        structure = [[element["role"], element["selector"], element.get("type"),
+                      bool(element.get("disabled")), bool(element.get("required"))]
+                     for element in self._shown(token_budget)]
+        return hashlib.sha256(json.dumps(structure).encode("utf-8")).hexdigest()[:16]
+
+
+class PageSnapshotter:
+    """Takes snapshots in a throwaway context of a shared browser, cached per URL.
+
+    A snapshot is reused for `ttl_seconds`, so stories starting on the same page cost
+    one navigation per run. Across runs the step cache keeps the last digest of each
+    URL and looks steps up under URL plus digest before a snapshot is taken at all.
+    """
+
+    def __init__(self, browser, ttl_seconds: float = 600, max_entries: int = 256, max_parallel: int = 2,
+                 max_elements: int = 300, timeout_ms: int = 15000):
+        self.browser = browser
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_elements = max_elements
+        self.timeout_ms = timeout_ms
+        self.entries: "OrderedDict[str, PageSnapshot]" = OrderedDict()
+        # Stories generated concurrently for the same URL share one navigation
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    async def snapshot(self, url: str) -> Optional[PageSnapshot]:
+        cached = self.entries.get(url)
+        if cached is not None and time.monotonic() - cached.created_at < self.ttl_seconds:
+            self.entries.move_to_end(url)
+            self.hits += 1
+            return cached
+        if url in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[url])
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[url] = future
+        snapshot = None
+        try:
+            snapshot = await self._take(url)
+        except Exception as e:
+            # Generation still works without grounding, only less precisely
+            print(f"Error taking page snapshot of {url}: {e}")
+            self.failures += 1
+        finally:
+            del self.in_flight[url]
+            future.set_result(snapshot)
+        if snapshot is not None:
+            self.entries[url] = snapshot
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return snapshot
+
+    async def _take(self, url: str) -> PageSnapshot:
+        async with self.semaphore:
+            context = await self.browser.new_context(viewport={"width": 1280, "height": 720})
+            try:
+                page = await context.new_page()
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_ms)
+                # Everything the prompt needs comes back in this one round trip
+                data = await page.evaluate(_SNAPSHOT_SCRIPT, self.max_elements)
+            finally:
+                await context.close()
+        return PageSnapshot(data["url"], data["title"], data["elements"], data["omitted"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
@@ -0,0 +1,90 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def _merge(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Merge overlapping (start, end) intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _length(intervals: List[Tuple[float, float]]) -> float:
+    return sum(end - start for start, end in intervals)
+
+
+def _intersection(a: List[Tuple[float, float]], b: List[Tuple[float, float]]) -> float:
+    """Total time covered by both merged interval lists."""
+    i = j = 0
+    total = 0.0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if end > start:
+            total += end - start
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class PipelineMetrics:
+    """Timing of the generation and execution stages of the story pipeline."""
+
+    def __init__(self):
+        self.generation_intervals: List[Tuple[float, float]] = []
+        self.execution_intervals: List[Tuple[float, float]] = []
+        self.executor_starved_seconds = 0.0
+        self.producer_blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.first_step_seconds: List[float] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def record_generation(self, start: float, end: float):
+        self.generation_intervals.append((start, end))
+
+    def record_execution(self, start: float, end: float):
+        self.execution_intervals.append((start, end))
+
+    def record_first_step(self, seconds: float):
+        """Time from asking for a story's steps to having the first one (streaming only)."""
+        self.first_step_seconds.append(seconds)
+
+    def record_queue_depth(self, depth: int):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def summary(self) -> Dict[str, float]:
+        """Busy time per stage and how much of it ran concurrently."""
+        generation = _merge(self.generation_intervals)
+        execution = _merge(self.execution_intervals)
+        generation_busy = _length(generation)
+        execution_busy = _length(execution)
+        overlap = _intersection(generation, execution)
+        wall = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        shorter_stage = min(generation_busy, execution_busy)
+        return {
+            "wall_seconds": round(wall, 3),
+            "generation_busy_seconds": round(generation_busy, 3),
+            "execution_busy_seconds": round(execution_busy, 3),
+            "overlap_seconds": round(overlap, 3),
+            # 1.0 means the shorter stage was completely hidden behind the longer one
+            "overlap_ratio": round(overlap / shorter_stage, 3) if shorter_stage else 0.0,
+            "sequential_estimate_seconds": round(generation_busy + execution_busy, 3),
+            "executor_starved_seconds": round(self.executor_starved_seconds, 3),
+            "producer_blocked_seconds": round(self.producer_blocked_seconds, 3),
+            "max_queue_depth": self.max_queue_depth,
+            "avg_first_step_seconds": round(sum(self.first_step_seconds) / len(self.first_step_seconds), 3)
+            if self.first_step_seconds else None,
+        }
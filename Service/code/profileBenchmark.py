@@ -0,0 +1,145 @@
+# Measures the per-step cost of each execution profile on a local page:
+#   python -m Service.code.profileBenchmark --steps 30 --repeat 3 --llm-latency-ms 1500
+# Page analyses go through the LLM gateway to a stub model with a fixed latency, so
+# LLM_REQUESTS_PER_MINUTE and LLM_BURST should match the quota of the real key.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+from urllib.parse import quote
+from langchain.schema import AIMessage
+from Models.testsModel import TestStep
+from Service.code.aiTestAutomation import should_analyze
+from Service.code.browserAgent import BrowserAgent
+from Service.code.executionProfiles import PROFILES, ExecutionProfile
+
+_PAGE = "data:text/html," + quote("""<!DOCTYPE html>
+<html><body>
+<h1>Profile benchmark</h1>
+<input id="name" placeholder="Name">
+<button id="toggle" onclick="document.getElementById('status').textContent = 'Saved ' + Date.now()">Save</button>
+<p id="status">Idle</p>
+<ul>""" + "".join(f"<li>Row {n}</li>" for n in range(200)) + """</ul>
+</body></html>""")
+
+# Cycled to build the story; none of them navigates, so only the step itself and its evidence are timed
+_ACTIONS = [
+    ("type", "#name", "Jane Doe"),
+    ("click", "#toggle", None),
+    ("assert", "#status", None),
+    ("hover", "#toggle", None),
+]
+
+
+class StubChatModel:
+    """Stands in for the page analysis model: answers after a fixed latency without a network call."""
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        return AIMessage(content="Stub page analysis")
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def benchmark_profile(profile: ExecutionProfile, steps: int, repeat: int, llm_latency_ms: float) -> Dict[str, Any]:
+    """Run the benchmark story on a fresh browser with the given profile, page analyses included."""
+    llm = StubChatModel(llm_latency_ms)
+    agent = BrowserAgent(profile=profile, llm=llm)
+    started = time.perf_counter()
+    await agent.start()
+    startup_ms = (time.perf_counter() - started) * 1000
+    durations = []
+    analysis_ms = 0.0
+    analyses = cached_analyses = 0
+    try:
+        for _ in range(repeat):
+            await agent.execute_step(TestStep(step_number=0, action="navigate", input_value=_PAGE))
+            for n in range(steps):
+                action, selector, value = _ACTIONS[n % len(_ACTIONS)]
+                step = TestStep(step_number=n + 1, action=action, element_selector=selector, input_value=value)
+                step_started = time.perf_counter()
+                await agent.execute_step(step)
+                # A step costs its analysis too, as in AITestAutomation._execute_story
+                if should_analyze(profile.analysis_policy, profile.analysis_sample_rate, n, step.status):
+                    analysis_started = time.perf_counter()
+                    analysis = await agent.analyze_page_content()
+                    analysis_ms += (time.perf_counter() - analysis_started) * 1000
+                    analyses += 1
+                    cached_analyses += bool(analysis.get("cached"))
+                durations.append((time.perf_counter() - step_started) * 1000)
+            # The final state is analyzed under every policy
+            analysis_started = time.perf_counter()
+            analysis = await agent.analyze_page_content()
+            analysis_ms += (time.perf_counter() - analysis_started) * 1000
+            analyses += 1
+            cached_analyses += bool(analysis.get("cached"))
+    finally:
+        # Saving the trace and finishing the videos happens here
+        stopping = time.perf_counter()
+        await agent.stop()
+        await agent.artifact_store.close()
+        teardown_ms = (time.perf_counter() - stopping) * 1000
+    return {
+        "profile": profile.name,
+        "steps": len(durations),
+        "mean_step_ms": round(statistics.mean(durations), 2),
+        "p50_step_ms": round(_percentile(durations, 0.5), 2),
+        "p95_step_ms": round(_percentile(durations, 0.95), 2),
+        "startup_ms": round(startup_ms, 1),
+        "teardown_ms": round(teardown_ms, 1),
+        "artifacts": agent.artifact_store.stats(),
+        "analysis_policy": profile.analysis_policy,
+        "analyses": analyses,
+        "cached_analyses": cached_analyses,
+        "llm_calls": llm.calls,
+        "analysis_ms": round(analysis_ms, 1),
+    }
+
+
+async def run_benchmark(profile_names: List[str], steps: int, repeat: int,
+                        llm_latency_ms: float = 1500) -> List[Dict[str, Any]]:
+    results = []
+    for name in profile_names:
+        print(f"Benchmarking {name} profile...")
+        results.append(await benchmark_profile(PROFILES[name], steps, repeat, llm_latency_ms))
+    # Overhead is relative to the cheapest profile that was measured
+    baseline = min(result["mean_step_ms"] for result in results)
+    for result in results:
+        result["overhead_per_step_ms"] = round(result["mean_step_ms"] - baseline, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-step overhead of the execution profiles")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--steps", type=int, default=30, help="Steps per story")
+    parser.add_argument("--repeat", type=int, default=3, help="Times the story is run per profile")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500,
+                        help="Latency of the stub page analysis model")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.profiles, args.steps, args.repeat, args.llm_latency_ms))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"\n{'profile':<10}{'mean ms':>10}{'p95 ms':>10}{'overhead':>10}{'startup':>10}{'teardown':>10}"
+          f"{'llm calls':>11}{'analysis':>10}")
+    for result in results:
+        print(f"{result['profile']:<10}{result['mean_step_ms']:>10}{result['p95_step_ms']:>10}"
+              f"{result['overhead_per_step_ms']:>10}{result['startup_ms']:>10}{result['teardown_ms']:>10}"
+              f"{result['llm_calls']:>11}{result['analysis_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+from Models.testsModel import TestCase, TestStep
+
+# Control characters (e.g. the ANSI colours in Playwright errors) are not allowed in XML 1.0
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xml_text(text: Optional[str]) -> str:
+    return _INVALID_XML_CHARS.sub("", text or "")
+
+
+class ResultExporter:
+    """Receives every step and test case as soon as it finishes; seconds is None for unmeasured steps."""
+
+    def step_finished(self, test_case: TestCase, step: TestStep, seconds: Optional[float]):
+        pass
+
+    def case_finished(self, test_case: TestCase):
+        pass
+
+    def close(self):
+        pass
+
+
+class NdjsonExporter(ResultExporter):
+    """One JSON object per line, flushed immediately so the file can be tailed during a run."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def _write(self, record: dict):
+        record["timestamp"] = datetime.now().isoformat()
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+
+    def step_finished(self, test_case: TestCase, step: TestStep, seconds: Optional[float]):
+        self._write({"type": "step", "case_id": test_case.id,
+                     "seconds": round(seconds, 3) if seconds is not None else None, **step.model_dump()})
+
+    def case_finished(self, test_case: TestCase):
+        # Steps were already written one by one
+        self._write({"type": "case", **test_case.model_dump(exclude={"steps"}), "step_count": len(test_case.steps)})
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class JUnitXmlExporter(ResultExporter):
+    """JUnit XML with a <testcase> per test case, appended as it finishes.
+
+    Steps are listed in the system-out of their test case rather than as test cases of
+    their own, so the suite's tests, failures and time count every story once.
+
+    The suite element is written with zero counts and padded with spaces; on close it is
+    rewritten in place with the real counts, so nothing has to be buffered until the end.
+    """
+
+    # Room for the counts to grow into
+    _HEADER_PADDING = 48
+
+    def __init__(self, path: str, suite_name: str = "AI Test Automation"):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.suite_name = suite_name
+        self.started_at = datetime.now().isoformat()
+        self.counts = {"tests": 0, "failures": 0, "errors": 0}
+        self.seconds = 0.0
+        # Step lines of the test cases still running, keyed by TC id
+        self._step_lines: Dict[str, List[str]] = {}
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+        self._header_offset = self._file.tell()
+        self._header_length = len(self._suite_header()) + self._HEADER_PADDING
+        self._write_header()
+        self._file.flush()
+
+    def _suite_header(self) -> str:
+        counts = " ".join(f'{key}="{value}"' for key, value in self.counts.items())
+        return (f'<testsuite name={quoteattr(self.suite_name)} timestamp="{self.started_at}" {counts} '
+                f'time="{self.seconds:.3f}"')
+
+    def _write_header(self):
+        # Whitespace before the closing bracket is valid XML and keeps the length fixed
+        self._file.write(self._suite_header().ljust(self._header_length) + ">\n")
+
+    def _testcase(self, classname: str, name: str, seconds: float, status: str, message: Optional[str], output: str):
+        self.counts["tests"] += 1
+        self.seconds += seconds
+        lines = [f'  <testcase classname={quoteattr(_xml_text(classname))} name={quoteattr(_xml_text(name))} '
+                 f'time="{seconds:.3f}">']
+        if status == "Fail":
+            self.counts["failures"] += 1
+            lines.append(f'    <failure message={quoteattr(_xml_text(message))}/>')
+        elif status == "Error":
+            self.counts["errors"] += 1
+            lines.append(f'    <error message={quoteattr(_xml_text(message))}/>')
+        elif status != "Pass":
+            lines.append("    <skipped/>")
+        if output:
+            lines.append(f"    <system-out>{escape(_xml_text(output))}</system-out>")
+        lines.append("  </testcase>\n")
+        self._file.write("\n".join(lines))
+        self._file.flush()
+
+    def step_finished(self, test_case: TestCase, step: TestStep, seconds: Optional[float]):
+        target = step.element_selector or step.input_value or ""
+        timing = f", {seconds:.3f}s" if seconds is not None else ""
+        line = f"Step {step.step_number}: {step.action} {target}".strip() + f" [{step.status or 'Error'}{timing}]"
+        if step.notes:
+            line += f" {step.notes}"
+        self._step_lines.setdefault(test_case.id, []).append(line)
+
+    def case_finished(self, test_case: TestCase):
+        output = "\n".join(filter(None, [test_case.summary, *self._step_lines.pop(test_case.id, [])]))
+        self._testcase(
+            classname="user_stories",
+            name=f"{test_case.id}: {test_case.user_story}",
+            seconds=test_case.duration_seconds or 0.0,
+            status=test_case.status,
+            message=test_case.summary,
+            output=output
+        )
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write("</testsuite>\n</testsuites>\n")
+        self._file.seek(self._header_offset)
+        self._write_header()
+        self._file.close()
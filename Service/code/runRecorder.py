@@ -0,0 +1,171 @@
+import hashlib
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from DB.db import SessionLocal, TestCaseRecord, TestRun, TestStepRecord, ensure_schema
+from Models.testsModel import TestCase, TestStep
+from Service.code.analyticsService import update_aggregates
+from Service.code.resultExporters import ResultExporter
+from Service.code.stepCache import StepCache
+
+
+def story_hash(user_story: str) -> str:
+    """Stable key for a story across runs, insensitive to whitespace but not to case."""
+    return hashlib.sha256(StepCache.normalize(user_story).encode("utf-8")).hexdigest()
+
+
+class RunRecorder(ResultExporter):
+    """Persists the cases and steps of a run with one bulk insert per table and batch.
+
+    Rows are buffered as plain dicts with client-side ids and written every `batch_size`
+    cases on a background thread, so a long suite pays a few round trips to the database
+    instead of one per step, and the event loop never waits on them. The story and step
+    aggregates behind the analytics API are updated in the same transaction.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, excel_path: str = "", batch_size: int = 50):
+        self.batch_size = max(1, batch_size)
+        self.owns_run = run_id is None
+        self.run_id = run_id or uuid.uuid4().hex
+        self.counts = {"passed": 0, "failed": 0, "errors": 0}
+        self.flushes = 0
+        self.rows_written = 0
+        self._case_rows: List[Dict[str, Any]] = []
+        self._step_rows: List[Dict[str, Any]] = []
+        # Steps arrive before their test case, keyed by TC id until the case row exists
+        self._pending_steps: Dict[str, List[Dict[str, Any]]] = {}
+        # A single writer keeps batches in order and the foreign keys satisfied
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-recorder")
+        self._last_write: Optional[Future] = None
+        self._heartbeat = None
+
+        ensure_schema()
+        if self.owns_run:
+            # Imported here: the API's run service is only needed for runs the recorder owns
+            from Service.code.testRunService import PROCESS_ID, RunHeartbeat
+            # CLI runs have no row from the API, so the recorder creates one and keeps it alive
+            now = datetime.utcnow()
+            self._execute([(insert(TestRun), [{
+                "id": self.run_id,
+                "excel_path": excel_path,
+                "status": "running",
+                "created_at": now,
+                "started_at": now,
+                "owner": PROCESS_ID,
+                "heartbeat_at": now,
+            }])])
+            self._heartbeat = RunHeartbeat(self.run_id)
+            self._heartbeat.start()
+
+    def step_finished(self, test_case: TestCase, step: TestStep, seconds: Optional[float]):
+        self._pending_steps.setdefault(test_case.id, []).append({
+            "id": uuid.uuid4().hex,
+            "run_id": self.run_id,
+            "step_number": step.step_number,
+            "action": step.action,
+            "element_selector": step.element_selector,
+            "input_value": step.input_value,
+            "expected_result": step.expected_result,
+            "status": step.status or "Error",
+            "notes": step.notes,
+            "artifact_id": step.artifact_id,
+            # NULL rather than 0 when the step was not timed, so it stays out of the percentiles
+            "duration_seconds": round(seconds, 3) if seconds is not None else None,
+            "created_at": datetime.utcnow(),
+        })
+
+    def case_finished(self, test_case: TestCase):
+        finished_at = datetime.utcnow()
+        case_row_id = uuid.uuid4().hex
+        key = story_hash(test_case.user_story)
+        self._case_rows.append({
+            "id": case_row_id,
+            "run_id": self.run_id,
+            "case_id": test_case.id,
+            "story_hash": key,
+            "user_story": test_case.user_story,
+            "status": test_case.status,
+            "summary": test_case.summary,
+            "started_at": finished_at - timedelta(seconds=test_case.duration_seconds or 0),
+            "finished_at": finished_at,
+            "duration_seconds": test_case.duration_seconds,
+            "generation_seconds": test_case.generation_seconds,
+            "html_report_path": test_case.html_report_path,
+        })
+        for row in self._pending_steps.pop(test_case.id, []):
+            row.update(test_case_id=case_row_id, story_hash=key)
+            self._step_rows.append(row)
+        self.counts[{"Pass": "passed", "Fail": "failed"}.get(test_case.status, "errors")] += 1
+        if len(self._case_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> Optional[Future]:
+        """Queue the buffered rows for writing and start a new batch."""
+        if not self._case_rows:
+            return self._last_write
+        case_rows, step_rows = self._case_rows, self._step_rows
+        self._case_rows, self._step_rows = [], []
+        self._last_write = self._writer.submit(self._write, case_rows, step_rows)
+        return self._last_write
+
+    def _write(self, case_rows: List[Dict[str, Any]], step_rows: List[Dict[str, Any]]):
+        statements = [(insert(TestCaseRecord), case_rows)]
+        if step_rows:
+            statements.append((insert(TestStepRecord), step_rows))
+        # Two runs creating the aggregate row of the same new story collide once; the retry updates it instead
+        for attempt in range(2):
+            try:
+                self._execute(statements, lambda session: update_aggregates(session, case_rows, step_rows))
+                self.flushes += 1
+                self.rows_written += len(case_rows) + len(step_rows)
+                return
+            except IntegrityError as e:
+                if attempt:
+                    print(f"Error recording test results for run {self.run_id}: {e}")
+            except Exception as e:
+                # Losing the history of a batch must not fail the suite that produced it
+                print(f"Error recording test results for run {self.run_id}: {e}")
+                return
+
+    @staticmethod
+    def _execute(statements, then=None):
+        # A list of parameter dicts makes SQLAlchemy use executemany, which it batches into multi-row INSERTs
+        with SessionLocal() as session:
+            for statement, rows in statements:
+                session.execute(statement, rows)
+            if then is not None:
+                then(session)
+            session.commit()
+
+    def close(self):
+        self.flush()
+        if self._heartbeat is not None:
+            self._heartbeat.stop()
+        if self.owns_run:
+            self._last_write = self._writer.submit(self._finish_run)
+        self._writer.shutdown(wait=True)
+
+    def _finish_run(self):
+        try:
+            with SessionLocal() as session:
+                session.execute(update(TestRun).where(TestRun.id == self.run_id).values(
+                    status="completed",
+                    total=sum(self.counts.values()),
+                    completed=sum(self.counts.values()),
+                    finished_at=datetime.utcnow(),
+                    **self.counts
+                ))
+                session.commit()
+        except Exception as e:
+            print(f"Error finishing run {self.run_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "buffered_cases": len(self._case_rows),
+        }
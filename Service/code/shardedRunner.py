@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from core.llmGateway import gateway
+from Models.testsModel import TestCase
+from Service.code.artifactStore import ArtifactStore
+from Service.code.resultExporters import ResultExporter
+from Service.code.aiTestAutomation import AITestAutomation
+from Service.code.testReporter import TestReporter
+from Service.code.userStoryExtractor import UserStoryExtractor
+
+
+def _run_shard(excel_path: str, shard: List[Tuple[int, str]], total: int, options: Dict[str, Any],
+               processes: int = 1) -> List[Tuple[int, Dict[str, Any]]]:
+    """Worker process entry point: run one shard on its own Playwright instance."""
+    # Every worker has its own gateway, so together they would get the configured quota once per process
+    gateway.share_limits(processes)
+    automation = AITestAutomation(excel_path, **options)
+    executed = asyncio.run(automation.execute(shard, total))
+    # Plain dicts cross the process boundary more cheaply than pydantic models
+    return [(i, tc.model_dump()) for i, tc in executed]
+
+
+class ShardedSuiteRunner:
+    def __init__(self, excel_path: str, workers: int, **options):
+        self.excel_path = excel_path
+        self.workers = max(1, workers)
+        # Result files are written here from the merged results, not by the worker processes
+        self.ndjson_path = options.pop("ndjson_path", None)
+        self.junit_path = options.pop("junit_path", None)
+        self.record_results = options.pop("record_results", False)
+        # Shards are assigned by the scheduler in this process, the workers run them in the given order
+        self.schedule = options.pop("schedule", False)
+        self.plan = None
+        # Passed to the AITestAutomation of every worker process (max_workers, prefetch, ...)
+        self.options = options
+        self.extractor = UserStoryExtractor(excel_path)
+        # Only resolves the paths of the artifacts the worker processes stored
+        self.reporter = TestReporter(artifact_store=ArtifactStore(image_format=options.get("artifact_format", "webp")))
+        self.test_cases = []
+        
+    def shard(self, user_stories: List[str]) -> List[List[Tuple[int, str]]]:
+        """Deal the stories round-robin so every shard gets a mix of the workbook."""
+        if self.schedule:
+            from Service.code.suiteScheduler import SuiteScheduler
+            self.plan = SuiteScheduler(workers=self.workers, contexts=self.options.get("max_workers", 1)).plan(
+                list(enumerate(user_stories))
+            )
+            print(self.plan.describe())
+            return self.plan.shard_stories()
+        shards = [[] for _ in range(self.workers)]
+        for i, story in enumerate(user_stories):
+            shards[i % self.workers].append((i, story))
+        return [shard for shard in shards if shard]
+        
+    def run(self) -> List[TestCase]:
+        """Run the suite across worker processes and merge the results."""
+        print("Starting sharded AI Test Automation")
+        user_stories = self.extractor.extract_user_stories()
+        shards = self.shard(user_stories)
+        print(f"Found {len(user_stories)} user stories, running {len(shards)} shard(s) "
+              f"with {self.options.get('max_workers', 1)} context(s) each")
+        
+        started = time.perf_counter()
+        merged: Dict[int, TestCase] = {}
+        shard_seconds: List[float] = [0.0] * len(shards)
+        # Written by this process as each shard comes back, not by the worker processes
+        exporters = AITestAutomation.open_exporters(self.ndjson_path, self.junit_path, self.record_results,
+                                                    excel_path=self.excel_path)
+        try:
+            # spawn keeps each worker free of the parent's event loop and Playwright state
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as pool:
+                futures = {
+                    pool.submit(_run_shard, self.excel_path, shard, len(user_stories), self.options, len(shards)): n
+                    for n, shard in enumerate(shards)
+                }
+                for future in as_completed(futures):
+                    n = futures[future]
+                    shard_seconds[n] = time.perf_counter() - started
+                    shard_cases = {}
+                    try:
+                        for i, data in future.result():
+                            shard_cases[i] = TestCase(**data)
+                        print(f"Shard {n+1}/{len(shards)} finished after {shard_seconds[n]:.1f}s")
+                    except Exception as e:
+                        print(f"Shard {n+1}/{len(shards)} crashed: {e}")
+                        for i, story in shards[n]:
+                            shard_cases[i] = TestCase(
+                                id=f"TC_{i+1}",
+                                user_story=story,
+                                status="Error",
+                                summary=f"Worker process failed: {str(e)}",
+                                end_time=datetime.now().isoformat()
+                            )
+                    merged.update(shard_cases)
+                    self._export_results(exporters, [shard_cases[i] for i in sorted(shard_cases)])
+        finally:
+            for exporter in exporters:
+                exporter.close()
+                        
+        self.test_cases = [merged[i] for i in sorted(merged)]
+        
+        summary = AITestAutomation.summarize(self.test_cases)
+        summary.update({
+            "worker_processes": len(shards),
+            "contexts_per_process": self.options.get("max_workers", 1),
+            "wall_seconds": round(time.perf_counter() - started, 3),
+            "shard_seconds": [round(seconds, 3) for seconds in shard_seconds],
+        })
+        if self.plan is not None:
+            summary["schedule"] = self.plan.report(summary["wall_seconds"])
+            print(f"Schedule: {summary['schedule']}")
+        AITestAutomation.print_summary(self.test_cases)
+        report_path = self.reporter.generate_suite_summary(self.test_cases, summary)
+        print(f"Suite summary written to: {report_path}")
+        suite_report = self.reporter.start_suite_report()
+        for test_case in self.test_cases:
+            suite_report.add(test_case)
+        print(f"Suite report written to: {suite_report.close()}")
+        # Only resolves artifact paths here, the shard processes wrote the files
+        asyncio.run(self.reporter.artifact_store.close())
+        
+        return self.test_cases
+        
+    @staticmethod
+    def _export_results(exporters: List[ResultExporter], test_cases: List[TestCase]):
+        """Append the results of a finished shard, with the step timings measured by its worker."""
+        for exporter in exporters:
+            try:
+                for test_case in test_cases:
+                    for step in test_case.steps:
+                        exporter.step_finished(test_case, step, step.duration_seconds)
+                    exporter.case_finished(test_case)
+            except Exception as e:
+                print(f"Error exporting results: {e}")
@@ -0,0 +1,89 @@
+# Shows what importing a module costs and whether it touches the network:
+#   python -m Service.code.startupProfile app --top 20
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Runs in a fresh interpreter: records every DNS lookup and connection attempt, then imports the target
+_PROBE = """
+import json, socket, sys, time
+attempts = []
+_connect, _getaddrinfo = socket.socket.connect, socket.getaddrinfo
+def connect(self, address):
+    attempts.append({"call": "connect", "address": str(address)})
+    return _connect(self, address)
+def getaddrinfo(host, *args, **kwargs):
+    attempts.append({"call": "getaddrinfo", "address": str(host)})
+    return _getaddrinfo(host, *args, **kwargs)
+socket.socket.connect, socket.getaddrinfo = connect, getaddrinfo
+started = time.perf_counter()
+error = None
+try:
+    __import__(sys.argv[1])
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+result = {"seconds": time.perf_counter() - started, "network": attempts, "error": error}
+print("STARTUP_PROFILE " + json.dumps(result))
+"""
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `python -X importtime`: self and cumulative microseconds per module."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            # Nesting depth is encoded as indentation of the name
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def profile_import(module: str) -> Dict[str, Any]:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, module],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    result = {"seconds": None, "network": [], "error": process.stderr.strip().splitlines()[-1:] or None}
+    for line in process.stdout.splitlines():
+        if line.startswith("STARTUP_PROFILE "):
+            result = json.loads(line[len("STARTUP_PROFILE "):])
+    result["module"] = module
+    result["imports"] = _parse_importtime(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and network calls of a module")
+    parser.add_argument("module", nargs="?", default="app", help="Module to import, e.g. app or Service.code.aiTestAutomation")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="Print the full profile as JSON")
+    args = parser.parse_args()
+
+    result = profile_import(args.module)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"Importing {args.module} took {result['seconds'] or 0:.3f}s")
+    if result["error"]:
+        print(f"Import failed: {result['error']}")
+    print(f"Network calls during import: {len(result['network'])}")
+    for attempt in result["network"]:
+        print(f"  {attempt['call']} {attempt['address']}")
+    # Imports made directly by the target and its own packages are what there is to act on
+    direct = [row for row in result["imports"] if row["depth"] <= 1]
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for row in sorted(direct, key=lambda row: row["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{row['cumulative_ms']:>14.1f}{row['self_ms']:>10.1f}  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
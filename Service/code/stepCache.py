@@ -0,0 +1,146 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class StepCache:
+    """On-disk SQLite cache of generated test steps with TTL and LRU eviction."""
+
+    def __init__(self, path: str = "./utils/cache/test_steps.sqlite", ttl_seconds: int = 7 * 24 * 3600,
+                 max_entries: int = 5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        # Lookups run on worker threads, so the counters are updated under a lock
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            # WAL lets parallel workers read while another one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS test_steps (
+                    key TEXT PRIMARY KEY,
+                    steps TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_test_steps_last_access ON test_steps (last_access)")
+            # Digest and prompt context of each start page when it was last snapshotted,
+            # so neither a hit nor a miss needs a navigation while they are recent
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_digests (
+                    url TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A short-lived connection per call keeps the cache safe to share across threads and processes
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize(user_story: str) -> str:
+        """Collapse whitespace so cosmetic edits in the workbook don't miss the cache."""
+        return re.sub(r"\s+", " ", user_story).strip()
+
+    @classmethod
+    def make_key(cls, user_story: str, model: str, template_hash: str, page_digest: str = "") -> str:
+        parts = [cls.normalize(user_story), model, template_hash]
+        if page_digest:
+            # Steps grounded on a page snapshot are only valid while the page looks the same
+            parts.append(page_digest)
+        raw = "\x1f".join(parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached steps, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT steps, created_at FROM test_steps WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            steps, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM test_steps WHERE key = ?", (key,))
+                with self._lock:
+                    self.expired += 1
+                    self.misses += 1
+                return None
+            conn.execute("UPDATE test_steps SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return json.loads(steps)
+
+    def put(self, key: str, steps: List[Dict[str, Any]]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO test_steps (key, steps, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(steps), now, now)
+            )
+            self._evict(conn)
+
+    def page_digest(self, url: str, max_age_seconds: float) -> Optional[Tuple[str, str]]:
+        """(digest, prompt context) recorded for the page at url, or None if never recorded or older than max_age_seconds."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest, context, checked_at FROM page_digests WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row[2] > max_age_seconds:
+            return None
+        return row[0], row[1]
+
+    def put_page_digest(self, url: str, digest: str, context: str):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO page_digests (url, digest, context, checked_at) VALUES (?, ?, ?, ?)",
+                         (url, digest, context, time.time()))
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop the least recently used entries beyond max_entries."""
+        (count,) = conn.execute("SELECT COUNT(*) FROM test_steps").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM test_steps WHERE key IN "
+                "(SELECT key FROM test_steps ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            with self._lock:
+                self.evictions += overflow
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM test_steps")
+            conn.execute("DELETE FROM page_digests")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            (entries,) = conn.execute("SELECT COUNT(*) FROM test_steps").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from Models.testsModel import TestStep
+
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+# Characters that may follow a backslash in a JSON string
+_JSON_ESCAPES = set('"\\/bfnrtu')
+
+
+def repair_json(text: str) -> str:
+    """Fix the usual LLM JSON mistakes without another model call.
+
+    Strips markdown fences and surrounding prose, converts single-quoted strings and
+    Python literals, drops trailing commas and closes whatever a truncated answer left open.
+    """
+    text = re.sub(r"```(?:json)?", "", text)
+    starts = [i for i in (text.find("["), text.find("{")) if i != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out = []
+    stack = []
+    quote = None
+    escape = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'":
+                    # \' is not a JSON escape, and a double-quoted string needs none for it
+                    out[-1] = "'"
+                elif ch in _JSON_ESCAPES:
+                    out.append(ch)
+                else:
+                    # Keep any other backslash as a literal one
+                    out.append("\\" + ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                # A double quote inside a single-quoted string
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+        elif ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "[{":
+            stack.append("]" if ch == "[" else "}")
+            out.append(ch)
+        elif ch in "]}":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+        elif ch.isalpha() or ch == "_":
+            word = re.match(r"\w+", text[i:]).group(0)
+            i += len(word)
+            if text[i:].lstrip().startswith(":"):
+                # Unquoted object key
+                out.append(f'"{word}"')
+            else:
+                out.append(_PYTHON_LITERALS.get(word, word))
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Close a truncated answer
+    if escape:
+        out.pop()
+    if quote:
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def parse_steps(text: str) -> List[Dict[str, Any]]:
+    """Parse a JSON array of steps from an LLM answer, repairing it locally if needed."""
+    json_match = re.search(r'\[\s*{.*}\s*\]', text, re.DOTALL)
+    if json_match:
+        try:
+            steps = json.loads(json_match.group(0))
+            if isinstance(steps, list):
+                return steps
+        except json.JSONDecodeError:
+            pass
+    steps = json.loads(repair_json(text))
+    if isinstance(steps, dict):
+        # Some answers wrap the array, e.g. {"steps": [...]}
+        steps = next((value for value in steps.values() if isinstance(value, list)), None)
+    if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+        raise ValueError("Answer does not contain a JSON array of steps")
+    return steps
+
+
+class IncrementalStepParser:
+    """Emits each step object of a streamed JSON array as soon as its closing brace arrives."""
+
+    def __init__(self):
+        self.text = []
+        self.steps: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self._in_array = False
+        self._depth = 0
+        self._quote = None
+        self._escape = False
+        self._current: Optional[List[str]] = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of the completion and return the steps it completed."""
+        completed = []
+        for ch in chunk:
+            self.text.append(ch)
+            if self.finished:
+                continue
+            if not self._in_array:
+                if ch == "[":
+                    self._in_array = True
+                    self._depth = 1
+                continue
+            if self._current is not None:
+                self._current.append(ch)
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._quote = None
+            elif ch in "\"'":
+                self._quote = ch
+            elif ch in "[{":
+                if self._depth == 1 and ch == "{":
+                    self._current = [ch]
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1 and ch == "}" and self._current is not None:
+                    step = self._parse_object("".join(self._current))
+                    self._current = None
+                    if step is not None:
+                        completed.append(step)
+                elif self._depth == 0:
+                    if self.steps or completed:
+                        self.finished = True
+                    else:
+                        # A bracket in the prose before the real array; keep looking
+                        self._in_array = False
+        self.steps.extend(completed)
+        return completed
+
+    def _parse_object(self, text: str) -> Optional[Dict[str, Any]]:
+        for candidate in (text, repair_json(text)):
+            try:
+                step = json.loads(candidate)
+                if isinstance(step, dict):
+                    return step
+            except json.JSONDecodeError:
+                continue
+        self.errors.append(text)
+        return None
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush what a truncated or malformed stream left behind; returns the extra steps."""
+        if self.finished:
+            return []
+        if self._current is not None:
+            # The answer was cut off in the middle of a step; never execute half a step
+            self.errors.append("".join(self._current))
+            self._current = None
+        if not self.steps:
+            steps = parse_steps("".join(self.text))
+            self.steps.extend(steps)
+            return steps
+        return []
+
+
+_END = object()
+
+
+class StepStream:
+    """Hands steps from the task generating a story to the task executing it."""
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+        self.error: Optional[Exception] = None
+        self.started_at = time.perf_counter()
+        self.first_step_seconds: Optional[float] = None
+        self.generation_seconds: Optional[float] = None
+
+    def put(self, step: TestStep):
+        if self.first_step_seconds is None:
+            self.first_step_seconds = time.perf_counter() - self.started_at
+        self._queue.put_nowait(step)
+
+    def close(self, error: Optional[Exception] = None):
+        self.error = error
+        self.generation_seconds = time.perf_counter() - self.started_at
+        self._queue.put_nowait(_END)
+
+    async def __aiter__(self) -> AsyncIterator[TestStep]:
+        while True:
+            step = await self._queue.get()
+            if step is _END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield step
@@ -0,0 +1,137 @@
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+from Service.code.runRecorder import story_hash
+
+# Used for every story while there is no recorded history at all
+DEFAULT_STORY_SECONDS = 60.0
+
+
+def simulate_makespan(seconds: List[float], contexts: int) -> float:
+    """Finish time of the last story when each one goes to the next free browser context, in order."""
+    free_at = [0.0] * max(1, contexts)
+    for duration in seconds:
+        heapq.heapreplace(free_at, free_at[0] + duration)
+    return max(free_at)
+
+
+class StoryEstimate:
+    """Expected duration and failure probability of one story, from its recorded runs."""
+
+    def __init__(self, index: int, story: str, seconds: float, failure_probability: float, known: bool):
+        self.index = index
+        self.story = story
+        self.seconds = seconds
+        self.failure_probability = failure_probability
+        self.known = known
+
+
+class SchedulePlan:
+    """Order and shard assignment chosen by the scheduler, with the makespan it predicts."""
+
+    def __init__(self, shards: List[List[StoryEstimate]], contexts: int, baseline_makespan: float,
+                 failure_threshold: float = 0.5):
+        self.shards = shards
+        self.contexts = contexts
+        self.failure_threshold = failure_threshold
+        self.predicted_makespan = max(
+            (simulate_makespan([estimate.seconds for estimate in shard], contexts) for shard in shards), default=0.0
+        )
+        # The same stories dealt in workbook order, for comparison
+        self.baseline_makespan = baseline_makespan
+
+    @property
+    def order(self) -> List[Tuple[int, str]]:
+        """(index, story) pairs of the first shard, i.e. the whole suite when running in one process."""
+        return self.shard_stories()[0] if self.shards else []
+
+    def shard_stories(self) -> List[List[Tuple[int, str]]]:
+        return [[(estimate.index, estimate.story) for estimate in shard] for shard in self.shards]
+
+    def describe(self) -> str:
+        stories = [estimate for shard in self.shards for estimate in shard]
+        known = sum(estimate.known for estimate in stories)
+        likely_failures = sum(estimate.failure_probability >= self.failure_threshold for estimate in stories)
+        return (f"Scheduled {len(stories)} stories ({known} with history, {likely_failures} likely to fail) "
+                f"across {len(self.shards)} shard(s) x {self.contexts} context(s): predicted makespan "
+                f"{self.predicted_makespan:.1f}s vs {self.baseline_makespan:.1f}s in workbook order")
+
+    def report(self, actual_makespan: float) -> Dict[str, Any]:
+        return {
+            "predicted_makespan_seconds": round(self.predicted_makespan, 3),
+            "baseline_makespan_seconds": round(self.baseline_makespan, 3),
+            "actual_makespan_seconds": round(actual_makespan, 3),
+            # Above 1 the suite ran slower than its history suggested
+            "actual_to_predicted": round(actual_makespan / self.predicted_makespan, 3)
+            if self.predicted_makespan else None,
+        }
+
+
+class SuiteScheduler:
+    """Orders and shards stories from their recorded history to shorten the suite.
+
+    Stories likely to fail run first for fast feedback; within that group and the rest,
+    the longest stories start first (LPT), each assigned to the least loaded shard.
+    """
+
+    def __init__(self, workers: int = 1, contexts: int = 1, failure_threshold: float = 0.5):
+        self.workers = max(1, workers)
+        self.contexts = max(1, contexts)
+        self.failure_threshold = failure_threshold
+
+    @staticmethod
+    def load_history(stories: List[str]) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        """(p50 seconds, pass rate) per story hash from the analytics aggregates."""
+        try:
+            from sqlalchemy import select
+            from DB.db import SessionLocal, StoryStats
+            hashes = list({story_hash(story) for story in stories})
+            with SessionLocal() as session:
+                rows = session.execute(
+                    select(StoryStats.story_hash, StoryStats.p50_seconds, StoryStats.pass_rate)
+                    .where(StoryStats.story_hash.in_(hashes))
+                )
+                return {key: (seconds, pass_rate) for key, seconds, pass_rate in rows}
+        except Exception as e:
+            # Scheduling without history is still a valid, if uninformed, order
+            print(f"Error loading story history, scheduling without it: {e}")
+            return {}
+
+    def estimate(self, indexed_stories: List[Tuple[int, str]],
+                 history: Dict[str, Tuple[Optional[float], Optional[float]]]) -> List[StoryEstimate]:
+        known = [seconds for seconds, _ in history.values() if seconds is not None]
+        # New stories are assumed to be typical of the suite
+        default_seconds = sorted(known)[len(known) // 2] if known else DEFAULT_STORY_SECONDS
+        estimates = []
+        for index, story in indexed_stories:
+            seconds, pass_rate = history.get(story_hash(story), (None, None))
+            estimates.append(StoryEstimate(
+                index, story,
+                seconds=seconds if seconds is not None else default_seconds,
+                failure_probability=1.0 - pass_rate if pass_rate is not None else 0.0,
+                known=seconds is not None
+            ))
+        return estimates
+
+    def plan(self, indexed_stories: List[Tuple[int, str]],
+             history: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> SchedulePlan:
+        if history is None:
+            history = self.load_history([story for _, story in indexed_stories])
+        estimates = self.estimate(indexed_stories, history)
+
+        # The round-robin dealing the suite used before, as the baseline
+        baseline = [estimates[n::self.workers] for n in range(self.workers)]
+        baseline_makespan = max(
+            simulate_makespan([estimate.seconds for estimate in shard], self.contexts) for shard in baseline
+        )
+
+        ordered = sorted(estimates, key=lambda estimate: (
+            estimate.failure_probability < self.failure_threshold, -estimate.seconds, estimate.index
+        ))
+        shards: List[List[StoryEstimate]] = [[] for _ in range(self.workers)]
+        loads = [(0.0, n) for n in range(self.workers)]
+        for estimate in ordered:
+            load, n = heapq.heappop(loads)
+            shards[n].append(estimate)
+            # A shard with several contexts works through its share that much faster
+            heapq.heappush(loads, (load + estimate.seconds / self.contexts, n))
+        return SchedulePlan([shard for shard in shards if shard], self.contexts, baseline_makespan, self.failure_threshold)
@@ -1,124 +1,276 @@
+import json
+import os
+import uuid
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 import jinja2
 from Models.testsModel import TestCase
+from Service.code.artifactStore import ArtifactStore
 
+REPORT_DIR = Path("./utils/test_results/reports")
 
-class TestReporter:
-    def __init__(self):
-        self.template_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(searchpath="./"),
-            autoescape=jinja2.select_autoescape(['html', 'xml'])
+# Opt-in override of the built-in case template. Not looked up in the working directory: older
+# versions wrote a test_report_template.html there that predates artifact ids and shows no screenshots.
+CUSTOM_TEMPLATE_PATH = Path(os.environ["REPORT_TEMPLATE_PATH"]) if os.getenv("REPORT_TEMPLATE_PATH") else None
+
+_CASE_TEMPLATE_SOURCE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>AI Automation Test Report</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; color: #333; }
+        h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+        h2 { color: #2980b9; margin-top: 30px; }
+        .summary { background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 20px 0; }
+        .test-info { display: flex; flex-wrap: wrap; }
+        .test-info div { margin-right: 30px; margin-bottom: 10px; }
+        .steps { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        .steps th, .steps td { border: 1px solid #ddd; padding: 10px; text-align: left; }
+        .steps th { background-color: #f2f2f2; }
+        .step-pass { background-color: #d4edda; }
+        .step-fail { background-color: #f8d7da; }
+        .screenshot { max-width: 800px; margin: 10px 0; border: 1px solid #ddd; }
+        .notes { font-style: italic; color: #666; }
+        .status-pass { color: #28a745; font-weight: bold; }
+        .status-fail { color: #dc3545; font-weight: bold; }
+        .status-not-run { color: #6c757d; font-weight: bold; }
+        .page-analysis { background-color: #e8f4f8; padding: 15px; border-radius: 5px; margin: 20px 0; }
+    </style>
+</head>
+<body>
+    <h1>AI Automation Test Report</h1>
+
+    <div class="summary">
+        <h2>Test Summary</h2>
+        <div class="test-info">
+            <div><strong>User Story:</strong> {{ test_case.user_story }}</div>
+            <div><strong>Status:</strong> <span class="status-{{ test_case.status|lower }}">{{ test_case.status }}</span></div>
+            <div><strong>Start Time:</strong> {{ test_case.start_time }}</div>
+            <div><strong>End Time:</strong> {{ test_case.end_time }}</div>
+            <div><strong>Duration:</strong> {{ test_case.duration_seconds }} seconds</div>
+        </div>
+    </div>
+
+    {% if test_case.summary %}
+    <div class="page-analysis">
+        <h2>Test Summary</h2>
+        <p>{{ test_case.summary }}</p>
+        {% if summary_screenshot %}<img src="{{ summary_screenshot }}" alt="Analyzed page" class="screenshot">{% endif %}
+    </div>
+    {% endif %}
+
+    <h2>Test Steps</h2>
+    <table class="steps">
+        <thead>
+            <tr>
+                <th>#</th>
+                <th>Action</th>
+                <th>Details</th>
+                <th>Expected Result</th>
+                <th>Status</th>
+                <th>Notes</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for step in test_case.steps %}
+            <tr class="step-{{ step.status|lower }}">
+                <td>{{ step.step_number }}</td>
+                <td>{{ step.action }}</td>
+                <td>
+                    {% if step.element_selector %}Selector: {{ step.element_selector }}{% endif %}
+                    {% if step.input_value %}<br>Value: {{ step.input_value }}{% endif %}
+                </td>
+                <td>{{ step.expected_result }}</td>
+                <td class="status-{{ step.status|lower }}">{{ step.status }}</td>
+                <td>{{ step.notes }}</td>
+            </tr>
+            {% set screenshot = screenshots[loop.index0] or step.screenshot_path %}
+            {% set snapshot = snapshots[loop.index0] %}
+            {% set analysis_screenshot = analysis_screenshots[loop.index0] %}
+            {% if screenshot or snapshot or analysis_screenshot %}
+            <tr class="step-{{ step.status|lower }}">
+                <td colspan="6">
+                    {% if screenshot %}<img src="{{ screenshot }}" alt="Step {{ step.step_number }} Screenshot" class="screenshot">{% endif %}
+                    {% if analysis_screenshot %}<p><a href="{{ analysis_screenshot }}">Analyzed page</a></p>{% endif %}
+                    {% if snapshot %}<p><a href="{{ snapshot }}">DOM snapshot</a></p>{% endif %}
+                </td>
+            </tr>
+            {% endif %}
+            {% endfor %}
+        </tbody>
+    </table>
+</body>
+</html>
+"""
+
+_SUITE_HEADER_SOURCE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ title }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.5; margin: 0; padding: 20px; color: #333; }
+        h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+        .totals span { margin-right: 20px; font-weight: bold; }
+        details { border: 1px solid #ddd; border-radius: 5px; margin: 6px 0; }
+        details > summary { cursor: pointer; padding: 8px 12px; }
+        details[open] > summary { border-bottom: 1px solid #ddd; }
+        .case-body { padding: 8px 12px; }
+        .status-pass { color: #28a745; } .status-fail { color: #dc3545; } .status-error { color: #fd7e14; }
+        table { width: 100%; border-collapse: collapse; }
+        th, td { border: 1px solid #eee; padding: 6px; text-align: left; vertical-align: top; }
+        img.thumb { width: 320px; border: 1px solid #ddd; }
+    </style>
+</head>
+<body>
+    <h1>{{ title }}</h1>
+    <p>Started {{ started_at }}</p>
+    <div class="totals" id="totals">Running...</div>
+"""
+
+# One compact fragment per finished test case; thumbnails only load once the case is expanded
+_SUITE_CASE_SOURCE = """<details>
+<summary><span class="status-{{ test_case.status|lower }}">{{ test_case.status }}</span> {{ test_case.id }} ({{ test_case.duration_seconds }}s) - {{ test_case.user_story|truncate(140) }}</summary>
+<div class="case-body">
+<p>{{ test_case.summary }}{% if summary_screenshot %} <a href="{{ summary_screenshot }}">Analyzed page</a>{% endif %}</p>
+<table>
+<tr><th>#</th><th>Action</th><th>Status</th><th>Notes</th><th>Screenshot</th></tr>
+{% for step in test_case.steps %}
+{% set screenshot = screenshots[loop.index0] %}
+<tr><td>{{ step.step_number }}</td><td>{{ step.action }}{% if step.element_selector %} <code>{{ step.element_selector }}</code>{% endif %}</td><td class="status-{{ step.status|lower }}">{{ step.status }}</td><td>{{ step.notes }}</td><td>
+{%- if screenshot %}<a href="{{ screenshot.full }}"><img class="thumb" loading="lazy" src="{{ screenshot.thumb }}" alt="Step {{ step.step_number }}"></a>{% endif %}
+{%- if snapshots[loop.index0] %} <a href="{{ snapshots[loop.index0] }}">DOM snapshot</a>{% endif %}</td></tr>
+{% endfor %}
+</table>
+{% if case_report %}
+<p><a href="{{ case_report }}">Full case report</a></p>
+{% endif %}
+</div>
+</details>
+"""
+
+_SUITE_FOOTER_SOURCE = """    <script>
+        document.getElementById("totals").innerHTML = {{ totals_html|tojson }};
+    </script>
+    <p>Finished {{ finished_at }}</p>
+</body>
+</html>
+"""
+
+# Compiled once per process instead of once per reporter
+_environment = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(searchpath=str(CUSTOM_TEMPLATE_PATH.parent) if CUSTOM_TEMPLATE_PATH else "./"),
+    autoescape=jinja2.select_autoescape(['html', 'xml']),
+    # Keeps the per-case fragments of large suite reports free of template indentation
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=True
+)
+_case_template = _environment.from_string(_CASE_TEMPLATE_SOURCE)
+_suite_header_template = _environment.from_string(_SUITE_HEADER_SOURCE)
+_suite_case_template = _environment.from_string(_SUITE_CASE_SOURCE)
+_suite_footer_template = _environment.from_string(_SUITE_FOOTER_SOURCE)
+
+
+def _get_case_template() -> jinja2.Template:
+    if CUSTOM_TEMPLATE_PATH is not None:
+        # The environment caches the compiled file and only reloads it when it changes
+        return _environment.get_template(CUSTOM_TEMPLATE_PATH.name)
+    return _case_template
+
+
+class SuiteReport:
+    """Suite-level HTML report that is appended to as test cases finish."""
+
+    def __init__(self, path: Path, artifact_store: Optional[ArtifactStore] = None, title: str = "AI Automation Suite Report"):
+        self.path = path
+        self.artifact_store = artifact_store
+        self.counts = {"Pass": 0, "Fail": 0, "Error": 0}
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(_suite_header_template.render(title=title, started_at=datetime.now().isoformat()))
+        self._file.flush()
+        
+    def add(self, test_case: TestCase):
+        """Append a finished test case; the file is readable after every call."""
+        self.counts[test_case.status] = self.counts.get(test_case.status, 0) + 1
+        report_dir = self.path.parent
+        store = self.artifact_store
+        screenshots = [
+            {
+                "full": store.relative_path(step.artifact_id, report_dir),
+                "thumb": store.relative_path(step.artifact_id, report_dir, store.thumbnail_extension),
+            } if store is not None and step.artifact_id else None
+            for step in test_case.steps
+        ]
+        snapshots = [
+            store.relative_path(step.dom_artifact_id, report_dir, "html")
+            if store is not None and step.dom_artifact_id else None
+            for step in test_case.steps
+        ]
+        case_report = (
+            Path(os.path.relpath(test_case.html_report_path, report_dir)).as_posix()
+            if test_case.html_report_path else None
+        )
+        summary_screenshot = (
+            store.relative_path(test_case.summary_artifact_id, report_dir)
+            if store is not None and test_case.summary_artifact_id else None
         )
+        self._file.write(_suite_case_template.render(
+            test_case=test_case, screenshots=screenshots, snapshots=snapshots, case_report=case_report,
+            summary_screenshot=summary_screenshot
+        ))
+        self._file.flush()
+        
+    def close(self) -> str:
+        if not self._file.closed:
+            total = sum(self.counts.values())
+            totals_html = f"<span>Total: {total}</span>" + "".join(
+                f"<span class=\"status-{status.lower()}\">{status}: {count}</span>" for status, count in self.counts.items()
+            )
+            self._file.write(_suite_footer_template.render(totals_html=totals_html, finished_at=datetime.now().isoformat()))
+            self._file.close()
+        return str(self.path)
+
+
+class TestReporter:
+    def __init__(self, artifact_store: Optional[ArtifactStore] = None, run_id: Optional[str] = None):
+        # Resolves the artifact ids of steps to image paths
+        self.artifact_store = artifact_store
+        # Part of every file name, so runs started in the same second never overwrite each other's reports
+        self.run_label = (run_id or uuid.uuid4().hex)[:8]
+        
+    def _file_name(self, prefix: str, extension: str) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{prefix}_{timestamp}_{self.run_label}.{extension}"
+        
+    def start_suite_report(self) -> SuiteReport:
+        """Open a suite report that test cases are appended to as they finish."""
+        return SuiteReport(REPORT_DIR / self._file_name("suite_report", "html"), self.artifact_store)
         
-        # Create a simple HTML template if it doesn't exist
-        self.template_path = Path("test_report_template.html")
-        if not self.template_path.exists():
-            self._create_default_template()
-            
-    def _create_default_template(self):
-        """Create a default HTML report template."""
-        template_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>AI Automation Test Report</title>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; color: #333; }
-                h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
-                h2 { color: #2980b9; margin-top: 30px; }
-                .summary { background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 20px 0; }
-                .test-info { display: flex; flex-wrap: wrap; }
-                .test-info div { margin-right: 30px; margin-bottom: 10px; }
-                .steps { width: 100%; border-collapse: collapse; margin: 20px 0; }
-                .steps th, .steps td { border: 1px solid #ddd; padding: 10px; text-align: left; }
-                .steps th { background-color: #f2f2f2; }
-                .step-pass { background-color: #d4edda; }
-                .step-fail { background-color: #f8d7da; }
-                .screenshot { max-width: 800px; margin: 10px 0; border: 1px solid #ddd; }
-                .notes { font-style: italic; color: #666; }
-                .status-pass { color: #28a745; font-weight: bold; }
-                .status-fail { color: #dc3545; font-weight: bold; }
-                .status-not-run { color: #6c757d; font-weight: bold; }
-                .page-analysis { background-color: #e8f4f8; padding: 15px; border-radius: 5px; margin: 20px 0; }
-            </style>
-        </head>
-        <body>
-            <h1>AI Automation Test Report</h1>
-            
-            <div class="summary">
-                <h2>Test Summary</h2>
-                <div class="test-info">
-                    <div><strong>User Story:</strong> {{ test_case.user_story }}</div>
-                    <div><strong>Status:</strong> <span class="status-{{ test_case.status|lower }}">{{ test_case.status }}</span></div>
-                    <div><strong>Start Time:</strong> {{ test_case.start_time }}</div>
-                    <div><strong>End Time:</strong> {{ test_case.end_time }}</div>
-                    <div><strong>Duration:</strong> {{ test_case.duration_seconds }} seconds</div>
-                </div>
-            </div>
-            
-            {% if test_case.summary %}
-            <div class="page-analysis">
-                <h2>Test Summary</h2>
-                <p>{{ test_case.summary }}</p>
-            </div>
-            {% endif %}
-            
-            <h2>Test Steps</h2>
-            <table class="steps">
-                <thead>
-                    <tr>
-                        <th>#</th>
-                        <th>Action</th>
-                        <th>Details</th>
-                        <th>Expected Result</th>
-                        <th>Status</th>
-                        <th>Notes</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for step in test_case.steps %}
-                    <tr class="step-{{ step.status|lower }}">
-                        <td>{{ step.step_number }}</td>
-                        <td>{{ step.action }}</td>
-                        <td>
-                            {% if step.element_selector %}Selector: {{ step.element_selector }}{% endif %}
-                            {% if step.input_value %}<br>Value: {{ step.input_value }}{% endif %}
-                        </td>
-                        <td>{{ step.expected_result }}</td>
-                        <td class="status-{{ step.status|lower }}">{{ step.status }}</td>
-                        <td>{{ step.notes }}</td>
-                    </tr>
-                    {% if step.screenshot_path %}
-                    <tr class="step-{{ step.status|lower }}">
-                        <td colspan="6">
-                            <img src="{{ step.screenshot_path }}" alt="Step {{ step.step_number }} Screenshot" class="screenshot">
-                        </td>
-                    </tr>
-                    {% endif %}
-                    {% endfor %}
-                </tbody>
-            </table>
-        </body>
-        </html>
-        """
-        with open(self.template_path, "w") as f:
-            f.write(template_content)
-    
     def generate_report(self, test_case: TestCase) -> str:
         """Generate HTML report for a test case."""
         try:
-            template = self.template_env.get_template(self.template_path.name)
-            html_content = template.render(test_case=test_case)
-            
             # Write to file
-            report_dir = Path("./utils/test_results/reports")
+            report_dir = REPORT_DIR
             report_dir.mkdir(exist_ok=True, parents=True)
             
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            report_path = report_dir / f"report_{test_case.id}_{timestamp}.html"
+            html_content = _get_case_template().render(
+                test_case=test_case,
+                screenshots=self._artifact_paths(test_case, report_dir, "artifact_id"),
+                snapshots=self._artifact_paths(test_case, report_dir, "dom_artifact_id", "html"),
+                analysis_screenshots=self._analysis_paths(test_case, report_dir),
+                summary_screenshot=(
+                    self.artifact_store.relative_path(test_case.summary_artifact_id, report_dir)
+                    if self.artifact_store is not None and test_case.summary_artifact_id else None
+                )
+            )
+            
+            report_path = report_dir / self._file_name(f"report_{test_case.id}", "html")
             
             with open(report_path, "w") as f:
                 f.write(html_content)
@@ -126,4 +278,43 @@ class TestReporter:
             return str(report_path)
         except Exception as e:
             print(f"Error generating report: {e}")
+            return ""
+            
+    def _artifact_paths(self, test_case: TestCase, report_dir: Path, field: str,
+                        extension: Optional[str] = None) -> List[Optional[str]]:
+        """Path of the given artifact of every step, relative to the report."""
+        if self.artifact_store is None:
+            return []
+        return [
+            self.artifact_store.relative_path(getattr(step, field), report_dir, extension)
+            if getattr(step, field) else None
+            for step in test_case.steps
+        ]
+
+    def _analysis_paths(self, test_case: TestCase, report_dir: Path) -> List[Optional[str]]:
+        """Path of the analysis screenshot of every step, unless it is the step screenshot itself."""
+        if self.artifact_store is None:
+            return []
+        return [
+            self.artifact_store.relative_path(step.analysis_artifact_id, report_dir)
+            if step.analysis_artifact_id and step.analysis_artifact_id != step.artifact_id else None
+            for step in test_case.steps
+        ]
+        
+    def generate_suite_summary(self, test_cases: List[TestCase], summary: Dict[str, Any]) -> str:
+        """Write a JSON summary of a whole suite run."""
+        try:
+            REPORT_DIR.mkdir(exist_ok=True, parents=True)
+            
+            report_path = REPORT_DIR / self._file_name("suite_summary", "json")
+            
+            with open(report_path, "w") as f:
+                json.dump({
+                    "summary": summary,
+                    "test_cases": [tc.model_dump() for tc in test_cases]
+                }, f, indent=2)
+                
+            return str(report_path)
+        except Exception as e:
+            print(f"Error generating suite summary: {e}")
             return ""
\ No newline at end of file
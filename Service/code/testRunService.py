@@ -0,0 +1,214 @@
+import asyncio
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from DB.db import SessionLocal, TestRun, ensure_schema
+from Models.testRunModel import TestRunRequest, TestRunResponse
+from Models.testsModel import TestCase
+from webConfig import config
+
+# Suites run on their own threads and event loops so they never block request handling
+executor = ThreadPoolExecutor(max_workers=config.MAX_CONCURRENT_RUNS, thread_name_prefix="test-run")
+
+# Recorded as the owner of every run this server process claims
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+WORKBOOK_SUFFIXES = (".xlsx", ".xls")
+
+
+def resolve_workbook(excel_path: str) -> str:
+    """Absolute path of a workbook inside WORKBOOK_DIR; raises ValueError for anything else."""
+    root = Path(config.WORKBOOK_DIR).resolve()
+    path = (root / excel_path).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"Workbook '{excel_path}' is outside the workbook directory")
+    if path.suffix.lower() not in WORKBOOK_SUFFIXES:
+        raise ValueError(f"Workbook '{excel_path}' is not an Excel file, expected one of {list(WORKBOOK_SUFFIXES)}")
+    if not path.is_file():
+        raise ValueError(f"Workbook '{excel_path}' not found")
+    return str(path)
+
+
+def workbook_name(excel_path: str) -> str:
+    """A stored workbook path as clients see it: relative to WORKBOOK_DIR, or just the file name."""
+    path = Path(excel_path)
+    if not path.is_absolute():
+        return path.as_posix()
+    # Runs queued by older versions and CLI runs store absolute paths
+    root = Path(config.WORKBOOK_DIR).resolve()
+    return path.relative_to(root).as_posix() if path.is_relative_to(root) else path.name
+
+
+def to_response(run: TestRun) -> TestRunResponse:
+    return TestRunResponse(
+        run_id=run.id,
+        status=run.status,
+        excel_path=workbook_name(run.excel_path),
+        total=run.total or 0,
+        completed=run.completed or 0,
+        passed=run.passed or 0,
+        failed=run.failed or 0,
+        errors=run.errors or 0,
+        message=run.message,
+        summary=run.summary,
+        created_at=run.created_at,
+        started_at=run.started_at,
+        finished_at=run.finished_at
+    )
+
+
+def create_run(db: Session, request: TestRunRequest) -> TestRunResponse:
+    """
+    
+    Persist a queued run and hand it to the background executor.
+    
+    """
+    # Stored relative to WORKBOOK_DIR; _execute_run resolves and checks it again
+    workbook = Path(resolve_workbook(request.excel_path)).relative_to(Path(config.WORKBOOK_DIR).resolve())
+    run = TestRun(
+        id=uuid.uuid4().hex,
+        excel_path=workbook.as_posix(),
+        max_workers=request.max_workers,
+        status="queued"
+    )
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    executor.submit(_execute_run, run.id)
+    return to_response(run)
+
+
+def get_run(db: Session, run_id: str) -> Optional[TestRunResponse]:
+    run = db.get(TestRun, run_id)
+    return to_response(run) if run else None
+
+
+def list_runs(db: Session, limit: int = 50) -> List[TestRunResponse]:
+    runs = db.query(TestRun).order_by(TestRun.created_at.desc()).limit(limit).all()
+    return [to_response(run) for run in runs]
+
+
+def recover_runs():
+    """
+    
+    Re-queue runs that never started and mark running runs whose process stopped
+    sending heartbeats as interrupted. Runs live in other server processes keep running.
+    
+    """
+    ensure_schema()
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=config.RUN_STALE_SECONDS)
+        # One conditional update, so a heartbeat landing meanwhile keeps its run alive
+        db.query(TestRun).filter(
+            TestRun.status == "running",
+            or_(TestRun.heartbeat_at.is_(None), TestRun.heartbeat_at < stale_before)
+        ).update({
+            "status": "interrupted",
+            "message": "The server process running it stopped while it was in progress",
+            "finished_at": now
+        }, synchronize_session=False)
+        queued = [run.id for run in db.query(TestRun).filter(TestRun.status == "queued").all()]
+        db.commit()
+    finally:
+        db.close()
+    for run_id in queued:
+        executor.submit(_execute_run, run_id)
+
+
+def _update_run(run_id: str, **fields):
+    db = SessionLocal()
+    try:
+        db.query(TestRun).filter(TestRun.id == run_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+class RunHeartbeat:
+    """Refreshes heartbeat_at of a running run, so recover_runs in other processes leaves it alone."""
+
+    def __init__(self, run_id: str, interval: float = config.RUN_HEARTBEAT_SECONDS):
+        self.run_id = run_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"heartbeat-{run_id[:8]}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            try:
+                _update_run(self.run_id, heartbeat_at=datetime.utcnow())
+            except Exception as e:
+                print(f"Error updating the heartbeat of test run {self.run_id}: {e}")
+
+
+def _execute_run(run_id: str):
+    """Executor entry point: run the whole suite and record its progress."""
+    db = SessionLocal()
+    try:
+        # Claim the run atomically so a run re-queued by another server process only executes once
+        now = datetime.utcnow()
+        claimed = db.query(TestRun).filter(TestRun.id == run_id, TestRun.status == "queued").update(
+            {"status": "running", "started_at": now, "owner": PROCESS_ID, "heartbeat_at": now}
+        )
+        db.commit()
+        if not claimed:
+            return
+        run = db.get(TestRun, run_id)
+        excel_path, max_workers = run.excel_path, run.max_workers or 1
+    finally:
+        db.close()
+        
+    heartbeat = RunHeartbeat(run_id)
+    heartbeat.start()
+
+    counts = {"passed": 0, "failed": 0, "errors": 0}
+    # Progress is reported on the suite's event loop, so its database round trips run on this thread, in order
+    progress_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"run-progress-{run_id[:8]}")
+    
+    def write_progress(fields):
+        try:
+            _update_run(run_id, **fields)
+        except Exception as e:
+            print(f"Error updating the progress of test run {run_id}: {e}")
+    
+    def on_progress(completed: int, total: int, test_case: Optional[TestCase]):
+        if test_case is not None:
+            key = {"Pass": "passed", "Fail": "failed"}.get(test_case.status, "errors")
+            counts[key] += 1
+        progress_writer.submit(write_progress, dict(completed=completed, total=total, **counts))
+        
+    try:
+        # Queued before workbooks were validated, or WORKBOOK_DIR changed since
+        excel_path = resolve_workbook(excel_path)
+        # Imported on first use: it pulls in Playwright, LangChain and Pillow, which the API does not need to start
+        from Service.code.aiTestAutomation import AITestAutomation
+        automation = AITestAutomation(excel_path, max_workers=max_workers, progress_callback=on_progress,
+                                      run_id=run_id)
+        test_cases = asyncio.run(automation.run())
+        summary = AITestAutomation.summarize(test_cases)
+        summary["pipeline"] = automation.metrics.summary()
+        summary["reports"] = {tc.id: tc.html_report_path for tc in test_cases}
+        outcome = dict(status="completed", summary=summary)
+    except Exception as e:
+        print(f"Error executing test run {run_id}: {e}")
+        outcome = dict(status="failed", message=str(e))
+    finally:
+        # Progress still queued must land before the final status, never after it
+        progress_writer.shutdown(wait=True)
+        heartbeat.stop()
+    _update_run(run_id, finished_at=datetime.utcnow(), **outcome)
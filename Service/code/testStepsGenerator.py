@@ -1,15 +1,24 @@
+import asyncio
+import hashlib
 import json
 import re
-from typing import Dict, List, Any
-from langchain_google_genai import GoogleGenerativeAI
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from core.llmGateway import gateway
+from core.models import get_llm
+from Service.code.pageSnapshot import PageSnapshotter, find_url
+from Service.code.stepCache import StepCache
+from Service.code.stepStreamParser import IncrementalStepParser, parse_steps, repair_json
 
 
 class PlaywrightCodeGenerator:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, bypass_cache: bool = False, cache: Optional[StepCache] = None,
+                 snapshotter: Optional[PageSnapshotter] = None, snapshot_token_budget: int = 1500,
+                 page_recheck_seconds: int = 24 * 3600):
         # Initialize the LLM
-        self.llm = GoogleGenerativeAI(model="models/gemini-2.0-flash")
+        self.model_name = "models/gemini-2.0-flash"
+        self.llm = get_llm(self.model_name)
         
         # System prompt to guide the LLM
         self.system_prompt = """
@@ -45,52 +54,151 @@ class PlaywrightCodeGenerator:
         # Set up the prompt template
         self.template = """
         User Story: {user_story}
-        
+        {page_context}
         Generate a detailed sequence of test steps that can be automated with Playwright to verify this user story.
         Focus on concrete actions like navigation, clicks, typing, and assertions.
         """
         self.prompt = PromptTemplate(
-            input_variables=["user_story"],
+            input_variables=["user_story", "page_context"],
             template=self.template
         )
         
+        # Several stories answered in one call, keyed by story id
+        self.batch_template = """
+        {system_prompt}
+        
+        Generate the test steps for each of the following user stories.
+        Return ONLY a JSON object whose keys are the story ids below and whose values are the JSON arrays of steps.
+        
+        {stories}
+        """
+        
         # Create the chain
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
         
+        # Cached steps are only valid for the same model and prompts
+        prompts = self.system_prompt + self.template + self.batch_template
+        self.template_hash = hashlib.sha256(prompts.encode("utf-8")).hexdigest()
+        self.cache = (cache or StepCache()) if use_cache else None
+        # Skip cache reads but still refresh the entries with new generations
+        self.bypass_cache = bypass_cache
+        # Grounds the prompts on the interactive elements of the story's start page; set once a browser runs
+        self.snapshotter = snapshotter
+        self.snapshot_token_budget = snapshot_token_budget
+        # Cached steps are served under the recorded digest of their start page until it is this old
+        self.page_recheck_seconds = page_recheck_seconds
+        
+    def cache_key(self, user_story: str, page_digest: str = "") -> str:
+        return StepCache.make_key(user_story, self.model_name, self.template_hash, page_digest)
+        
+    async def page_context(self, user_story: str) -> Tuple[str, str]:
+        """Prompt section describing the story's start page and the digest of its snapshot, or empty strings."""
+        url = find_url(user_story)
+        if self.snapshotter is None or url is None:
+            return "", ""
+        snapshot = await self.snapshotter.snapshot(url)
+        if snapshot is None:
+            return "", ""
+        if not snapshot.elements:
+            context, digest = "", ""
+        else:
+            context = ("Interactive elements on the start page; use these selectors where they fit the story:\n"
+                       + snapshot.render(self.snapshot_token_budget) + "\n")
+            digest = snapshot.digest(self.snapshot_token_budget)
+        if self.cache:
+            await asyncio.to_thread(self.cache.put_page_digest, url, digest, context)
+        return context, digest
+        
+    async def lookup(self, user_story: str) -> Tuple[Optional[List[Dict[str, Any]]], str, str]:
+        """
+
+        Cached steps of a story, or None with the page context and cache key to generate them with.
+
+        While the story's start page was snapshotted recently, the cache is checked once under
+        its recorded digest and a miss is generated with the recorded page context, so neither
+        needs a navigation. The page is only snapshotted when nothing recent was recorded.
+
+        """
+        # The cache is SQLite with a 30 s busy timeout; its calls run on worker threads, never on the event loop
+        use_cache = self.cache is not None and not self.bypass_cache
+        url = find_url(user_story)
+        if use_cache and self.snapshotter is not None and url is not None:
+            recorded = await asyncio.to_thread(self.cache.page_digest, url, self.page_recheck_seconds)
+            if recorded is not None:
+                digest, page_context = recorded
+                key = self.cache_key(user_story, digest)
+                cached = await asyncio.to_thread(self.cache.get, key)
+                return cached, "" if cached is not None else page_context, key
+        page_context, page_digest = await self.page_context(user_story)
+        key = self.cache_key(user_story, page_digest)
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached, page_context, key
+        return None, page_context, key
+        
     async def generate_test_steps(self, user_story: str) -> List[Dict[str, Any]]:
         """Generate test steps based on the user story."""
-        try:
-            # First, get the AI to generate the steps description
-            result = await self.chain.arun(user_story=user_story)
-            
-            # Parse the result to extract the JSON part
-            # This is a bit tricky as the model might return additional text
-            json_pattern = r'\[\s*{.*}\s*\]'
-            json_match = re.search(json_pattern, result, re.DOTALL)
-            
-            if json_match:
-                json_str = json_match.group(0)
-                steps = json.loads(json_str)
-                return steps
+        cached, page_context, key = await self.lookup(user_story)
+        if cached is not None:
+            return cached
+        return await self._generate_and_cache(user_story, page_context, key)
+        
+    async def generate_test_steps_batch(self, user_stories: Dict[str, str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Generate test steps for several stories, keyed by story id, with one LLM call."""
+        results = {}
+        missing = {}
+        contexts = {}
+        # Snapshots of different start pages are taken concurrently; the snapshotter still bounds navigations
+        lookups = await asyncio.gather(*[self.lookup(user_story) for user_story in user_stories.values()])
+        for (story_id, user_story), (cached, page_context, key) in zip(user_stories.items(), lookups):
+            contexts[story_id] = (page_context, key)
+            if cached is not None:
+                results[story_id] = cached
             else:
-                # If no JSON is found, try to generate it more directly
-                direct_prompt = f"""
-                Convert this user story into a JSON array of test steps:
-                {user_story}
+                missing[story_id] = user_story
+                
+        answer = {}
+        if len(missing) > 1:
+            try:
+                answer = await self._generate_batch(missing, {story_id: contexts[story_id][0] for story_id in missing})
+            except Exception as e:
+                print(f"Error generating batched test steps: {e}")
                 
-                Return ONLY the JSON array with this format:
-                [
-                    {{"step_number": 1, "action": "navigate", "element_selector": null, "input_value": "URL", "expected_result": "outcome"}},
-                    ...
-                ]
-                """
-                direct_result = await self.llm.ainvoke(direct_prompt)
-                # Extract JSON from the result
-                json_match = re.search(r'\[\s*{.*}\s*\]', direct_result, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group(0))
-                else:
-                    raise ValueError("Failed to generate JSON test steps")
+        for story_id, user_story in missing.items():
+            page_context, key = contexts[story_id]
+            steps = answer.get(story_id)
+            if isinstance(steps, list) and steps and all(isinstance(step, dict) for step in steps):
+                results[story_id] = steps
+                if self.cache:
+                    await asyncio.to_thread(self.cache.put, key, steps)
+            else:
+                # Anything the batch answer lost gets its own request
+                results[story_id] = await self._generate_and_cache(user_story, page_context, key)
+        return results
+        
+    async def _generate_batch(self, user_stories: Dict[str, str],
+                              page_contexts: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        page_contexts = page_contexts or {}
+        stories = "\n".join(f"Story id: {story_id}\nUser Story: {user_story}\n{page_contexts.get(story_id, '')}"
+                            for story_id, user_story in user_stories.items())
+        prompt = self.batch_template.format(system_prompt=self.system_prompt, stories=stories)
+        result = await gateway.call("step_generator", lambda: self.llm.ainvoke(prompt), prompt=prompt)
+        json_match = re.search(r'\{.*\}', result, re.DOTALL)
+        try:
+            answer = json.loads(json_match.group(0)) if json_match else None
+        except json.JSONDecodeError:
+            answer = None
+        if not isinstance(answer, dict):
+            answer = json.loads(repair_json(result))
+        if not isinstance(answer, dict):
+            raise ValueError("Batched answer is not a JSON object")
+        return answer
+        
+    async def _generate_and_cache(self, user_story: str, page_context: str = "",
+                                  key: Optional[str] = None) -> List[Dict[str, Any]]:
+        try:
+            steps = await self._generate_test_steps(user_story, page_context)
         except Exception as e:
             print(f"Error generating test steps: {e}")
             # Return a basic step as fallback
@@ -103,3 +211,71 @@ class PlaywrightCodeGenerator:
                     "expected_result": "Error in test step generation"
                 }
             ]
+            
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, key or self.cache_key(user_story), steps)
+        return steps
+        
+    async def _generate_test_steps(self, user_story: str, page_context: str = "") -> List[Dict[str, Any]]:
+        """Call the LLM and extract the JSON steps; raises when no steps can be parsed."""
+        # First, get the AI to generate the steps description
+        result = await gateway.call("step_generator",
+                                    lambda: self.chain.arun(user_story=user_story, page_context=page_context),
+                                    prompt=self.prompt.format(user_story=user_story, page_context=page_context))
+        
+        # The model might return additional text or slightly broken JSON; repair it locally first
+        try:
+            return parse_steps(result)
+        except ValueError:
+            pass
+        return await self._generate_direct(user_story, page_context)
+        
+    async def _generate_direct(self, user_story: str, page_context: str = "") -> List[Dict[str, Any]]:
+        """Retry with a stricter prompt when the first answer could not be repaired."""
+        direct_prompt = f"""
+        Convert this user story into a JSON array of test steps:
+        {user_story}
+        {page_context}
+        Return ONLY the JSON array with this format:
+        [
+            {{"step_number": 1, "action": "navigate", "element_selector": null, "input_value": "URL", "expected_result": "outcome"}},
+            ...
+        ]
+        """
+        direct_result = await gateway.call("step_generator", lambda: self.llm.ainvoke(direct_prompt), prompt=direct_prompt)
+        try:
+            return parse_steps(direct_result)
+        except ValueError:
+            raise ValueError("Failed to generate JSON test steps")
+            
+    async def stream_test_steps(self, user_story: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield each test step as soon as the model has finished writing it."""
+        cached, page_context, key = await self.lookup(user_story)
+        if cached is not None:
+            for step in cached:
+                yield step
+            return
+                
+        parser = IncrementalStepParser()
+        try:
+            prompt = self.prompt.format(user_story=user_story, page_context=page_context)
+            async for chunk in gateway.stream("step_generator", lambda: self.llm.astream(prompt), prompt=prompt):
+                for step in parser.feed(chunk):
+                    yield step
+            for step in parser.finish():
+                yield step
+        except ValueError:
+            # Nothing usable in the stream even after local repair
+            pass
+        except Exception as e:
+            if parser.steps:
+                raise
+            print(f"Error streaming test steps: {e}")
+            
+        if not parser.steps:
+            # Nothing was executed yet, so the whole story can still fall back to a regular request
+            for step in await self._generate_and_cache(user_story, page_context, key):
+                yield step
+            return
+        if self.cache and not parser.errors:
+            await asyncio.to_thread(self.cache.put, key, parser.steps)
@@ -1,14 +1,19 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 
+# The rate-limited LLM gateway and the client registry are shared with the main project. This app
+# runs from its own directory inside the same checkout, which has no installable package, so the
+# checkout root is put on the import path (the FastAPI backend reaches pageSettle the same way).
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from core.llmGateway import gateway
+from core.models import get_chat_model
 
 api_key = os.getenv("GEMINI_API_KEY")
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.2)
-
 template = """Generate Playwright Python code (sync version) for this test case:
 
 {test_case}
@@ -26,7 +31,12 @@ prompt = PromptTemplate(
 
 async def generate_test_script(test_case: str) -> str:
     formatted_prompt = prompt.format(test_case=test_case)
-    response = llm.invoke(formatted_prompt)
+    llm = get_chat_model("gemini-2.0-flash", temperature=0.2)
+    response = await gateway.call(
+        "test_script_generator",
+        lambda: llm.ainvoke(formatted_prompt),
+        prompt=formatted_prompt
+    )
     raw_code = response.content  
     code = clean_code(raw_code)
     print(code)
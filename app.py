@@ -1,15 +1,17 @@
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from webConfig import config
-from DB.db import engine, Base
+from DB.db import ensure_schema
 
 import Controllers.submissionContoller as submission
 import Controllers.testController as tests
 import Controllers.playwright_controller as playwright
+import Controllers.analyticsController as analytics
+from Service.code.testRunService import recover_runs
 
 app = FastAPI(title=config.APP_NAME)
-Base.metadata.create_all(engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,10 +21,17 @@ app.add_middleware(
     allow_headers = ["*"]
 )
 
+@app.on_event("startup")
+def resume_test_runs():
+    # Recovery talks to the database, so it must not hold up the server coming up. Runs created
+    # meanwhile are safe: claiming a run sets a fresh heartbeat, and only stale heartbeats are interrupted.
+    threading.Thread(target=recover_runs, name="recover-runs", daemon=True).start()
+
 def create_db():
-    Base.metadata.create_all(bind=engine)
+    ensure_schema()
     print("Database and tables created successfully!")
     
 app.include_router(submission.router, prefix="/submission", tags=["submission"])
 app.include_router(tests.router, prefix="/tests", tags=["tests"])
-app.include_router(playwright.router, prefix="/playwright", tags=["playwright"])
\ No newline at end of file
+app.include_router(playwright.router, prefix="/playwright", tags=["playwright"])
+app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
\ No newline at end of file
@@ -0,0 +1,150 @@
+# Fires concurrent runBrowserCheck tool calls at a local page and shows whether they progress in parallel:
+#   python -m core.browserCheckLoadTest --calls 8 --check-type summarize
+#   python -m core.browserCheckLoadTest --calls 8 --simulate-llm 2   (no Gemini quota used)
+import argparse
+import asyncio
+import http.server
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from core import pageSummarizer, runBrowserCheck
+from core.llmGateway import gateway
+
+_PAGE = ("<!DOCTYPE html><html><head><title>Load test</title></head><body>"
+         + "".join(f"<section><h2>Section {n}</h2><p>{'Lorem ipsum dolor sit amet. ' * 20}</p></section>" for n in range(40))
+         + "</body></html>").encode("utf-8")
+
+
+class _PageHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(_PAGE)))
+        self.end_headers()
+        self.wfile.write(_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecordingContext:
+    """Stands in for the FastMCP Context and timestamps every notification of one call."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.events: List[Dict[str, Any]] = []
+
+    async def info(self, message: str):
+        self.events.append({"at": time.perf_counter() - self.started, "chars": len(message)})
+
+    async def report_progress(self, progress: float, total: Optional[float] = None):
+        self.events.append({"at": time.perf_counter() - self.started, "progress": progress})
+
+
+class _SimulatedModel:
+    """Answers with a canned summary after the given time, streamed or not, like a Gemini call would."""
+
+    def __init__(self, seconds: float, chunks: int = 5):
+        self.seconds = seconds
+        self.chunks = chunks
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        model = self
+
+        class Chunk:
+            text = "Simulated summary chunk. "
+
+        async def chunks():
+            for _ in range(model.chunks):
+                await asyncio.sleep(model.seconds / model.chunks)
+                yield Chunk()
+        if not stream:
+            await asyncio.sleep(self.seconds)
+            return Chunk()
+        return chunks()
+
+
+async def _heartbeat(interval: float, lags: List[float], stop: asyncio.Event):
+    """Measures how late the event loop wakes up; long lags mean something blocked it."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_load_test(url: str, calls: int, check_type: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    lags: List[float] = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(0.05, lags, stop))
+
+    async def one_call(n: int) -> Dict[str, Any]:
+        ctx = RecordingContext(started)
+        call_started = time.perf_counter() - started
+        error = None
+        try:
+            await runBrowserCheck.run_playwright_check(url, check_type, ctx)
+        except Exception as e:
+            error = str(e)
+        return {
+            "call": n,
+            "started": round(call_started, 3),
+            "first_event": round(ctx.events[0]["at"], 3) if ctx.events else None,
+            "finished": round(time.perf_counter() - started, 3),
+            "events": len(ctx.events),
+            "error": error,
+        }
+
+    results = await asyncio.gather(*[one_call(n) for n in range(calls)])
+    wall = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+    busy = sum(result["finished"] - result["started"] for result in results)
+    return {
+        "calls": calls,
+        "check_type": check_type,
+        "wall_seconds": round(wall, 3),
+        # Close to the number of calls when they ran side by side, close to 1 when they ran one after another
+        "parallelism": round(busy / wall, 2) if wall else 0.0,
+        "max_loop_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+        "errors": sum(result["error"] is not None for result in results),
+        "llm": gateway.stats(),
+        "chunk_cache": pageSummarizer.summarizer.cache.stats(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent runBrowserCheck calls against a local page")
+    parser.add_argument("--calls", type=int, default=8, help="Concurrent tool calls")
+    parser.add_argument("--check-type", default="summarize", choices=["title_only", "summarize"])
+    parser.add_argument("--simulate-llm", type=float, metavar="SECONDS",
+                        help="Replace Gemini with a streamed answer taking this long, to load test without quota")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    if args.simulate_llm is not None:
+        model = _SimulatedModel(args.simulate_llm)
+        pageSummarizer.get_gemini_model = lambda: model
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = asyncio.run(run_load_test(f"http://127.0.0.1:{server.server_port}/", args.calls, args.check_type))
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"\n{'call':>5}{'started':>10}{'first msg':>11}{'finished':>10}{'events':>8}  error")
+    for result in report["results"]:
+        print(f"{result['call']:>5}{result['started']:>10}{str(result['first_event']):>11}{result['finished']:>10}"
+              f"{result['events']:>8}  {result['error'] or ''}")
+    print(f"\n{report['calls']} calls in {report['wall_seconds']}s, parallelism {report['parallelism']}, "
+          f"max event loop lag {report['max_loop_lag_ms']}ms, {report['errors']} error(s)")
+
+
+if __name__ == "__main__":
+    main()
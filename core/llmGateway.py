@@ -0,0 +1,282 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Error names and messages of quota, overload and transient network failures worth retrying
+_RETRYABLE_NAMES = ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+                    "TooManyRequests", "Timeout", "ConnectionError")
+_RETRYABLE_MESSAGES = ("429", "503", "quota", "rate limit", "resource exhausted", "unavailable", "overloaded",
+                       "timed out", "deadline")
+
+
+def is_retryable(error: Exception) -> bool:
+    names = [cls.__name__ for cls in type(error).__mro__]
+    if any(name in _RETRYABLE_NAMES for name in names):
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _RETRYABLE_MESSAGES)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose and code
+    return (len(text) + 3) // 4
+
+
+def _usage(result: Any, prompt: Optional[str]) -> Tuple[int, int, bool]:
+    """(input tokens, output tokens, estimated) of an LLM answer."""
+    metadata = getattr(result, "usage_metadata", None)
+    # LangChain chat messages
+    if isinstance(metadata, dict) and "input_tokens" in metadata:
+        return metadata.get("input_tokens", 0), metadata.get("output_tokens", 0), False
+    # google.generativeai responses
+    if metadata is not None and hasattr(metadata, "prompt_token_count"):
+        return metadata.prompt_token_count or 0, metadata.candidates_token_count or 0, False
+    if isinstance(result, str):
+        text = result
+    else:
+        text = getattr(result, "content", None)
+        if not isinstance(text, str):
+            try:
+                text = result.text
+            except Exception:
+                text = ""
+    return estimate_tokens(prompt or ""), estimate_tokens(text), True
+
+
+class TokenBucket:
+    """Request rate limit shared by every thread and event loop of the process.
+
+    Callers reserve a token and sleep until it is theirs, so waiting callers are
+    served in arrival order and never spin.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens, possibly going into debt, and return the seconds until they are covered."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class ConcurrencyLimit:
+    """Semaphore that works across event loops, e.g. suites running on their own threads."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+        self.waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.lock = threading.Lock()
+
+    async def acquire(self):
+        with self.lock:
+            if self.in_use < self.size and not self.waiters:
+                self.in_use += 1
+                return
+            waiter = (asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+            self.waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    raise
+            # The slot was handed over right before the cancellation, so pass it on
+            self.release()
+            raise
+
+    def release(self):
+        with self.lock:
+            while self.waiters:
+                loop, future = self.waiters.popleft()
+                if loop.is_closed():
+                    continue
+                # The slot goes straight to the waiter, so in_use stays the same
+                loop.call_soon_threadsafe(lambda future=future: future.done() or future.set_result(None))
+                return
+            self.in_use -= 1
+
+
+class CallerMetrics:
+    """Queue time, latency and token counts of the LLM calls made by one caller."""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated_calls = 0
+
+    def record_queue(self, seconds: float):
+        self.queue_seconds += seconds
+        self.max_queue_seconds = max(self.max_queue_seconds, seconds)
+
+    def record_tokens(self, usage: Tuple[int, int, bool]):
+        input_tokens, output_tokens, estimated = usage
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.estimated_calls += estimated
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 3) if latencies else None
+
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "avg_queue_seconds": round(self.queue_seconds / self.calls, 3) if self.calls else 0.0,
+            "max_queue_seconds": round(self.max_queue_seconds, 3),
+            "p50_latency_seconds": percentile(0.5),
+            "p95_latency_seconds": percentile(0.95),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            # Calls whose token counts were estimated from the text length
+            "estimated_token_calls": self.estimated_calls,
+        }
+
+
+class LLMGateway:
+    """Single entry point for the Gemini calls of the process.
+
+    Every call waits for the rate limiter and a concurrency slot, is retried with
+    jittered exponential backoff on quota and transient errors, and is accounted to
+    its caller.
+    """
+
+    def __init__(self, requests_per_minute: float = 60, burst: int = 5, max_concurrency: int = 8,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.slots = ConcurrencyLimit(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics: Dict[str, CallerMetrics] = {}
+        self.metrics_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60)),
+            burst=int(os.getenv("LLM_BURST", 5)),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", 4)),
+        )
+
+    def share_limits(self, processes: int):
+        """
+
+        Keep this process to its share of the limits when `processes` worker processes use the
+        same quota. Called before the first request; concurrency never drops below one slot.
+
+        """
+        processes = max(1, processes)
+        self.bucket = TokenBucket(self.requests_per_minute / 60.0 / processes, max(1.0, self.burst / processes))
+        self.slots = ConcurrencyLimit(max(1, self.max_concurrency // processes))
+
+    def caller_metrics(self, caller: str) -> CallerMetrics:
+        with self.metrics_lock:
+            if caller not in self.metrics:
+                self.metrics[caller] = CallerMetrics()
+            return self.metrics[caller]
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter keeps callers that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _admit(self, metrics: CallerMetrics):
+        queued = time.perf_counter()
+        await self.bucket.acquire()
+        await self.slots.acquire()
+        metrics.record_queue(time.perf_counter() - queued)
+
+    async def call(self, caller: str, request: Callable[[], Awaitable[T]], prompt: Optional[str] = None) -> T:
+        """Run `request`, a factory for the LLM coroutine, so it can be recreated for every attempt."""
+        metrics = self.caller_metrics(caller)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(metrics)
+            started = time.perf_counter()
+            try:
+                result = await request()
+            except Exception as e:
+                metrics.calls += 1
+                metrics.failures += 1
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                metrics.retries += 1
+            else:
+                metrics.calls += 1
+                metrics.latencies.append(time.perf_counter() - started)
+                metrics.record_tokens(_usage(result, prompt))
+                return result
+            finally:
+                self.slots.release()
+            # Back off without holding a slot
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def stream(self, caller: str, request: Callable[[], AsyncIterator[Any]],
+                     prompt: Optional[str] = None) -> AsyncIterator[Any]:
+        """Stream the chunks of `request`; only retried while nothing has been yielded yet."""
+        metrics = self.caller_metrics(caller)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(metrics)
+            started = time.perf_counter()
+            chunks = []
+            try:
+                async for chunk in request():
+                    chunks.append(chunk if isinstance(chunk, str) else getattr(chunk, "content", "") or "")
+                    yield chunk
+            except Exception as e:
+                metrics.calls += 1
+                metrics.failures += 1
+                if chunks or attempt == self.max_retries or not is_retryable(e):
+                    raise
+                metrics.retries += 1
+            else:
+                metrics.calls += 1
+                metrics.latencies.append(time.perf_counter() - started)
+                metrics.record_tokens(_usage("".join(chunks), prompt))
+                return
+            finally:
+                self.slots.release()
+            await asyncio.sleep(self.backoff(attempt))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.metrics_lock:
+            return {caller: metrics.summary() for caller, metrics in self.metrics.items()}
+
+
+# Shared by every call site in the process
+gateway = LLMGateway.from_env()
@@ -8,14 +8,70 @@
 #     api_version="2025-01-01-preview"
 # )
 
-import google.generativeai as genai
+# Process-wide registry of LLM clients. Nothing is imported, configured or contacted until
+# a client is first asked for, and every caller of the same model shares one client and
+# with it one pool of HTTP/gRPC connections.
 import os
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+from dotenv import load_dotenv
 
-API_KEY = os.getenv("GEMINI_API_KEY")
+load_dotenv()
 
-genai.configure(api_key=API_KEY)
+DEFAULT_LLM = "models/gemini-2.0-flash"
+DEFAULT_GEMINI_MODEL = "gemini-2.0-flash-exp"
 
-gemini_model = genai.GenerativeModel("gemini-2.0-flash-exp")
+_clients: Dict[Tuple[Any, ...], Any] = {}
+_lock = threading.Lock()
+_genai_configured = False
 
-response = gemini_model.generate_content("Write a short story about a robot learning to paint.")
-print(response.text)
\ No newline at end of file
+
+def _get_or_create(key: Tuple[Any, ...], factory: Callable[[], Any]) -> Any:
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+
+def get_llm(model: str = DEFAULT_LLM) -> Any:
+    """LangChain text completion client (GoogleGenerativeAI)."""
+    def create():
+        from langchain_google_genai import GoogleGenerativeAI
+        return GoogleGenerativeAI(model=model)
+    return _get_or_create(("llm", model), create)
+
+
+def get_chat_model(model: str = "gemini-2.0-flash", temperature: float = 0.2) -> Any:
+    """LangChain chat client (ChatGoogleGenerativeAI)."""
+    def create():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, temperature=temperature)
+    return _get_or_create(("chat", model, temperature), create)
+
+
+def get_gemini_model(model: str = DEFAULT_GEMINI_MODEL) -> Any:
+    """google.generativeai model, configured with GEMINI_API_KEY on first use."""
+    def create():
+        global _genai_configured
+        import google.generativeai as genai
+        if not _genai_configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _genai_configured = True
+        return genai.GenerativeModel(model)
+    return _get_or_create(("genai", model), create)
+
+
+def loaded() -> List[str]:
+    """Clients created so far, for startup and memory diagnostics."""
+    return [":".join(str(part) for part in key) for key in _clients]
+
+
+def __getattr__(name: str) -> Any:
+    # Kept for code that used the module attribute, which used to be created at import
+    if name == "gemini_model":
+        return get_gemini_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from core.llmGateway import gateway
+from core.models import DEFAULT_GEMINI_MODEL, get_gemini_model
+
+MAP_PROMPT = "Summarize this section of a web page in a few sentences, keeping names, numbers and calls to action:\n\n{text}"
+REDUCE_PROMPT = "These are summaries of consecutive sections of one web page. Combine them into one summary of the page:\n\n{text}"
+
+
+def _split_block(block: str, max_chars: int) -> List[str]:
+    """Cut an oversized block at sentence ends, and hard-cut only what has none."""
+    pieces, current = [], ""
+    for sentence in block.replace(". ", ".\n").splitlines(keepends=True):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += sentence.replace(".\n", ". ")
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: str, max_chars: int = 4000, min_chars: int = 1000) -> List[str]:
+    """
+
+    Split page text into chunks of at most max_chars along its line and paragraph structure.
+
+    Past min_chars a chunk ends after any block whose content hash says so, so the
+    boundaries depend on the nearby text only: editing one section of a page leaves
+    the other chunks, and their cached summaries, unchanged.
+
+    """
+    blocks = []
+    for block in text.splitlines():
+        block = block.strip()
+        if block:
+            blocks.extend(_split_block(block, max_chars) if len(block) > max_chars else [block])
+    chunks, current = [], []
+    size = 0
+    for block in blocks:
+        if current and size + len(block) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 1
+        if size >= min_chars and hashlib.sha256(block.encode("utf-8")).digest()[0] % 4 == 0:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkSummaryCache:
+    """LRU of chunk summaries keyed by the hash of the model, prompt and chunk text."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, text: str) -> str:
+        return hashlib.sha256("\x1f".join([model, prompt, text]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            summary = self.entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def put(self, key: str, summary: str):
+        with self.lock:
+            self.entries[key] = summary
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+async def _generate(prompt: str) -> str:
+    response = await get_gemini_model().generate_content_async(prompt)
+    return response.text
+
+
+async def _stream(prompt: str) -> AsyncIterator[str]:
+    response = await get_gemini_model().generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        yield chunk.text
+
+
+class PageSummarizer:
+    """Map-reduce summarizer: chunks are summarized concurrently, then their summaries are combined."""
+
+    def __init__(self, max_chunk_chars: int = 4000, max_parallel: int = 4, cache: Optional[ChunkSummaryCache] = None,
+                 model: str = DEFAULT_GEMINI_MODEL):
+        self.max_chunk_chars = max_chunk_chars
+        # Chunks of one page in flight at once; the gateway still limits the whole process
+        self.max_parallel = max(1, max_parallel)
+        self.cache = cache or ChunkSummaryCache()
+        self.model = model
+
+    async def _summarize_chunk(self, text: str, semaphore: asyncio.Semaphore, prompt_template: str) -> str:
+        key = ChunkSummaryCache.make_key(self.model, prompt_template, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        prompt = prompt_template.format(text=text)
+        async with semaphore:
+            summary = await gateway.call("pageSummarizer.map", lambda: _generate(prompt), prompt=prompt)
+        self.cache.put(key, summary)
+        return summary
+
+    async def _map(self, chunks: List[str], on_progress: Optional[Callable[[int, int], Awaitable[None]]],
+                   prompt_template: str = MAP_PROMPT) -> List[str]:
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        done = 0
+
+        async def summarize(text: str) -> str:
+            nonlocal done
+            summary = await self._summarize_chunk(text, semaphore, prompt_template)
+            done += 1
+            if on_progress is not None:
+                await on_progress(done, len(chunks))
+            return summary
+
+        return list(await asyncio.gather(*[summarize(text) for text in chunks]))
+
+    async def summarize(self, text: str,
+                        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+                        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> str:
+        """
+
+        Summarize the whole text. on_progress(done, total) follows the chunk summaries and
+        on_partial(text) receives each new piece of the final, streamed summary.
+
+        """
+        chunks = split_text(text, self.max_chunk_chars) or [""]
+        if len(chunks) == 1:
+            prompt_template, parts = MAP_PROMPT, chunks
+        else:
+            parts = await self._map(chunks, on_progress)
+            # Summaries that still do not fit one prompt are reduced in rounds
+            while len("\n\n".join(parts)) > self.max_chunk_chars and len(parts) > 1:
+                groups = split_text("\n".join(part.replace("\n", " ") for part in parts),
+                                    self.max_chunk_chars, min_chars=self.max_chunk_chars)
+                if len(groups) >= len(parts):
+                    # Summaries too long to pair up; the final prompt just gets longer
+                    break
+                # Each group holds section summaries, so it is combined rather than summarized as page text
+                parts = await self._map(groups, None, REDUCE_PROMPT)
+            prompt_template = REDUCE_PROMPT
+
+        combined = "\n\n".join(parts)
+        key = ChunkSummaryCache.make_key(self.model, prompt_template, combined)
+        summary = self.cache.get(key)
+        if summary is not None:
+            if on_partial is not None:
+                await on_partial(summary)
+            return summary
+        prompt = prompt_template.format(text=combined)
+        summary = ""
+        async for piece in gateway.stream("pageSummarizer.reduce", lambda: _stream(prompt), prompt=prompt):
+            summary += piece
+            if on_partial is not None and piece:
+                await on_partial(piece)
+        self.cache.put(key, summary)
+        return summary
+
+
+# Shared so repeated checks of the same pages reuse the chunk summaries
+summarizer = PageSummarizer()
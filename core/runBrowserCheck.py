@@ -1,17 +1,12 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from playwright.async_api import async_playwright
-from typing import Literal
+from typing import Literal, Optional
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai
+from core.pageSummarizer import summarizer
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash-exp")
 
 # FastMCP setup
 serverName = "runBrowserCheck"
@@ -21,44 +16,80 @@ serverSettings = {
 }
 mcp = FastMCP(serverName, **serverSettings)
 
+# Stages reported as progress: page loaded, content read, summary complete
+_STAGES = 3
+
+
+async def _notify(ctx: Optional[Context], message: str, progress: Optional[float] = None):
+    """Send a log message and progress to the MCP client, if the tool was called through MCP."""
+    if ctx is None:
+        return
+    try:
+        await ctx.info(message)
+        if progress is not None:
+            await ctx.report_progress(progress, _STAGES)
+    except Exception as e:
+        # A client that went away must not fail the check itself
+        print(f"Error reporting progress: {e}")
+
+
+async def summarize_text(text: str, ctx: Optional[Context] = None) -> str:
+    """Summarize the whole page text with Gemini, forwarding each piece of the summary to the client as it is written."""
+
+    async def on_progress(done: int, total: int):
+        # Section summaries fill most of the last stage, the final summary the rest
+        await _notify(ctx, f"Summarized {done}/{total} sections", 2 + 0.9 * done / total)
+
+    async def on_partial(piece: str):
+        await _notify(ctx, piece)
+
+    return await summarizer.summarize(text, on_partial=on_partial, on_progress=on_progress)
+
+
 @mcp.tool(name=serverName, description="Run a Playwright check on a given URL and summarize it using Gemini.")
 async def run_playwright_check(
     url: str,
-    check_type: Literal["websearch", "title_only", "summarize"]
+    check_type: Literal["websearch", "title_only", "summarize"],
+    ctx: Context = None
 ) -> dict:
     """
     Run a Playwright check on a URL, with optional Gemini summary.
     """
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(url)
-
-        if check_type == "websearch":
-            await page.fill("input[name='q']", "ai tools")
-            await page.keyboard.press("Enter")
-            await page.wait_for_selector("h3")
-            search_results = await page.locator("h3").all_text_contents()
-            await browser.close()
+        try:
+            page = await browser.new_page()
+            await page.goto(url)
+            await _notify(ctx, f"Loaded {url}", 1)
+            # Read while the page is still open
+            title = await page.title()
 
-            return {
-                "title": await page.title(),
-                "top_results": search_results[:5]
-            }
+            if check_type == "websearch":
+                await page.fill("input[name='q']", "ai tools")
+                await page.keyboard.press("Enter")
+                await page.wait_for_selector("h3")
+                search_results = await page.locator("h3").all_text_contents()
+                return {
+                    "title": await page.title(),
+                    "top_results": search_results[:5]
+                }
 
-        elif check_type == "summarize":
-            await page.wait_for_load_state("domcontentloaded")
-            body_text = await page.locator("body").inner_text()
-            await browser.close()
+            elif check_type == "summarize":
+                await page.wait_for_load_state("domcontentloaded")
+                body_text = await page.locator("body").inner_text()
+                await browser.close()
+                await _notify(ctx, f"Read {len(body_text)} characters, summarizing", 2)
 
-            # Send to Gemini for summarization
-            response = model.generate_content(f"Summarize this page content:\n\n{body_text[:5000]}")
-            return {
-                "title": await page.title(),
-                "summary": response.text
-            }
+                # Send to Gemini for summarization without blocking other tool calls
+                summary = await summarize_text(body_text, ctx)
+                await _notify(ctx, "Summary complete", 3)
+                return {
+                    "title": title,
+                    "summary": summary
+                }
 
-        else:
-            title = await page.title()
+            else:
+                return {"title": title}
+        finally:
+            # Closing twice is a no-op
             await browser.close()
-            return {"title": title}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from core.playwright_manager import playwright_manager
@@ -13,6 +13,10 @@ class UserStoryStep(BaseModel):
     selector: Optional[str] = None
     text: Optional[str] = None
     timeout: Optional[int] = 30000
+    format: Optional[str] = None  # screenshot only: png or jpeg
+    quality: Optional[int] = None  # screenshot only, jpeg quality
+    full_page: Optional[bool] = None  # screenshot only, False captures just the viewport
+    clip: Optional[Dict[str, float]] = None  # screenshot only, region with x, y, width and height
 
 class RunPlaywrightRequest(BaseModel):
     user_story: str
@@ -27,6 +31,18 @@ def get_playwright_manager():
     """Dependency to get the Playwright manager instance"""
     return playwright_manager
 
+def image_response(screenshot, request: Request, cache_control: str) -> Response:
+    """Serve screenshot bytes, answering 304 when the client already has them"""
+    headers = {
+        "ETag": screenshot.etag,
+        "Cache-Control": cache_control,
+        "X-Screenshot-Id": screenshot.id
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or screenshot.etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=screenshot.data, media_type=screenshot.media_type, headers=headers)
+
 @router.post("/run-playwright", response_model=MCPResponse)
 async def run_playwright(
     request: RunPlaywrightRequest, 
@@ -87,6 +103,16 @@ async def run_playwright(
             data=result
         )
         
+    except HTTPException as e:
+        if e.status_code < 500:
+            # The request itself was rejected, e.g. 413 for an oversized screenshot
+            raise
+        error_msg = f"Failed to execute user story: {e.detail}"
+        pw_manager.add_log("ERROR", error_msg)
+        return MCPResponse(
+            success=False,
+            error=error_msg
+        )
     except Exception as e:
         error_msg = f"Failed to execute user story: {str(e)}"
         pw_manager.add_log("ERROR", error_msg)
@@ -100,7 +126,7 @@ async def take_screenshot(pw_manager = Depends(get_playwright_manager)):
     """
     Take a screenshot of the current page
     
-    Returns base64 encoded screenshot along with page info
+    Returns the id and URL of the stored screenshot along with page info
     """
     try:
         result = await pw_manager.take_screenshot_endpoint()
@@ -118,6 +144,54 @@ async def take_screenshot(pw_manager = Depends(get_playwright_manager)):
             error=error_msg
         )
 
+@router.get("/screenshot")
+async def capture_screenshot(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(png|jpeg)$"),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    x: Optional[float] = Query(None, ge=0),
+    y: Optional[float] = Query(None, ge=0),
+    clip_width: Optional[float] = Query(None, gt=0),
+    clip_height: Optional[float] = Query(None, gt=0),
+    width: Optional[int] = Query(None, ge=16, le=4096),
+    pw_manager = Depends(get_playwright_manager)
+):
+    """
+    Return the image of the page the most recently finished run ended on
+    
+    Pages go back to the context pool when a run ends, so this is captured while the
+    run still holds its page, as a viewport-only image. For a full page image, add a
+    screenshot step to the run.
+    
+    Parameters:
+    - format: png or jpeg (default: the format of the final capture)
+    - quality: jpeg quality, 1-100
+    - x, y, clip_width, clip_height: region to return, all four or none
+    - width: scale the capture to this width in pixels before clipping
+    
+    Send If-None-Match with a previous ETag to get a 304 while no newer run changed it
+    """
+    clip_values = {"x": x, "y": y, "width": clip_width, "height": clip_height}
+    if any(value is not None for value in clip_values.values()) and None in clip_values.values():
+        raise HTTPException(status_code=400, detail="A clip needs x, y, clip_width and clip_height")
+    clip = clip_values if x is not None else None
+    screenshot = await pw_manager.last_screenshot_variant(format, quality, clip, width)
+    # Every finished run replaces it, so clients must revalidate
+    return image_response(screenshot, request, "no-cache")
+
+@router.get("/screenshots/{screenshot_id}")
+async def get_screenshot(
+    screenshot_id: str,
+    request: Request,
+    pw_manager = Depends(get_playwright_manager)
+):
+    """Return a screenshot taken earlier, e.g. by a screenshot step of a run"""
+    screenshot = pw_manager.screenshots.get(screenshot_id)
+    if screenshot is None:
+        raise HTTPException(status_code=404, detail="Screenshot not found or evicted")
+    # Ids are content hashes, so the bytes behind a URL never change
+    return image_response(screenshot, request, "private, max-age=31536000, immutable")
+
 @router.get("/logs", response_model=MCPResponse)
 async def get_logs(
     limit: Optional[int] = 100,
@@ -150,5 +224,6 @@ async def get_status(pw_manager = Depends(get_playwright_manager)):
         "is_initialized": pw_manager.is_initialized,
         "is_running": pw_manager.is_running,
         "total_logs": len(pw_manager.logs),
-        "service_status": "ready"
+        "service_status": "ready",
+        "pool": pw_manager.pool_stats()
     }
\ No newline at end of file
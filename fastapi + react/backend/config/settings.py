@@ -13,6 +13,26 @@ class Settings:
     PLAYWRIGHT_TIMEOUT = 30000
     MAX_INITIALIZATION_RETRIES = 3
     
+    # Browser context pool settings
+    CONTEXT_POOL_MIN_SIZE = 2
+    CONTEXT_POOL_MAX_SIZE = 8
+    CONTEXT_LEASE_TIMEOUT = 60  # seconds to wait for a free context when the pool is saturated
+    
+    # Page settle settings (replace the fixed one second pause between steps)
+    SETTLE_QUIET_MS = 150  # DOM must be free of mutations for this long
+    SETTLE_NETWORK_QUIET_MS = 100  # no in-flight requests for this long
+    SETTLE_STALE_REQUEST_MS = 2000  # older requests are treated as long polls and ignored
+    SETTLE_ACTION_CAPS_MS = {"navigate": 8000, "click": 3000, "type": 600, "wait": 0, "screenshot": 0}
+    
+    # Screenshot settings (captures are kept in memory and served by id)
+    SCREENSHOT_FORMAT = "png"  # png or jpeg
+    SCREENSHOT_QUALITY = 80  # jpeg only
+    SCREENSHOT_FULL_PAGE = True  # default for screenshot steps
+    SCREENSHOT_CAPTURE_FINAL = True  # keep the last page of each run for /screenshot and /take-screenshot
+    SCREENSHOT_FINAL_FORMAT = "jpeg"  # the final capture is a viewport-only image, never a full page
+    SCREENSHOT_STORE_MAX_ENTRIES = 200
+    SCREENSHOT_STORE_MAX_BYTES = 200 * 1024 * 1024
+    
     # Browser arguments
     BROWSER_ARGS = [
         '--no-sandbox',
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+
+
+class BrowserLease:
+    """A browser context and page handed out to a single request"""
+
+    def __init__(self, context, page, wait_ms: float):
+        self.context = context
+        self.page = page
+        self.wait_ms = wait_ms
+
+
+class ContextPool:
+    """Pool of pre-warmed browser contexts leased out one request at a time"""
+
+    def __init__(self, browser, min_size: int, max_size: int, lease_timeout: float, log=None):
+        self.browser = browser
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.lease_timeout = lease_timeout
+        self.log = log or (lambda level, message: None)
+        self.idle = asyncio.Queue()
+        self.size = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_leases = 0
+        self.saturated_leases = 0
+        self.lease_timeouts = 0
+        self.wait_times_ms = deque(maxlen=500)
+
+    async def _new_context(self):
+        context = await self.browser.new_context()
+        await context.new_page()
+        return context
+
+    async def warm(self):
+        """Create the minimum number of contexts up front"""
+        while self.size < self.min_size:
+            self.size += 1
+            try:
+                self.idle.put_nowait(await self._new_context())
+            except Exception:
+                self.size -= 1
+                raise
+        self.log("INFO", f"Context pool warmed with {self.size} contexts (max {self.max_size})")
+
+    async def _acquire(self) -> BrowserLease:
+        started = time.perf_counter()
+        try:
+            context = self.idle.get_nowait()
+        except asyncio.QueueEmpty:
+            context = None
+
+        if context is None and self.size < self.max_size:
+            # Reserve the slot before awaiting so concurrent leases can't overshoot max_size
+            self.size += 1
+            try:
+                context = await self._new_context()
+            except Exception:
+                self.size -= 1
+                raise
+            self.log("INFO", f"Context pool grew to {self.size} contexts")
+        elif context is None:
+            self.saturated_leases += 1
+            self.log("WARNING", f"Context pool saturated ({self.size}/{self.max_size} in use), waiting for a lease")
+            try:
+                context = await asyncio.wait_for(self.idle.get(), timeout=self.lease_timeout)
+            except asyncio.TimeoutError:
+                self.lease_timeouts += 1
+                raise HTTPException(status_code=503, detail="No browser context available, try again later")
+
+        page = context.pages[0] if context.pages else await context.new_page()
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        self.wait_times_ms.append(wait_ms)
+        self.total_leases += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return BrowserLease(context, page, wait_ms)
+
+    async def _discard(self, context):
+        self.size -= 1
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _release(self, lease: BrowserLease):
+        """Close the leased context and put a fresh one in its place"""
+        # Cookies, localStorage, sessionStorage, IndexedDB and permission grants all live in the
+        # context, so recycling it would hand the previous caller's login to the next request
+        self.in_use -= 1
+        await self._discard(lease.context)
+        self.size += 1
+        try:
+            self.idle.put_nowait(await self._new_context())
+        except Exception as e:
+            # The next lease grows the pool again once the browser can create contexts
+            self.size -= 1
+            self.log("WARNING", f"Could not replace a released browser context: {str(e)}")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a context for the duration of the block"""
+        lease = await self._acquire()
+        try:
+            yield lease
+        finally:
+            await self._release(lease)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, saturation and lease wait times"""
+        waits = sorted(self.wait_times_ms)
+        p95: Optional[float] = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self.size,
+            "idle": self.idle.qsize(),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "saturation": round(self.in_use / self.max_size, 3) if self.max_size else 0.0,
+            "total_leases": self.total_leases,
+            "saturated_leases": self.saturated_leases,
+            "lease_timeouts": self.lease_timeouts,
+            "lease_wait_ms_avg": round(sum(waits) / len(waits), 2) if waits else None,
+            "lease_wait_ms_p95": round(p95, 2) if p95 is not None else None,
+            "lease_wait_ms_max": round(waits[-1], 2) if waits else None,
+        }
+
+    async def close(self):
+        """Close every idle context; leased ones are closed with the browser"""
+        while not self.idle.empty():
+            await self._discard(self.idle.get_nowait())
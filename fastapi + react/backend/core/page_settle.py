@@ -0,0 +1,9 @@
+# The settle policy is shared with the main project, whose Service/code/pageSettle.py is the only copy.
+# The backend runs from its own directory inside the same checkout, which has no installable package,
+# so the checkout root is put on the import path to reach it (as Sowmya-Contribution does for the gateway).
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+
+from Service.code.pageSettle import AdaptiveSettlePolicy, NetworkTracker, SettlePolicy  # noqa: E402,F401
@@ -1,29 +1,47 @@
 import asyncio
-import os
-import threading
 import base64
+import os
 import logging
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import HTTPException
 from config.settings import settings
+from core.context_pool import ContextPool
+from core.page_settle import AdaptiveSettlePolicy
+from core.screenshot_store import MEDIA_TYPES, ScreenshotStore, StoredScreenshot
 from utils.logging_config import logger
 
 class PlaywrightManager:
     def __init__(self):
         self.playwright = None
         self.browser = None
-        self.context = None
-        self.page = None
+        self.pool = None
+        self.last_capture = None  # Final screenshot, URL and title of the most recently finished run
+        self.last_capture_error = None  # Why the most recently finished run has no final screenshot
+        self.last_variants = {}  # Re-encoded or cropped copies of the final screenshot, by format/quality/clip/width
         self.is_initialized = False
-        self.is_running = False
-        self.initialization_lock = threading.Lock()
+        self.active_runs = 0
+        self.settle_policy = AdaptiveSettlePolicy(
+            quiet_ms=settings.SETTLE_QUIET_MS,
+            network_quiet_ms=settings.SETTLE_NETWORK_QUIET_MS,
+            stale_request_ms=settings.SETTLE_STALE_REQUEST_MS,
+            action_caps_ms=settings.SETTLE_ACTION_CAPS_MS
+        )
+        self.screenshots = ScreenshotStore(
+            max_entries=settings.SCREENSHOT_STORE_MAX_ENTRIES,
+            max_bytes=settings.SCREENSHOT_STORE_MAX_BYTES
+        )
+        self.initialization_lock = asyncio.Lock()
         self.logs = []
         self.max_logs = 1000  # Keep last 1000 log entries
         
         # Setup custom logger for real-time logs
         self.setup_logger()
 
+    @property
+    def is_running(self):
+        return self.active_runs > 0
+
     def setup_logger(self):
         """Setup custom logger that captures logs in memory"""
         self.memory_handler = MemoryLogHandler(self)
@@ -52,7 +70,7 @@ class PlaywrightManager:
 
     async def initialize(self):
         """Initialize Playwright"""
-        with self.initialization_lock:
+        async with self.initialization_lock:
             if self.is_initialized:
                 return True
             
@@ -70,11 +88,14 @@ class PlaywrightManager:
                 )
                 self.add_log("INFO", "Browser launched successfully")
                 
-                self.context = await self.browser.new_context()
-                self.add_log("INFO", "Browser context created")
-                
-                self.page = await self.context.new_page()
-                self.add_log("INFO", "New page created")
+                self.pool = ContextPool(
+                    self.browser,
+                    min_size=settings.CONTEXT_POOL_MIN_SIZE,
+                    max_size=settings.CONTEXT_POOL_MAX_SIZE,
+                    lease_timeout=settings.CONTEXT_LEASE_TIMEOUT,
+                    log=self.add_log
+                )
+                await self.pool.warm()
                 
                 self.is_initialized = True
                 self.add_log("INFO", "Playwright initialization completed successfully")
@@ -94,11 +115,26 @@ class PlaywrightManager:
         if not self.is_initialized:
             raise HTTPException(status_code=503, detail="Failed to initialize Playwright")
         
-        self.is_running = True
+        self.add_log("INFO", f"Queued user story: {user_story}")
+        async with self.pool.lease() as lease:
+            self.add_log("INFO", f"Leased browser context after {lease.wait_ms:.1f} ms")
+            try:
+                result = await self._run_steps(lease.page, user_story, steps)
+            finally:
+                # Captured while the lease is held; once released the page belongs to the next request
+                await self._capture_final(lease.page)
+        
+        result["lease_wait_ms"] = round(lease.wait_ms, 2)
+        return result
+
+    async def _run_steps(self, page, user_story: str, steps: List[Dict[str, Any]]):
+        """Execute the steps of a user story on a leased page"""
+        self.active_runs += 1
         self.add_log("INFO", f"Starting user story execution: {user_story}")
         
         results = []
         step_number = 1
+        self.settle_policy.attach(page)
         
         try:
             for step in steps:
@@ -109,52 +145,62 @@ class PlaywrightManager:
                 if action == 'navigate':
                     url = step.get('url', '')
                     self.add_log("INFO", f"Navigating to: {url}")
-                    await self.page.goto(url, wait_until='networkidle')
-                    current_url = self.page.url
-                    title = await self.page.title()
+                    await page.goto(url, wait_until='domcontentloaded')
+                    current_url = page.url
+                    title = await page.title()
                     self.add_log("INFO", f"Successfully navigated to: {current_url} - Title: {title}")
                     
                 elif action == 'click':
                     selector = step.get('selector', '')
                     self.add_log("INFO", f"Clicking element: {selector}")
-                    await self.page.click(selector)
+                    await page.click(selector)
                     self.add_log("INFO", f"Successfully clicked: {selector}")
                     
                 elif action == 'type':
                     selector = step.get('selector', '')
                     text = step.get('text', '')
                     self.add_log("INFO", f"Typing '{text}' into: {selector}")
-                    await self.page.fill(selector, text)
+                    await page.fill(selector, text)
                     self.add_log("INFO", f"Successfully typed text into: {selector}")
                     
                 elif action == 'wait':
                     selector = step.get('selector', '')
                     timeout = step.get('timeout', 30000)
                     self.add_log("INFO", f"Waiting for element: {selector}")
-                    await self.page.wait_for_selector(selector, timeout=timeout)
+                    await page.wait_for_selector(selector, timeout=timeout)
                     self.add_log("INFO", f"Element found: {selector}")
                     
                 elif action == 'screenshot':
                     self.add_log("INFO", "Taking screenshot...")
-                    screenshot = await self.take_screenshot_internal()
+                    full_page = step.get('full_page')
+                    screenshot = await self.capture(
+                        page,
+                        image_format=step.get('format') or settings.SCREENSHOT_FORMAT,
+                        quality=step.get('quality'),
+                        full_page=settings.SCREENSHOT_FULL_PAGE if full_page is None else full_page,
+                        clip=step.get('clip')
+                    )
                     self.add_log("INFO", "Screenshot taken successfully")
                     results.append({
                         "step": step_number,
                         "action": "screenshot",
-                        "screenshot": screenshot
+                        **self.screenshot_reference(screenshot)
                     })
                 
-                # Wait a bit between steps
-                await asyncio.sleep(1)
+                # Wait until the page has settled instead of a fixed pause
+                await self.settle_policy.settle(page, action)
                 step_number += 1
                 
         except Exception as e:
-            error_msg = f"Error in step {step_number}: {str(e)}"
+            # Keep the status of a rejected request, e.g. 413 for an oversized screenshot
+            status_code = e.status_code if isinstance(e, HTTPException) else 500
+            reason = e.detail if isinstance(e, HTTPException) else str(e)
+            error_msg = f"Error in step {step_number}: {reason}"
             self.add_log("ERROR", error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
+            raise HTTPException(status_code=status_code, detail=error_msg)
         
         finally:
-            self.is_running = False
+            self.active_runs -= 1
             self.add_log("INFO", "User story execution completed")
         
         return {
@@ -164,13 +210,114 @@ class PlaywrightManager:
             "status": "completed"
         }
 
-    async def take_screenshot_internal(self):
-        """Internal method to take screenshot"""
-        if not self.is_initialized or not self.page:
+    async def _capture_final(self, page):
+        """Keep the viewport a run ended on for the screenshot endpoints, when enabled"""
+        if not settings.SCREENSHOT_CAPTURE_FINAL:
+            return
+        try:
+            screenshot = await self.capture(page, image_format=settings.SCREENSHOT_FINAL_FORMAT)
+            self.last_capture_error = None
+            self.last_variants = {}
+            self.last_capture = {
+                "screenshot": screenshot,
+                "current_url": page.url,
+                "page_title": await page.title(),
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            # A page that crashed or closed must not turn a finished run into an error,
+            # but the endpoints must not serve an older run's page in its place either
+            reason = e.detail if isinstance(e, HTTPException) else str(e)
+            self.last_capture = None
+            self.last_capture_error = reason
+            self.last_variants = {}
+            self.add_log("WARNING", f"Could not capture the final page of the run: {reason}")
+
+    def last_screenshot(self) -> StoredScreenshot:
+        """Final screenshot of the most recently finished run"""
+        if self.last_capture is None:
+            if not settings.SCREENSHOT_CAPTURE_FINAL:
+                raise HTTPException(status_code=409, detail="Final page capture is disabled, set SCREENSHOT_CAPTURE_FINAL")
+            if self.last_capture_error:
+                raise HTTPException(status_code=409, detail=f"The last run's page could not be captured: {self.last_capture_error}")
+            raise HTTPException(status_code=409, detail="No page to capture yet, run a user story first")
+        return self.last_capture["screenshot"]
+
+    async def last_screenshot_variant(self, image_format: Optional[str] = None, quality: Optional[int] = None,
+                                      clip: Optional[Dict[str, float]] = None, width: Optional[int] = None) -> StoredScreenshot:
+        """Final screenshot of the last run in another format or quality, cropped to clip or scaled to width"""
+        source = self.last_screenshot()
+        if image_format is None and quality is None and clip is None and width is None:
+            return source
+        image_format = image_format or next(name for name, media_type in MEDIA_TYPES.items() if media_type == source.media_type)
+        if quality is not None and image_format != "jpeg":
+            raise HTTPException(status_code=400, detail="quality only applies to jpeg")
+        
+        key = (image_format, quality, tuple(sorted(clip.items())) if clip else None, width)
+        variant = self.last_variants.get(key)
+        if variant is not None and self.screenshots.get(variant.id) is not None:
+            return variant
+        
+        if not self.is_initialized:
+            await self.initialize()
+        if not self.is_initialized:
+            raise HTTPException(status_code=503, detail="Failed to initialize Playwright")
+        
+        # The run's page is gone, so the stored capture is drawn on a leased page and captured again
+        async with self.pool.lease() as lease:
+            page = lease.page
+            image = base64.b64encode(source.data).decode("ascii")
+            await page.set_content(
+                f'<html><body style="margin:0"><img id="capture" style="display:block;width:100%" '
+                f'src="data:{source.media_type};base64,{image}"></body></html>'
+            )
+            natural_width, natural_height = await page.evaluate(
+                "() => { const image = document.getElementById('capture'); return [image.naturalWidth, image.naturalHeight]; }"
+            )
+            render_width = width or natural_width
+            render_height = max(1, round(natural_height * render_width / natural_width))
+            if clip is not None and (clip["x"] + clip["width"] > render_width or clip["y"] + clip["height"] > render_height):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"clip must lie within the {render_width}x{render_height} screenshot"
+                )
+            await page.set_viewport_size({"width": render_width, "height": render_height})
+            variant = await self.capture(page, image_format=image_format, quality=quality, clip=clip)
+        
+        self.last_variants[key] = variant
+        return variant
+
+    async def capture(self, page, image_format: str = "png", quality: Optional[int] = None,
+                      full_page: bool = False, clip: Optional[Dict[str, float]] = None) -> StoredScreenshot:
+        """Take a screenshot of a leased page and keep it in the screenshot store"""
+        if not self.is_initialized:
             raise HTTPException(status_code=503, detail="Playwright not initialized")
+        if image_format not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format '{image_format}', use png or jpeg")
         
-        screenshot_bytes = await self.page.screenshot(full_page=True)
-        return base64.b64encode(screenshot_bytes).decode()
+        options = {"type": image_format, "full_page": full_page and clip is None}
+        if image_format == "jpeg":
+            options["quality"] = quality or settings.SCREENSHOT_QUALITY
+        if clip is not None:
+            options["clip"] = clip
+        screenshot_bytes = await page.screenshot(**options)
+        screenshot = self.screenshots.put(screenshot_bytes, MEDIA_TYPES[image_format])
+        if screenshot is None:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Screenshot of {len(screenshot_bytes)} bytes exceeds SCREENSHOT_STORE_MAX_BYTES, capture a smaller region or use jpeg"
+            )
+        return screenshot
+
+    @staticmethod
+    def screenshot_reference(screenshot: StoredScreenshot):
+        """How run results and JSON responses point at a stored screenshot"""
+        return {
+            "screenshot_id": screenshot.id,
+            "screenshot_url": f"/screenshots/{screenshot.id}",
+            "media_type": screenshot.media_type,
+            "size_bytes": len(screenshot.data)
+        }
 
     async def take_screenshot_endpoint(self):
         """Public method for screenshot endpoint"""
@@ -180,15 +327,14 @@ class PlaywrightManager:
         if not self.is_initialized:
             raise HTTPException(status_code=503, detail="Failed to initialize Playwright")
         
-        self.add_log("INFO", "Taking screenshot via endpoint")
-        screenshot = await self.take_screenshot_internal()
-        self.add_log("INFO", "Screenshot taken successfully via endpoint")
+        self.add_log("INFO", "Returning the final screenshot of the last run via endpoint")
+        screenshot = self.last_screenshot()
         
         return {
-            "screenshot": screenshot,
-            "timestamp": datetime.now().isoformat(),
-            "current_url": self.page.url if self.page else None,
-            "page_title": await self.page.title() if self.page else None
+            **self.screenshot_reference(screenshot),
+            "timestamp": self.last_capture["timestamp"],
+            "current_url": self.last_capture["current_url"],
+            "page_title": self.last_capture["page_title"]
         }
 
     def get_logs(self, limit: int = 100):
@@ -200,18 +346,23 @@ class PlaywrightManager:
             "is_initialized": self.is_initialized
         }
 
+    def pool_stats(self):
+        """Get context pool size, saturation and lease wait times"""
+        stats = self.pool.stats() if self.pool else {}
+        stats["active_runs"] = self.active_runs
+        stats["settle"] = self.settle_policy.summary()
+        stats["screenshots"] = self.screenshots.stats()
+        return stats
+
     async def cleanup(self):
         """Clean up Playwright resources"""
         try:
             self.add_log("INFO", "Starting cleanup...")
             
-            if self.page:
-                await self.page.close()
-                self.add_log("INFO", "Page closed")
-            
-            if self.context:
-                await self.context.close()
-                self.add_log("INFO", "Context closed")
+            if self.pool:
+                await self.pool.close()
+                self.pool = None
+                self.add_log("INFO", "Context pool closed")
             
             if self.browser:
                 await self.browser.close()
@@ -223,6 +374,7 @@ class PlaywrightManager:
             
             self.is_initialized = False
             self.add_log("INFO", "Cleanup completed successfully")
+            logging.getLogger().removeHandler(self.memory_handler)
             
         except Exception as e:
             error_msg = f"Error during cleanup: {str(e)}"
@@ -237,6 +389,9 @@ class MemoryLogHandler(logging.Handler):
         self.playwright_manager = playwright_manager
     
     def emit(self, record):
+        # add_log already stored the manager's own records and re-logging them would recurse
+        if record.name == logger.name:
+            return
         try:
             msg = self.format(record)
             level = record.levelname
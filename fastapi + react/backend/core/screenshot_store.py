@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+class StoredScreenshot:
+    """Encoded screenshot bytes with the metadata needed to serve them"""
+
+    def __init__(self, screenshot_id: str, data: bytes, media_type: str):
+        self.id = screenshot_id
+        self.data = data
+        self.media_type = media_type
+        self.created_at = datetime.now().isoformat()
+
+    @property
+    def etag(self) -> str:
+        # Ids are content hashes, so the id doubles as a strong validator
+        return f'"{self.id}"'
+
+
+class ScreenshotStore:
+    """In-memory LRU of screenshots addressed by content hash, bounded by count and bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, StoredScreenshot]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def put(self, data: bytes, media_type: str) -> Optional[StoredScreenshot]:
+        """Store a screenshot, or return None when it alone is larger than the byte budget"""
+        if len(data) > self.max_bytes:
+            with self.lock:
+                self.rejected += 1
+            return None
+        screenshot = StoredScreenshot(self.make_id(data), data, media_type)
+        with self.lock:
+            existing = self.entries.get(screenshot.id)
+            if existing is not None:
+                self.entries.move_to_end(screenshot.id)
+                return existing
+            self.entries[screenshot.id] = screenshot
+            self.total_bytes += len(data)
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted.data)
+                self.evictions += 1
+        return screenshot
+
+    def get(self, screenshot_id: str) -> Optional[StoredScreenshot]:
+        with self.lock:
+            screenshot = self.entries.get(screenshot_id)
+            if screenshot is not None:
+                self.entries.move_to_end(screenshot_id)
+            return screenshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "evictions": self.evictions,
+            "rejected": self.rejected
+        }
@@ -1,6 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { AlertCircle, Play, Camera, Globe, MousePointer, Type, MessageSquare, Monitor, Plus, Trash2, Clock } from 'lucide-react';
 
+// File extensions of the image types the screenshot endpoints serve
+const SCREENSHOT_EXTENSIONS = { 'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp' };
+
 const PlaywrightController = () => {
   const [serverUrl] = useState('http://localhost:8000');
   const [isRunning, setIsRunning] = useState(false);
@@ -104,7 +107,7 @@ const PlaywrightController = () => {
       if (result.data && result.data.results) {
         const screenshots = result.data.results.filter(r => r.action === 'screenshot');
         if (screenshots.length > 0) {
-          setScreenshotData(screenshots[screenshots.length - 1].screenshot);
+          setScreenshotData(`${serverUrl}${screenshots[screenshots.length - 1].screenshot_url}`);
         }
       }
       
@@ -120,8 +123,8 @@ const PlaywrightController = () => {
       addLog('📸 Taking screenshot...', 'info');
       const result = await apiCall('/take-screenshot', 'POST');
       
-      if (result.data && result.data.screenshot) {
-        setScreenshotData(result.data.screenshot);
+      if (result.data && result.data.screenshot_url) {
+        setScreenshotData(`${serverUrl}${result.data.screenshot_url}`);
         addLog(`✅ Screenshot taken - ${result.data.page_title}`, 'success');
       }
     } catch (err) {
@@ -129,6 +132,26 @@ const PlaywrightController = () => {
     }
   };
 
+  const handleDownloadScreenshot = async () => {
+    try {
+      // Fetched rather than linked: the server is another origin, and its Content-Type names the extension
+      const response = await fetch(screenshotData);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const blob = await response.blob();
+      const mediaType = (response.headers.get('Content-Type') || '').split(';')[0].trim();
+      const extension = SCREENSHOT_EXTENSIONS[mediaType] || mediaType.split('/')[1] || 'png';
+      const link = document.createElement('a');
+      link.href = URL.createObjectURL(blob);
+      link.download = `screenshot-${Date.now()}.${extension}`;
+      link.click();
+      URL.revokeObjectURL(link.href);
+    } catch (err) {
+      addLog(`❌ Screenshot download failed: ${err.message}`, 'error');
+    }
+  };
+
   const addStep = () => {
     setSteps(prev => [...prev, {
       action: 'navigate',
@@ -364,15 +387,10 @@ const PlaywrightController = () => {
             <div className="border-2 border-dashed border-gray-300 rounded-lg h-80 flex items-center justify-center bg-gray-50">
               {screenshotData ? (
                 <img
-                  src={`data:image/png;base64,${screenshotData}`}
+                  src={screenshotData}
                   alt="Page Screenshot"
                   className="max-w-full max-h-full object-contain rounded cursor-pointer"
-                  onClick={() => {
-                    const link = document.createElement('a');
-                    link.href = `data:image/png;base64,${screenshotData}`;
-                    link.download = `screenshot-${Date.now()}.png`;
-                    link.click();
-                  }}
+                  onClick={handleDownloadScreenshot}
                 />
               ) : (
                 <div className="text-center text-gray-500">
@@ -588,15 +588,55 @@ class AITestAutomation:
         
 
 # Command-line interface
-async def main():
+def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="AI Automation Testing with Playwright and LLMs")
     parser.add_argument("--excel", required=True, help="Path to Excel file with user stories")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes to shard the stories across")
+    parser.add_argument("--concurrency", type=int, default=1, help="Browser contexts per worker process")
+    parser.add_argument("--refresh-step-cache", action="store_true", help="Regenerate test steps instead of reading them from the step cache")
+    parser.add_argument("--batch-size", type=int, default=1, help="User stories sent to the LLM in a single request")
+    parser.add_argument("--stream-steps", action="store_true", help="Start executing each story while its steps are still being generated")
+    parser.add_argument("--profile", default="debug", choices=["fast", "ci", "debug", "forensic"], help="Execution profile: headless mode, video, tracing, screenshots and page analysis")
+    parser.add_argument("--analysis-policy", choices=["every_step", "on_failure", "sampled", "final_only"], help="When to run the LLM page analysis after a step (defaults to the profile's)")
+    parser.add_argument("--analysis-sample-rate", type=int, help="Analyze every Nth step with the sampled analysis policy")
+    parser.add_argument("--artifact-format", default="webp", choices=["webp", "jpeg", "png"], help="Image format of stored step screenshots")
+    parser.add_argument("--artifact-quality", type=int, default=80, help="Encoding quality of stored step screenshots")
+    parser.add_argument("--keep-analysis-screenshots", action="store_true", default=None, help="Also store the screenshots sent to the LLM for page analysis")
+    parser.add_argument("--ndjson", help="Stream results to this NDJSON file (one line per step and per test case)")
+    parser.add_argument("--junit", help="Stream results to this JUnit XML file")
+    parser.add_argument("--record", action="store_true", help="Save the run, its test cases and steps to the database")
+    parser.add_argument("--schedule", action="store_true", help="Run likely failures first and the longest stories first, from the recorded history")
+    parser.add_argument("--no-page-snapshots", action="store_true", help="Generate steps without a snapshot of each story's start page")
     args = parser.parse_args()
+    options = {
+        "max_workers": args.concurrency,
+        "bypass_step_cache": args.refresh_step_cache,
+        "batch_size": args.batch_size,
+        "stream_steps": args.stream_steps,
+        "analysis_policy": args.analysis_policy,
+        "analysis_sample_rate": args.analysis_sample_rate,
+        "artifact_format": args.artifact_format,
+        "artifact_quality": args.artifact_quality,
+        "persist_analysis_screenshots": args.keep_analysis_screenshots,
+        "profile": args.profile,
+        "ndjson_path": args.ndjson,
+        "junit_path": args.junit,
+        "record_results": args.record,
+        "schedule": args.schedule,
+        "page_snapshots": not args.no_page_snapshots
+    }
     
-    automation = AITestAutomation(args.excel)
-    await automation.run()
+    from Service.code.aiTestAutomation import AITestAutomation as ServiceTestAutomation
+    from Service.code.shardedRunner import ShardedSuiteRunner
+    
+    if args.workers > 1:
+        # Blocks until every shard is done; each shard runs its own event loop and Playwright in its own process
+        ShardedSuiteRunner(args.excel, workers=args.workers, **options).run()
+    else:
+        automation = ServiceTestAutomation(args.excel, **options)
+        asyncio.run(automation.run())
 
-if __name__ == "_main_":
-    asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# DB.db creates its engine at import; the tests never talk to the configured database
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="tests-db-"), "tests.sqlite")
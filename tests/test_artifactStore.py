@@ -0,0 +1,132 @@
+import asyncio
+import io
+import threading
+from PIL import Image
+from Service.code.artifactStore import ArtifactStore
+
+
+def _png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _stall_writer(store: ArtifactStore):
+    """Keep the writer thread busy until the returned release event is set."""
+    started, release = threading.Event(), threading.Event()
+    write = store._write
+
+    def slow_write(path, data):
+        started.set()
+        release.wait()
+        write(path, data)
+
+    store._write = slow_write
+    return started, release
+
+
+def test_identical_screenshots_are_stored_once(tmp_path):
+    store = ArtifactStore(root=str(tmp_path))
+
+    async def run():
+        first = await store.put(_png((255, 0, 0)))
+        second = await store.put(_png((255, 0, 0)))
+        await store.flush()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert store.path(first).exists()
+    assert store.stats()["stored"] == 1
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_files_of_an_earlier_run_are_not_rewritten(tmp_path):
+    earlier = ArtifactStore(root=str(tmp_path))
+    store = ArtifactStore(root=str(tmp_path))
+
+    async def run():
+        await earlier.put(_png((0, 255, 0)))
+        await earlier.close()
+        await store.put(_png((0, 255, 0)))
+        await store.flush()
+
+    asyncio.run(run())
+    assert store.stats()["stored"] == 0
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_full_queue_drops_plain_artifacts_but_keeps_failure_evidence(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_pending=1)
+    started, release = _stall_writer(store)
+
+    async def run():
+        # One item is being written and one waits in the queue
+        await store.put(_png((1, 0, 0)))
+        assert await asyncio.to_thread(started.wait, 5)
+        await store.put(_png((2, 0, 0)))
+        dropped = await store.put(_png((3, 0, 0)))
+        # The queue is still full, so this one is written on a worker thread once the disk frees up,
+        # while the event loop keeps running
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while not release.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        threading.Timer(0.1, release.set).start()
+        kept = await store.put(_png((4, 0, 0)), keep=True)
+        await ticker
+        await store.close()
+        return dropped, kept, ticks
+
+    dropped, kept, ticks = asyncio.run(run())
+    stats = store.stats()
+    assert dropped is None
+    assert stats["dropped"] == 1
+    assert kept is not None and store.path(kept).exists()
+    assert ticks > 1
+    assert stats["written_inline"] == 1
+    assert stats["stored"] == 3
+
+
+def test_failed_writes_are_retried_by_a_later_put(tmp_path):
+    store = ArtifactStore(root=str(tmp_path))
+    write = store._write
+    failures = [OSError("Disk full")]
+
+    def failing_write(path, data):
+        if failures:
+            raise failures.pop()
+        write(path, data)
+
+    store._write = failing_write
+
+    async def run():
+        await store.put(_png((5, 0, 0)))
+        await store.flush()
+        artifact_id = await store.put(_png((5, 0, 0)))
+        await store.close()
+        return artifact_id
+
+    artifact_id = asyncio.run(run())
+    assert store.path(artifact_id).exists()
+    assert (store.stats()["failed"], store.stats()["stored"]) == (1, 1)
+
+
+def test_close_stops_the_writer_until_the_next_put(tmp_path):
+    store = ArtifactStore(root=str(tmp_path))
+
+    async def run():
+        await store.put(_png((6, 0, 0)))
+        await store.close()
+        assert not store._writer.is_alive()
+        artifact_id = await store.put(_png((7, 0, 0)))
+        await store.close()
+        return artifact_id
+
+    assert store.path(asyncio.run(run())).exists()
+    assert store.stats()["stored"] == 2
@@ -0,0 +1,76 @@
+import asyncio
+import io
+from pathlib import Path
+from PIL import Image
+from Models import testsModel
+from Service.code.artifactStore import ArtifactStore
+from Service.code.browserAgent import BrowserAgent
+from Service.code import testReporter
+
+
+class FakeChatResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """Answers like a LangChain chat model: a message object with .content."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages)
+        return FakeChatResponse(f"Analysis {len(self.calls)}")
+
+
+class FakePage:
+    def __init__(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), (200, 30, 30)).save(buffer, "PNG")
+        self.png = buffer.getvalue()
+
+    async def screenshot(self, **options):
+        return self.png
+
+    async def evaluate(self, script, *args):
+        # dom_digest of a page that does not change between analyses
+        return "12:abcdef"
+
+
+def test_unchanged_page_analysis_is_served_from_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    llm = FakeChatModel()
+    agent = BrowserAgent(artifact_store=ArtifactStore(root=str(tmp_path / "artifacts")),
+                         persist_analysis_screenshots=False, llm=llm)
+    agent.page = FakePage()
+
+    first = asyncio.run(agent.analyze_page_content())
+    second = asyncio.run(agent.analyze_page_content())
+
+    assert first["summary"] == "Analysis 1"
+    assert second["summary"] == "Analysis 1"
+    assert second["cached"] is True
+    assert len(llm.calls) == 1
+    # The screenshot goes to the model as an image part of a chat message
+    content = llm.calls[0][0].content
+    assert content[1]["type"] == "image_url"
+    assert content[1]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    assert agent.analysis_cache.stats()["reused"] == 1
+
+
+def test_analysis_screenshots_are_stored_only_when_the_report_needs_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ArtifactStore(root=str(tmp_path / "artifacts"))
+    agent = BrowserAgent(artifact_store=store, persist_analysis_screenshots=False, llm=FakeChatModel())
+    agent.page = FakePage()
+
+    assert asyncio.run(agent.analyze_page_content())["artifact_id"] is None
+    artifact_id = asyncio.run(agent.analyze_page_content(persist=True))["artifact_id"]
+    asyncio.run(store.close())
+    assert store.path(artifact_id).exists()
+
+    test_case = testsModel.TestCase(id="TC1", user_story="Story", status="Fail", summary="Analysis 1",
+                         summary_artifact_id=artifact_id)
+    report = Path(testReporter.TestReporter(artifact_store=store).generate_report(test_case)).read_text()
+    assert f'src="{store.relative_path(artifact_id, testReporter.REPORT_DIR)}"' in report
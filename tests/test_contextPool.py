@@ -0,0 +1,149 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+import pytest
+from fastapi import HTTPException
+
+# The backend is its own app whose `core` package is not the root one, so its module is loaded by path
+_spec = importlib.util.spec_from_file_location(
+    "backend_context_pool", Path(__file__).resolve().parents[1] / "fastapi + react" / "backend" / "core" / "context_pool.py"
+)
+context_pool = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(context_pool)
+ContextPool = context_pool.ContextPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+
+    async def goto(self, url):
+        self.url = url
+
+    async def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.broken = False
+
+    async def new_context(self):
+        if self.broken:
+            raise RuntimeError("Browser has been closed")
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+
+def _pool(min_size=1, max_size=2, lease_timeout=0.05):
+    browser = FakeBrowser()
+    return browser, ContextPool(browser, min_size=min_size, max_size=max_size, lease_timeout=lease_timeout)
+
+
+def test_released_contexts_are_replaced_with_fresh_ones():
+    browser, pool = _pool()
+
+    async def run():
+        await pool.warm()
+        async with pool.lease() as lease:
+            await lease.page.goto("https://example.com")
+            await lease.context.new_page()
+            first = lease.context
+        async with pool.lease() as lease:
+            return first, lease
+
+    first, lease = asyncio.run(run())
+    # Nothing the first request stored in its context reaches the second one
+    assert first.closed
+    assert lease.context is not first
+    assert [page.url for page in lease.context.pages] == ["about:blank"]
+    assert len(browser.contexts) == 3
+    stats = pool.stats()
+    assert (stats["size"], stats["idle"], stats["total_leases"]) == (1, 1, 2)
+
+
+def test_pool_grows_to_max_size_then_times_out():
+    browser, pool = _pool(min_size=0, max_size=2)
+
+    async def run():
+        async with pool.lease(), pool.lease():
+            assert pool.stats()["saturation"] == 1.0
+            with pytest.raises(HTTPException) as error:
+                async with pool.lease():
+                    pass
+            return error.value.status_code
+
+    assert asyncio.run(run()) == 503
+    stats = pool.stats()
+    assert (stats["size"], stats["idle"], stats["in_use"]) == (2, 2, 0)
+    assert (stats["saturated_leases"], stats["lease_timeouts"]) == (1, 1)
+    # Two leased contexts and the fresh ones that replaced them
+    assert len(browser.contexts) == 4
+
+
+def test_waiting_lease_gets_the_next_released_context():
+    _, pool = _pool(min_size=1, max_size=1, lease_timeout=1)
+
+    async def run():
+        await pool.warm()
+        order = []
+
+        async def job(name, seconds):
+            async with pool.lease():
+                order.append(name)
+                await asyncio.sleep(seconds)
+
+        await asyncio.gather(job("first", 0.02), job("second", 0))
+        return order
+
+    assert asyncio.run(run()) == ["first", "second"]
+    assert pool.stats()["peak_in_use"] == 1
+
+
+def test_pool_shrinks_when_a_released_context_cannot_be_replaced():
+    browser, pool = _pool(min_size=1, max_size=1)
+
+    async def run():
+        await pool.warm()
+        async with pool.lease():
+            browser.broken = True
+        assert pool.stats()["size"] == 0
+        browser.broken = False
+        async with pool.lease() as lease:
+            return lease
+
+    lease = asyncio.run(run())
+    assert browser.contexts[0].closed
+    assert lease.context is browser.contexts[1]
+    assert pool.stats()["size"] == 1
+
+
+def test_close_discards_idle_contexts():
+    browser, pool = _pool(min_size=2, max_size=2)
+
+    async def run():
+        await pool.warm()
+        await pool.close()
+
+    asyncio.run(run())
+    assert all(context.closed for context in browser.contexts)
+    assert pool.stats()["size"] == 0
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+from core.llmGateway import ConcurrencyLimit, LLMGateway, TokenBucket, is_retryable
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def _gateway(**limits) -> LLMGateway:
+    options = dict(requests_per_minute=60000, burst=1000, max_retries=3, base_delay=0.001, max_delay=0.001)
+    options.update(limits)
+    return LLMGateway(**options)
+
+
+def _failing(errors, answer="ok"):
+    """Request factory that raises the given errors in turn, then answers."""
+    errors = list(errors)
+    attempts = []
+
+    async def request():
+        attempts.append(time.monotonic())
+        if errors:
+            raise errors.pop(0)
+        return answer
+
+    return (lambda: request()), attempts
+
+
+def test_quota_and_transient_errors_are_retryable():
+    assert is_retryable(ResourceExhausted("quota"))
+    assert is_retryable(RuntimeError("429 Too Many Requests"))
+    assert not is_retryable(ValueError("invalid argument"))
+
+
+def test_transient_errors_are_retried_until_the_call_succeeds():
+    gateway = _gateway()
+    request, attempts = _failing([ResourceExhausted("quota"), RuntimeError("503 unavailable")])
+    assert asyncio.run(gateway.call("test", request)) == "ok"
+    assert len(attempts) == 3
+    stats = gateway.stats()["test"]
+    assert (stats["calls"], stats["failures"], stats["retries"]) == (3, 2, 2)
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    gateway = _gateway(max_retries=2)
+    request, attempts = _failing([ValueError("bad prompt")])
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.call("test", request))
+    assert len(attempts) == 1
+
+    request, attempts = _failing([ResourceExhausted("quota")] * 5)
+    with pytest.raises(ResourceExhausted):
+        asyncio.run(gateway.call("test", request))
+    assert len(attempts) == 3
+
+
+def test_stream_is_not_retried_after_yielding():
+    gateway = _gateway()
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        yield "partial"
+        raise ResourceExhausted("quota")
+
+    async def consume():
+        return [chunk async for chunk in gateway.stream("test", request)]
+
+    with pytest.raises(ResourceExhausted):
+        asyncio.run(consume())
+    assert len(attempts) == 1
+
+
+def test_token_bucket_spaces_requests_beyond_the_burst():
+    bucket = TokenBucket(rate_per_second=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_concurrency_limit_bounds_calls_in_flight():
+    gateway = _gateway(max_concurrency=2)
+    in_flight, peak = 0, 0
+
+    async def request():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*[gateway.call("test", request) for _ in range(6)])
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert peak == 2
+    assert gateway.slots.in_use == 0
+
+
+def test_shared_limits_split_the_quota_between_processes():
+    gateway = LLMGateway(requests_per_minute=120, burst=6, max_concurrency=8)
+    gateway.share_limits(4)
+    assert gateway.bucket.rate == pytest.approx(0.5)
+    assert gateway.bucket.capacity == pytest.approx(1.5)
+    assert gateway.slots.size == 2
+    gateway.share_limits(16)
+    assert gateway.bucket.capacity == 1.0
+    assert gateway.slots.size == 1
+
+
+def test_concurrency_limit_hands_slots_to_waiters_in_order():
+    limit = ConcurrencyLimit(1)
+    order = []
+
+    async def worker(name):
+        await limit.acquire()
+        order.append(name)
+        await asyncio.sleep(0)
+        limit.release()
+
+    async def run():
+        await asyncio.gather(*[worker(name) for name in "abc"])
+
+    asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert limit.in_use == 0
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from core import pageSummarizer
+from core.llmGateway import LLMGateway
+from core.pageSummarizer import MAP_PROMPT, REDUCE_PROMPT, ChunkSummaryCache, PageSummarizer, split_text
+
+
+def _page(lines: int, width: int = 300) -> str:
+    return "\n".join(f"Line {n} " + "x" * width for n in range(lines))
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Prompts sent to the model; every map call answers with a 900 character summary."""
+    sent = []
+
+    async def generate(prompt):
+        sent.append(prompt)
+        return "S" * 900
+
+    async def stream(prompt):
+        sent.append(prompt)
+        for piece in ["Final ", "summary"]:
+            yield piece
+
+    # The shared gateway's rate limit would make the tests wait on a real quota
+    monkeypatch.setattr(pageSummarizer, "gateway", LLMGateway(requests_per_minute=60000, burst=1000))
+    monkeypatch.setattr(pageSummarizer, "_generate", generate)
+    monkeypatch.setattr(pageSummarizer, "_stream", stream)
+    return sent
+
+
+def _kinds(prompts):
+    return [MAP_PROMPT if prompt.startswith(MAP_PROMPT.split(":")[0]) else REDUCE_PROMPT for prompt in prompts]
+
+
+def test_chunks_respect_the_size_limit_and_keep_all_text():
+    text = _page(100)
+    chunks = split_text(text, max_chars=2000, min_chars=500)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    assert "\n".join(chunks) == text
+
+
+def test_oversized_lines_are_cut_at_sentence_ends():
+    sentence = "A sentence of about forty characters. "
+    chunks = split_text(sentence * 100, max_chars=400, min_chars=100)
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+
+
+def test_editing_one_section_keeps_the_other_chunks():
+    lines = [f"Line {n} " + "x" * 300 for n in range(100)]
+    before = split_text("\n".join(lines), max_chars=2000, min_chars=500)
+    lines[-1] = "An edited last line"
+    after = split_text("\n".join(lines), max_chars=2000, min_chars=500)
+    assert before[:-1] == after[:-1]
+
+
+def test_short_page_is_summarized_with_one_streamed_call(prompts):
+    partials = []
+
+    async def on_partial(piece):
+        partials.append(piece)
+
+    summary = asyncio.run(PageSummarizer(max_chunk_chars=2000, cache=ChunkSummaryCache())
+                          .summarize("A short page", on_partial=on_partial))
+    assert summary == "Final summary"
+    assert partials == ["Final ", "summary"]
+    assert _kinds(prompts) == [MAP_PROMPT]
+
+
+def test_long_page_is_reduced_in_rounds_until_it_fits_one_prompt(prompts):
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    summarizer = PageSummarizer(max_chunk_chars=2000, cache=ChunkSummaryCache())
+    assert asyncio.run(summarizer.summarize(_page(200), on_progress=on_progress)) == "Final summary"
+    chunks = len(split_text(_page(200), 2000))
+    kinds = _kinds(prompts)
+    # Every chunk is mapped, the 900 character summaries are combined two per round, then streamed once
+    assert kinds[:chunks] == [MAP_PROMPT] * chunks
+    assert kinds[chunks:] == [REDUCE_PROMPT] * (len(kinds) - chunks)
+    assert len(kinds) > chunks + 1
+    assert all(len(prompt) <= 2000 + len(REDUCE_PROMPT) for prompt in prompts[chunks:])
+    assert progress[-1] == (chunks, chunks)
+
+
+def test_repeated_pages_reuse_the_cached_summaries(prompts):
+    summarizer = PageSummarizer(max_chunk_chars=2000, cache=ChunkSummaryCache())
+    asyncio.run(summarizer.summarize(_page(50)))
+    calls = len(prompts)
+    assert asyncio.run(summarizer.summarize(_page(50))) == "Final summary"
+    assert len(prompts) == calls
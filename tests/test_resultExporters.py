@@ -0,0 +1,24 @@
+import xml.etree.ElementTree as ET
+from Models.testsModel import TestCase, TestStep
+from Service.code.resultExporters import JUnitXmlExporter
+
+
+def test_junit_counts_each_story_once(tmp_path):
+    path = tmp_path / "results.xml"
+    exporter = JUnitXmlExporter(str(path))
+    test_case = TestCase(id="TC_1", user_story="Log in", status="Fail", summary="Login failed", duration_seconds=3.0)
+    exporter.step_finished(test_case, TestStep(step_number=1, action="click", element_selector="#a", status="Pass"), 1.0)
+    exporter.step_finished(test_case, TestStep(step_number=2, action="type", element_selector="#b", status="Fail",
+                                               notes="Timeout"), 1.5)
+    exporter.case_finished(test_case)
+    exporter.close()
+
+    suite = ET.parse(path).getroot().find("testsuite")
+    assert suite.attrib["tests"] == "1"
+    assert suite.attrib["failures"] == "1"
+    assert suite.attrib["time"] == "3.000"
+    cases = suite.findall("testcase")
+    assert len(cases) == 1
+    output = cases[0].find("system-out").text
+    assert "Step 1: click #a [Pass, 1.000s]" in output
+    assert "Step 2: type #b [Fail, 1.500s] Timeout" in output
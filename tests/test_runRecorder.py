@@ -0,0 +1,97 @@
+import pytest
+from DB import db as tables
+from DB.db import SessionLocal, StepStats, StoryStats, ensure_schema
+from Models import testsModel
+from Service.code.analyticsService import update_aggregates
+from Service.code.runRecorder import RunRecorder, story_hash
+
+
+@pytest.fixture
+def db():
+    ensure_schema()
+    session = SessionLocal()
+    yield session
+    session.close()
+    with SessionLocal() as cleanup:
+        for table in (tables.TestStepRecord, tables.TestCaseRecord, StepStats, StoryStats, tables.TestRun):
+            cleanup.query(table).delete()
+        cleanup.commit()
+
+
+def _record(recorder: RunRecorder, case_id: str, story: str, statuses, duration: float = 2.0):
+    test_case = testsModel.TestCase(id=case_id, user_story=story, duration_seconds=duration,
+                         status="Pass" if all(status == "Pass" for status in statuses) else "Fail")
+    for number, status in enumerate(statuses, start=1):
+        step = testsModel.TestStep(step_number=number, action="click", element_selector=f"#step{number}", status=status)
+        recorder.step_finished(test_case, step, 0.5)
+    recorder.case_finished(test_case)
+
+
+def test_cases_and_steps_are_written_in_batches(db):
+    recorder = RunRecorder(batch_size=2)
+    for n in range(5):
+        _record(recorder, f"TC{n}", f"Story {n}", ["Pass", "Pass"])
+    recorder.close()
+
+    assert recorder.stats()["flushes"] == 3
+    assert db.query(tables.TestCaseRecord).count() == 5
+    assert db.query(tables.TestStepRecord).count() == 10
+    steps = db.query(tables.TestStepRecord).filter(tables.TestStepRecord.story_hash == story_hash("Story 0")).all()
+    assert sorted(step.step_number for step in steps) == [1, 2]
+    assert {step.test_case_id for step in steps} == {
+        db.query(tables.TestCaseRecord).filter(tables.TestCaseRecord.case_id == "TC0").one().id
+    }
+
+
+def test_recorder_creates_and_finishes_its_own_run(db):
+    recorder = RunRecorder(excel_path="stories.xlsx")
+    _record(recorder, "TC1", "Story", ["Pass"])
+    _record(recorder, "TC2", "Other story", ["Pass", "Fail"])
+    recorder.close()
+
+    run = db.get(tables.TestRun, recorder.run_id)
+    assert run.status == "completed"
+    assert (run.total, run.passed, run.failed, run.errors) == (2, 1, 1, 0)
+
+
+def test_aggregates_follow_the_runs_of_a_story(db):
+    for statuses in (["Pass", "Pass"], ["Pass", "Fail"], ["Pass", "Pass"], ["Pass", "Fail"]):
+        recorder = RunRecorder()
+        _record(recorder, "TC1", "Log in  with a valid user", statuses, duration=len(statuses))
+        recorder.close()
+
+    stats = db.get(StoryStats, story_hash("Log in with a valid user"))
+    assert (stats.total_runs, stats.window_runs) == (4, 4)
+    assert stats.pass_rate == 0.5
+    assert stats.flakiness == 1.0
+    assert stats.last_status == "Fail"
+    flaky = db.query(StepStats).filter(StepStats.step_number == 2).one()
+    assert (flaky.failures, flaky.flakiness) == (2, 1.0)
+    stable = db.query(StepStats).filter(StepStats.step_number == 1).one()
+    assert (stable.failures, stable.flakiness) == (0, 0.0)
+
+
+def test_aggregates_keep_only_the_window(db):
+    rows = [{"story_hash": "h", "user_story": "Story", "status": status, "duration_seconds": seconds,
+             "finished_at": None} for status, seconds in [("Fail", 100.0), ("Pass", 1.0), ("Pass", 3.0)]]
+    update_aggregates(db, rows[:1], [], window=2)
+    db.flush()
+    update_aggregates(db, rows[1:], [], window=2)
+    db.commit()
+
+    stats = db.get(StoryStats, "h")
+    assert stats.recent == [["Pass", 1.0], ["Pass", 3.0]]
+    assert (stats.total_runs, stats.window_runs, stats.pass_rate) == (3, 2, 1.0)
+    assert stats.p95_seconds == 3.0
+
+
+def test_unmeasured_cases_do_not_lower_the_percentiles(db):
+    rows = [{"story_hash": "h", "user_story": "Story", "status": status, "duration_seconds": seconds,
+             "finished_at": None} for status, seconds in [("Pass", 4.0), ("Error", None), ("Pass", 6.0)]]
+    update_aggregates(db, rows, [])
+    db.commit()
+
+    stats = db.get(StoryStats, "h")
+    assert stats.recent == [["Pass", 4.0], ["Error", None], ["Pass", 6.0]]
+    assert (stats.window_runs, stats.pass_rate) == (3, 0.6667)
+    assert (stats.p50_seconds, stats.p95_seconds) == (6.0, 6.0)
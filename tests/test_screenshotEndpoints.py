@@ -0,0 +1,189 @@
+import asyncio
+import importlib
+import io
+import sys
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+BACKEND = ROOT / "fastapi + react" / "backend"
+_BACKEND_PACKAGES = ("core", "config", "api", "utils")
+
+
+def _is_backend_module(name):
+    return name.split(".")[0] in _BACKEND_PACKAGES
+
+
+@pytest.fixture(scope="module")
+def backend():
+    # The backend's top-level packages are namespace packages that the root `core` package would shadow,
+    # so they are imported with only the backend on the path and the root modules are put back afterwards
+    saved = {name: module for name, module in sys.modules.items() if _is_backend_module(name)}
+    for name in saved:
+        del sys.modules[name]
+    saved_path = list(sys.path)
+    sys.path[:] = [str(BACKEND)] + [entry for entry in sys.path if Path(entry or ".").resolve() != ROOT]
+    try:
+        endpoints = importlib.import_module("api.endpoints")
+        manager_module = importlib.import_module("core.playwright_manager")
+        context_pool = importlib.import_module("core.context_pool")
+        settings = importlib.import_module("config.settings").settings
+    finally:
+        sys.path[:] = saved_path
+        for name in [name for name in sys.modules if _is_backend_module(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+    return endpoints, manager_module, context_pool, settings
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "https://example.com/dashboard"
+
+    def on(self, event, handler):
+        pass
+
+    async def goto(self, url):
+        self.url = url
+
+    async def title(self):
+        return "Dashboard"
+
+    async def set_content(self, html):
+        self.content = html
+
+    async def evaluate(self, script):
+        # Natural size of the image the final capture is drawn from
+        return [320, 200]
+
+    async def set_viewport_size(self, size):
+        self.context.browser.viewports.append(size)
+
+    async def screenshot(self, **options):
+        self.context.browser.screenshot_options.append(options)
+        buffer = io.BytesIO()
+        Image.new("RGB", (320, 200), (20, 120, 200)).save(buffer, "JPEG" if options["type"] == "jpeg" else "PNG")
+        return buffer.getvalue()
+
+    async def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.screenshot_options = []
+        self.viewports = []
+
+    async def new_context(self):
+        return FakeContext(self)
+
+
+def _client(backend, manager):
+    endpoints = backend[0]
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.dependency_overrides[endpoints.get_playwright_manager] = lambda: manager
+    return TestClient(app)
+
+
+def _finished_run(backend):
+    _, manager_module, context_pool, _ = backend
+    browser = FakeBrowser()
+    manager = manager_module.PlaywrightManager()
+    manager.pool = context_pool.ContextPool(browser, min_size=1, max_size=1, lease_timeout=1)
+    manager.is_initialized = True
+    asyncio.run(manager.run_user_story("Open the dashboard", []))
+    return manager, browser
+
+
+def test_screenshot_endpoints_serve_the_last_run_with_default_settings(backend):
+    settings = backend[3]
+    assert settings.SCREENSHOT_CAPTURE_FINAL
+    manager, browser = _finished_run(backend)
+    client = _client(backend, manager)
+
+    taken = client.post("/take-screenshot").json()
+    assert taken["success"], taken["error"]
+    assert taken["data"]["page_title"] == "Dashboard"
+    # The final capture is a viewport image, never a full page
+    assert browser.screenshot_options == [{"type": "jpeg", "full_page": False, "quality": settings.SCREENSHOT_QUALITY}]
+
+    stored = client.get(taken["data"]["screenshot_url"])
+    assert stored.status_code == 200
+    latest = client.get("/screenshot")
+    assert latest.status_code == 200
+    assert latest.headers["content-type"] == "image/jpeg"
+    assert latest.content == stored.content
+    assert client.get("/screenshot", headers={"If-None-Match": latest.headers["etag"]}).status_code == 304
+
+
+def test_screenshot_endpoint_reencodes_and_clips_the_last_capture(backend):
+    manager, browser = _finished_run(backend)
+    client = _client(backend, manager)
+    params = {"format": "png", "x": 10, "y": 20, "clip_width": 100, "clip_height": 50, "width": 640}
+
+    clipped = client.get("/screenshot", params=params)
+    assert clipped.status_code == 200
+    assert clipped.headers["content-type"] == "image/png"
+    assert browser.viewports == [{"width": 640, "height": 400}]
+    assert browser.screenshot_options[-1] == {
+        "type": "png", "full_page": False, "clip": {"x": 10, "y": 20, "width": 100, "height": 50}
+    }
+    # The same variant of the same capture is served without drawing it again
+    assert client.get("/screenshot", params=params).content == clipped.content
+    assert len(browser.screenshot_options) == 2
+
+    assert client.get("/screenshot", params={"quality": 101}).status_code == 422
+    assert client.get("/screenshot", params={"format": "gif"}).status_code == 422
+    assert client.get("/screenshot", params={"format": "png", "quality": 50}).status_code == 400
+    assert client.get("/screenshot", params={"x": 10, "y": 20}).status_code == 400
+    outside = client.get("/screenshot", params={"x": 300, "y": 0, "clip_width": 100, "clip_height": 50})
+    assert outside.status_code == 400
+    assert "320x200" in outside.json()["detail"]
+
+
+def test_screenshot_endpoints_explain_when_no_run_has_finished(backend):
+    manager = backend[1].PlaywrightManager()
+    manager.is_initialized = True
+    client = _client(backend, manager)
+
+    response = client.get("/screenshot")
+    assert response.status_code == 409
+    assert "run a user story first" in response.json()["detail"]
+
+
+def test_oversized_screenshots_are_rejected_instead_of_handed_out(backend):
+    manager_module, context_pool = backend[1], backend[2]
+    browser = FakeBrowser()
+    manager = manager_module.PlaywrightManager()
+    manager.pool = context_pool.ContextPool(browser, min_size=1, max_size=1, lease_timeout=1)
+    manager.screenshots.max_bytes = 64
+    manager.is_initialized = True
+    client = _client(backend, manager)
+
+    run = client.post("/run-playwright", json={"user_story": "Screenshot", "steps": [{"action": "screenshot"}]})
+    assert run.status_code == 413
+    assert "exceeds SCREENSHOT_STORE_MAX_BYTES" in run.json()["detail"]
+
+    response = client.get("/screenshot")
+    assert response.status_code == 409
+    assert "exceeds SCREENSHOT_STORE_MAX_BYTES" in response.json()["detail"]
+    assert manager.screenshots.stats() == {"entries": 0, "bytes": 0, "evictions": 0, "rejected": 2}
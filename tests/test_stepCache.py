@@ -0,0 +1,54 @@
+import asyncio
+from langchain_core.language_models import FakeListLLM
+from Service.code import testStepsGenerator
+from Service.code.pageSnapshot import PageSnapshot
+from Service.code.stepCache import StepCache
+
+STORY = "Open https://example.com/login and sign in"
+
+
+class FakeSnapshotter:
+    def __init__(self):
+        self.snapshots = 0
+
+    async def snapshot(self, url):
+        self.snapshots += 1
+        return PageSnapshot(url, "Login", [{"role": "button", "name": "Sign in", "selector": "#submit"}])
+
+
+def _generator(tmp_path, monkeypatch):
+    # Lookups never call the model
+    monkeypatch.setattr(testStepsGenerator, "get_llm", lambda model: FakeListLLM(responses=[]))
+    snapshotter = FakeSnapshotter()
+    cache = StepCache(path=str(tmp_path / "steps.sqlite"))
+    return testStepsGenerator.PlaywrightCodeGenerator(cache=cache, snapshotter=snapshotter), cache, snapshotter
+
+
+def test_a_cold_story_is_one_miss_and_one_snapshot(tmp_path, monkeypatch):
+    generator, cache, snapshotter = _generator(tmp_path, monkeypatch)
+
+    cached, page_context, key = asyncio.run(generator.lookup(STORY))
+
+    assert cached is None
+    assert "#submit" in page_context
+    assert snapshotter.snapshots == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+
+
+def test_a_recently_snapshotted_page_needs_no_navigation(tmp_path, monkeypatch):
+    generator, cache, snapshotter = _generator(tmp_path, monkeypatch)
+    _, page_context, key = asyncio.run(generator.lookup(STORY))
+
+    # Another story on the same start page misses under the recorded digest and reuses its context
+    other_story = "Open https://example.com/login and reset the password"
+    cached, other_context, _ = asyncio.run(generator.lookup(other_story))
+    assert cached is None
+    assert other_context == page_context
+
+    cache.put(key, [{"step_number": 1, "action": "navigate"}])
+    cached, hit_context, _ = asyncio.run(generator.lookup(STORY))
+    assert cached == [{"step_number": 1, "action": "navigate"}]
+    assert hit_context == ""
+
+    assert snapshotter.snapshots == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
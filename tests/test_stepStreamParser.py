@@ -0,0 +1,31 @@
+import json
+from Service.code.stepStreamParser import IncrementalStepParser, parse_steps, repair_json
+
+
+def test_repair_json_unescapes_single_quotes_in_single_quoted_strings():
+    repaired = repair_json(r"[{'action': 'type', 'input_value': 'it\'s me'}]")
+    assert json.loads(repaired) == [{"action": "type", "input_value": "it's me"}]
+
+
+def test_repair_json_unescapes_single_quotes_in_double_quoted_strings():
+    repaired = repair_json(r'[{"expected_result": "Shows \'Welcome\'", "step_number": 1,}]')
+    assert json.loads(repaired) == [{"expected_result": "Shows 'Welcome'", "step_number": 1}]
+
+
+def test_repair_json_keeps_valid_escapes_and_literal_backslashes():
+    repaired = repair_json(r"[{'a': 'say \"hi\"\n', 'b': 'C:\temp\x'}]")
+    assert json.loads(repaired) == [{"a": 'say "hi"\n', "b": "C:\temp\\x"}]
+
+
+def test_parse_steps_repairs_escaped_quote_without_fallback():
+    steps = parse_steps(r"Here you go: [{'step_number': 1, 'action': 'assert', 'expected_result': 'user\'s name'}]")
+    assert steps == [{"step_number": 1, "action": "assert", "expected_result": "user's name"}]
+
+
+def test_incremental_parser_emits_step_with_escaped_quote():
+    parser = IncrementalStepParser()
+    steps = []
+    for chunk in ["[{'step_number': 1, 'notes': 'can\\'t", " fail'}, ", "{'step_number': 2}]"]:
+        steps.extend(parser.feed(chunk))
+    assert steps == [{"step_number": 1, "notes": "can't fail"}, {"step_number": 2}]
+    assert parser.errors == []
@@ -0,0 +1,47 @@
+from Service.code.runRecorder import story_hash
+from Service.code.suiteScheduler import DEFAULT_STORY_SECONDS, SuiteScheduler, simulate_makespan
+
+
+def _history(**stories):
+    """(p50 seconds, pass rate) keyed by story hash, from story=(seconds, pass_rate) pairs."""
+    return {story_hash(story): values for story, values in stories.items()}
+
+
+def test_makespan_assigns_each_story_to_the_next_free_context():
+    assert simulate_makespan([4, 3, 2, 1], contexts=1) == 10
+    assert simulate_makespan([4, 3, 2, 1], contexts=2) == 5
+    assert simulate_makespan([], contexts=2) == 0
+
+
+def test_longest_stories_start_first():
+    stories = list(enumerate(["short", "long", "medium"]))
+    history = _history(short=(10.0, 1.0), long=(90.0, 1.0), medium=(30.0, 1.0))
+    plan = SuiteScheduler().plan(stories, history)
+    assert plan.order == [(1, "long"), (2, "medium"), (0, "short")]
+
+
+def test_likely_failures_run_before_longer_stories():
+    stories = list(enumerate(["stable", "flaky"]))
+    history = _history(stable=(90.0, 1.0), flaky=(10.0, 0.2))
+    plan = SuiteScheduler().plan(stories, history)
+    assert plan.order == [(1, "flaky"), (0, "stable")]
+
+
+def test_shards_are_balanced_by_expected_duration():
+    seconds = [60.0, 50.0, 40.0, 30.0, 20.0, 10.0]
+    stories = [(index, f"story {index}") for index in range(len(seconds))]
+    history = {story_hash(story): (duration, 1.0) for (_, story), duration in zip(stories, seconds)}
+    plan = SuiteScheduler(workers=2).plan(stories, history)
+    loads = sorted(sum(estimate.seconds for estimate in shard) for shard in plan.shards)
+    assert loads == [100.0, 110.0]
+    assert plan.predicted_makespan == 110.0
+    # Dealt round robin in workbook order, the first shard gets 60 + 40 + 20
+    assert plan.baseline_makespan == 120.0
+
+
+def test_stories_without_history_get_the_median_duration():
+    stories = list(enumerate(["a", "b", "c", "new"]))
+    plan = SuiteScheduler().plan(stories, _history(a=(10.0, 1.0), b=(20.0, 1.0), c=(30.0, 1.0)))
+    new = next(estimate for estimate in plan.shards[0] if estimate.story == "new")
+    assert (new.seconds, new.known) == (20.0, False)
+    assert SuiteScheduler().plan([(0, "new")], {}).shards[0][0].seconds == DEFAULT_STORY_SECONDS
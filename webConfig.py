@@ -4,5 +4,13 @@ from typing import List
 class WebConfig(BaseSettings):
     APP_NAME: str = "Autonomous - MCP"
     ALLOWED_ORIGINS: List[str] = ["*"]
+    MAX_CONCURRENT_RUNS: int = 2
+    # Test runs may only read workbooks inside this directory
+    WORKBOOK_DIR: str = "."
+    # Running runs refresh their heartbeat this often; a run silent for RUN_STALE_SECONDS lost its process
+    RUN_HEARTBEAT_SECONDS: int = 30
+    RUN_STALE_SECONDS: int = 120
+    # Executions per story and step the analytics aggregates keep; POST /analytics/rebuild after raising it
+    ANALYTICS_WINDOW: int = 50
     
 config = WebConfig()
\ No newline at end of file